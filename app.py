@@ -2,6 +2,7 @@ from flask import Flask, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
+import multiprocessing
 from datetime import datetime
 
 # 🌍 Load environment variables
@@ -10,8 +11,12 @@ load_dotenv()
 
 # 📦 Import routes
 
-from routes.upload import upload_bp
-from routes.chat import chat_bp
+from routes.upload import upload_bp, start_ingestion_workers
+from routes.chat import chat_bp, start_chat_workers
+from services.answer_cache import answer_cache
+from services.chat_memory import get_memory_stats
+from services import query_rewriter
+from services.vector_store import get_query_cache_stats, get_embedding_client_stats, get_index_stats, get_retrieval_stats
 
 # ⚙️ Initialize Flask app
 
@@ -48,6 +53,15 @@ app.register_blueprint(chat_bp, url_prefix="/api/chat")
 os.makedirs("uploads", exist_ok=True)
 os.makedirs("vector_db", exist_ok=True)
 
+# 🧵 Background ingestion workers
+# (skipped in the debug reloader's watcher process, which never serves requests,
+# and in OCR pool processes that re-import this module under "spawn")
+if multiprocessing.parent_process() is None and (
+    __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+):
+    start_ingestion_workers()
+    start_chat_workers()
+
 # 💓 Health Check Endpoint
 
 @app.route("/api/health", methods=["GET"])
@@ -57,7 +71,14 @@ def health_check():
         "message": "PDF Chatbot Backend is running (Python/Flask + OpenAI)",
         "timestamp": datetime.now().isoformat(),
         "model": os.getenv("CHAT_MODEL", "gpt-4o-mini"),
-        "embedding_model": os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+        "embedding_model": os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"),
+        "query_embedding_cache": get_query_cache_stats(),
+        "embedding_client": get_embedding_client_stats(),
+        "vector_index": get_index_stats(),
+        "retrieval": get_retrieval_stats(),
+        "answer_cache": answer_cache.stats(),
+        "chat_memory": get_memory_stats(),
+        "query_rewrite": query_rewriter.stats()
     })
 
 # ⚠️ Global Error Handlers
@@ -83,6 +104,7 @@ if __name__ == "__main__":
     print(f"🔢 Embedding Model: {os.getenv('EMBEDDING_MODEL', 'text-embedding-3-large')}")
     print("\n📚 API Endpoints:")
     print(f"   POST http://localhost:{port}/api/upload  (accepts both /api/upload and /api/upload/)")
+    print(f"   GET  http://localhost:{port}/api/upload/jobs/<job_id>  (ingestion job status)")
     print(f"   DELETE http://localhost:{port}/api/upload/<document_id>  (delete document)")
     print(f"   POST http://localhost:{port}/api/chat    (chat with uploaded document)")
     print(f"   GET  http://localhost:{port}/api/chat/documents")
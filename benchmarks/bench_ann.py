@@ -0,0 +1,110 @@
+"""
+Benchmark: recall@k vs query latency of the approximate index types.
+
+Run from the repository root:
+    python -m benchmarks.bench_ann --vectors 50000 --dim 256
+
+Builds each index type over synthetic clustered, unit-length vectors (a
+rough stand-in for text embeddings), runs single-vector queries the way
+query_vectorstore does and compares the hits with exact brute-force
+search. HNSW is swept over efSearch and IVF-PQ over nprobe, each with and
+without the exact re-rank of ANN_RERANK_FACTOR × k candidates done by the
+vector store. Use the table to pick HNSW_EF_SEARCH / IVF_NPROBE /
+ANN_RERANK_FACTOR.
+"""
+import time
+import argparse
+
+import faiss
+import numpy as np
+
+from services.ann_index import AnnIndex, IVF_TRAIN_SIZE, new_index
+
+
+def clustered_vectors(n, dim, clusters=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    vectors = centers[rng.integers(0, clusters, size=n)]
+    vectors += 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def exact_neighbours(vectors, queries, k):
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    _distances, labels = index.search(queries, k)
+    return index, labels
+
+
+def run_queries(search, queries, truth, k):
+    hits = 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        hits += len(set(search(query)) & set(expected.tolist()))
+    latency = (time.perf_counter() - start) / len(queries)
+    return hits / (len(queries) * k), latency * 1000
+
+
+def rerank(vectors, query, candidates, k):
+    """What vector_store._nearest does with ANN candidates."""
+    candidates = np.asarray(candidates, dtype="int64")
+    distances = ((vectors[candidates] - query) ** 2).sum(axis=1)
+    return candidates[np.argsort(distances)[:k]]
+
+
+def build(kind, vectors):
+    ids = [str(i) for i in range(len(vectors))]  # label i ↔ row i
+    ann = AnnIndex(kind, new_index(kind, vectors.shape[1], len(vectors)))
+    start = time.perf_counter()
+    if not ann.index.is_trained:
+        sample = np.random.default_rng(1).choice(len(vectors), min(IVF_TRAIN_SIZE, len(vectors)), replace=False)
+        ann.train(vectors[np.sort(sample)])
+    for i in range(0, len(vectors), 10_000):
+        ann.add(ids[i:i + 10_000], vectors[i:i + 10_000])
+    return ann, time.perf_counter() - start
+
+
+def index_mb(index):
+    return faiss.serialize_index(index).nbytes / 1024 / 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    args = parser.parse_args()
+    k = args.k
+
+    data = clustered_vectors(args.vectors + args.queries, args.dim)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    flat, truth = exact_neighbours(vectors, queries, k)
+
+    rows = []
+    recall, latency = run_queries(lambda q: flat.search(q.reshape(1, -1), k)[1][0], queries, truth, k)
+    rows.append(("flat", "-", "-", recall, latency, 0.0, index_mb(flat)))
+
+    for kind, knob, values in (("hnsw", "efSearch", (16, 32, 64, 128)), ("ivfpq", "nprobe", (4, 8, 16, 32, 64))):
+        ann, build_seconds = build(kind, vectors)
+        size = index_mb(ann.index)
+        for value in values:
+            if kind == "hnsw":
+                ann.index.hnsw.efSearch = value
+            else:
+                ann.index.nprobe = min(value, ann.index.nlist)
+            ann._params = None
+            for factor in (1, args.rerank_factor):
+                def search(query):
+                    candidates = [int(i) for i in ann.search(query, k * factor)]
+                    return rerank(vectors, query, candidates, k) if factor > 1 else candidates
+
+                recall, latency = run_queries(search, queries, truth, k)
+                rows.append((kind, f"{knob}={value}", f"×{factor}", recall, latency, build_seconds, size))
+
+    print(f"\n📊 recall@{k}, {args.vectors} vectors, dim {args.dim}, {args.queries} single-vector queries")
+    print(f"{'index':>6} {'setting':>12} {'rerank':>7} {'recall':>7} {'ms/query':>9} {'build (s)':>10} {'size (MB)':>10}")
+    for kind, setting, factor, recall, latency, build_seconds, size in rows:
+        print(f"{kind:>6} {setting:>12} {factor:>7} {recall:>7.3f} {latency:>9.2f} {build_seconds:>10.1f} {size:>10.1f}")
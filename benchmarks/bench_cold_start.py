@@ -0,0 +1,214 @@
+"""
+Benchmark: cold start time and per-worker memory for a large corpus.
+
+Run from the repository root:
+    python -m benchmarks.bench_cold_start --chunks 1000000 --workers 2
+
+Builds a synthetic snapshot (random vectors, ~400-byte chunks and their
+BM25 index) once, then starts several worker processes that each load the
+store, run a few queries and upload one small document, as gunicorn
+workers would. Compares the memory-mapped snapshot (vectors, ID columns and
+BM25 postings mapped, chunk text in the SQLite document store) with a
+store saved by save_local/load_local with a pickled docstore and BM25
+index, which is imported into SQLite on first load. PSS splits shared
+pages between the processes mapping them, so it shows what each worker
+really costs.
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import argparse
+import subprocess
+
+import numpy as np
+
+from benchmarks.common import CountingEmbeddings
+
+WORDS = np.array([f"term{i}" for i in range(5000)])
+
+
+def chunk_rows(n_chunks, chunks_per_doc=60):
+    from langchain_core.documents import Document
+
+    rng = np.random.default_rng(0)
+    for start in range(0, n_chunks, 10_000):
+        words = rng.integers(0, len(WORDS), size=(min(10_000, n_chunks - start), 60))
+        for offset, row in enumerate(words):
+            i = start + offset
+            doc_id = f"doc-{i // chunks_per_doc:08d}"
+            vector_id = f"{doc_id}:{i % chunks_per_doc}"
+            yield vector_id, Document(
+                id=vector_id,
+                page_content=" ".join(WORDS[row]),
+                metadata={"document_id": doc_id, "filename": f"{doc_id}.pdf", "chunk_index": i % chunks_per_doc},
+            )
+
+
+def build_index(n_chunks, dim):
+    import faiss
+
+    index = faiss.IndexFlatL2(dim)
+    rng = np.random.default_rng(1)
+    for start in range(0, n_chunks, 100_000):
+        index.add(rng.standard_normal((min(100_000, n_chunks - start), dim)).astype("float32"))
+    return index
+
+
+def document_metadata(n_chunks, chunks_per_doc=60):
+    metadata = {}
+    for vector_id, doc in chunk_rows(n_chunks):
+        meta = metadata.setdefault(doc.metadata["document_id"], {
+            "filename": doc.metadata["filename"], "status": "ready", "total_chunks": 0,
+            "vector_ids": [], "cached_chunks": 0, "embedded_chunks": 0,
+        })
+        meta["vector_ids"].append(vector_id)
+        meta["total_chunks"] += 1
+    return metadata
+
+
+def build_snapshot(root, n_chunks, dim):
+    """Snapshot layout written by compact_vectorstore, plus the document store."""
+    import faiss
+    from services import document_store
+    from services.ann_index import to_mappable
+    from services.chunk_store import write_id_columns
+    from services.keyword_index import write_keyword_columns
+
+    snapshot = os.path.join(root, "index", "snapshot-00000001")
+    os.makedirs(snapshot)
+    faiss.write_index(to_mappable(build_index(n_chunks, dim)), os.path.join(snapshot, "index.faiss"))
+    write_id_columns(os.path.join(snapshot, "ids"), (vector_id for vector_id, _doc in chunk_rows(n_chunks)))
+    document_store.DOCUMENTS_DB_PATH = os.path.join(root, "documents.db")
+    document_store.init_db()
+    document_store.import_documents(document_metadata(n_chunks), chunk_rows(n_chunks))
+    write_keyword_columns(
+        os.path.join(snapshot, "keywords"), ((vector_id, doc.page_content) for vector_id, doc in chunk_rows(n_chunks))
+    )
+    with open(os.path.join(root, "index", "CURRENT"), "w") as f:
+        f.write("1\n")
+
+
+def build_legacy(root, n_chunks, dim):
+    """Layout written by save_local + metadata.pkl before snapshots."""
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from services.keyword_index import KeywordIndex
+
+    ids, docs = [], {}
+    for vector_id, doc in chunk_rows(n_chunks):
+        ids.append(vector_id)
+        docs[vector_id] = doc
+    store = FAISS(CountingEmbeddings(dim), build_index(n_chunks, dim), InMemoryDocstore(docs), dict(enumerate(ids)))
+    store.save_local(os.path.join(root, "faiss_index"))
+    with open(os.path.join(root, "metadata.pkl"), "wb") as f:
+        pickle.dump(document_metadata(n_chunks), f)
+    KeywordIndex.from_documents(docs.items()).save(os.path.join(root, "keyword_index.pkl"))
+
+
+def memory_mb():
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                values[parts[0][:-1].lower()] = int(parts[1]) / 1024
+    return values
+
+
+def child(root, dim, ready_path, go_path):
+    """One worker: load the store, run queries, upload, report, wait for the others."""
+    from services import vector_store, document_store
+    from services.embedding_cache import ChunkEmbeddingCache
+
+    document_store.DOCUMENTS_DB_PATH = os.path.join(root, "documents.db")
+    document_store.init_db()
+    vector_store.VECTOR_STORE_DIR = root
+    vector_store.VECTOR_STORE_PATH = os.path.join(root, "faiss_index")
+    vector_store.METADATA_PATH = os.path.join(root, "metadata.pkl")
+    vector_store.KEYWORD_INDEX_PATH = os.path.join(root, "keyword_index.pkl")
+    vector_store.INDEX_DIR = os.path.join(root, "index")
+    vector_store.embeddings = CountingEmbeddings(dim)
+    vector_store.chunk_embeddings = ChunkEmbeddingCache(
+        vector_store.embeddings, directory=os.path.join(root, f"embedding_cache-{os.getpid()}"), namespace="bench"
+    )
+
+    start = time.perf_counter()
+    vector_store._load_vectorstore()
+    startup = time.perf_counter() - start
+
+    for i in range(20):
+        vector_store.query_vectorstore(f"term{i} term{i * 7}")
+        vector_store.query_vectorstore(f"term{i}", document_id=f"doc-{i * 37:08d}")
+    # A write must not pull the mapped snapshot into this worker's heap
+    vector_store.add_document_to_vectorstore(" ".join(WORDS[:2000]), f"upload-{os.getpid()}.txt")
+
+    with open(ready_path, "w") as f:
+        json.dump({"startup": startup}, f)
+    while not os.path.exists(go_path):
+        time.sleep(0.05)
+    report = memory_mb()
+    report["startup"] = startup
+    print(json.dumps(report), flush=True)
+
+
+def run_workers(root, dim, workers):
+    env = dict(os.environ, QUERY_EMBEDDING_CACHE_PATH="", PYTHONUNBUFFERED="1", INDEX_TYPE="flat")
+    go_path = os.path.join(root, "go")
+    procs, ready = [], []
+    for i in range(workers):
+        ready_path = os.path.join(root, f"ready-{i}")
+        ready.append(ready_path)
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_cold_start", "--child", root, str(dim), ready_path, go_path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=env,
+        ))
+    while not all(os.path.exists(p) for p in ready):
+        if any(p.poll() not in (None, 0) for p in procs):
+            raise RuntimeError("worker failed")
+        time.sleep(0.1)
+    open(go_path, "w").close()  # all loaded: measure while every worker maps the files
+
+    reports = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+    os.remove(go_path)
+    for p in ready:
+        os.remove(p)
+    return reports
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        root, dim, ready_path, go_path = sys.argv[2:6]
+        child(root, int(dim), ready_path, go_path)
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--legacy-chunks", type=int, default=200_000,
+                        help="corpus size for the pickled-docstore comparison (0 to skip)")
+    args = parser.parse_args()
+
+    rows = []
+    for mode, n_chunks, build in (("mmap", args.chunks, build_snapshot), ("pickle", args.legacy_chunks, build_legacy)):
+        if not n_chunks:
+            continue
+        root = os.path.abspath(f"bench_cold_start_{mode}")
+        shutil.rmtree(root, ignore_errors=True)
+        os.makedirs(os.path.join(root, "index"))
+        try:
+            start = time.perf_counter()
+            build(root, n_chunks, args.dim)
+            print(f"🏗️ Built {mode} store with {n_chunks} chunks in {time.perf_counter() - start:.0f} s")
+            for worker, report in enumerate(run_workers(root, args.dim, args.workers)):
+                rows.append((mode, n_chunks, worker, report))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(f"\n📊 Cold start, {args.workers} worker(s), dim {args.dim}")
+    print(f"{'store':>7} {'chunks':>9} {'worker':>7} {'startup (s)':>12} {'RSS (MB)':>9} {'PSS (MB)':>9}")
+    for mode, n_chunks, worker, report in rows:
+        print(f"{mode:>7} {n_chunks:>9} {worker:>7} {report['startup']:>12.2f} {report['rss']:>9.0f} {report['pss']:>9.0f}")
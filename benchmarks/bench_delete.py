@@ -0,0 +1,44 @@
+"""
+Benchmark: cost of deleting one document as the corpus grows.
+
+Run from the repository root:
+    python -m benchmarks.bench_delete
+
+Deleting by vector ID should keep the embedding calls made during a delete
+at zero and the wall time roughly flat, whatever the corpus size.
+"""
+import shutil
+import time
+
+from benchmarks.common import CountingEmbeddings, synthetic_document, use_temp_vectorstore
+
+CORPUS_SIZES = [10, 50, 200]
+
+
+def run(corpus_size):
+    embedder = CountingEmbeddings()
+    vector_store, tmp_dir = use_temp_vectorstore(embedder)
+    try:
+        doc_ids = [
+            vector_store.add_document_to_vectorstore(synthetic_document(n), f"doc_{n}.pdf")
+            for n in range(corpus_size)
+        ]
+        total_chunks = vector_store._vectorstore.index.ntotal
+
+        embedder.reset()
+        start = time.perf_counter()
+        vector_store.delete_document_from_vectorstore(doc_ids[corpus_size // 2])
+        elapsed = time.perf_counter() - start
+
+        return total_chunks, embedder.texts_embedded, elapsed
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    results = [(size, *run(size)) for size in CORPUS_SIZES]
+
+    print("\n📊 Delete one document")
+    print(f"{'docs':>6} {'chunks':>8} {'embedded':>9} {'time (ms)':>10}")
+    for size, chunks, embedded, elapsed in results:
+        print(f"{size:>6} {chunks:>8} {embedded:>9} {elapsed * 1000:>10.1f}")
@@ -0,0 +1,47 @@
+"""
+Benchmark: scanned-PDF OCR throughput vs. number of OCR processes.
+
+Run from the repository root (Tesseract must be installed):
+    TESSERACT_CMD=tesseract python -m benchmarks.bench_ocr [pages]
+
+Pages go through pdf_service.iter_pdf_pages, the path uploads take.
+Throughput should scale roughly with the number of worker processes, up
+to the number of cores.
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from benchmarks.scanned_pdf import make_scanned_pdf
+from services import ocr_service, pdf_service
+
+
+def run(pdf_path, workers):
+    ocr_service.OCR_WORKERS = pdf_service.OCR_WORKERS = workers
+    if ocr_service._ocr_pool is not None:
+        ocr_service._ocr_pool.shutdown()
+        ocr_service._ocr_pool = None
+
+    start = time.perf_counter()
+    text = "\n\n".join(pdf_service.iter_pdf_pages(pdf_path))
+    return time.perf_counter() - start, len(text)
+
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    tmp_dir = tempfile.mkdtemp(prefix="ocr_bench_")
+    try:
+        pdf_path = make_scanned_pdf(os.path.join(tmp_dir, "scanned.pdf"), pages=pages)
+
+        cores = os.cpu_count() or 1
+        worker_counts = sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+        results = [(w, *run(pdf_path, w)) for w in worker_counts]
+
+        print(f"\n📊 OCR of a {pages}-page scanned PDF ({cores} cores)")
+        print(f"{'workers':>8} {'time (s)':>9} {'pages/s':>8} {'chars':>8}")
+        for workers, elapsed, chars in results:
+            print(f"{workers:>8} {elapsed:>9.2f} {pages / elapsed:>8.2f} {chars:>8}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,75 @@
+"""
+Benchmark: per-page render + OCR preprocessing cost, before vs. after.
+
+Run from the repository root:
+    python -m benchmarks.bench_ocr_preprocess [pages]
+
+"legacy" is the old path (RGB pixmap → PNG bytes → PIL decode → two
+ImageEnhance passes); "numpy" renders straight to grayscale and enhances
+a view of the pixmap samples. Tesseract itself is excluded: its cost is
+the same for both. Each mode runs in its own process so peak RSS is
+measured independently.
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import tempfile
+import subprocess
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageEnhance
+
+from benchmarks.scanned_pdf import make_scanned_pdf
+from services.ocr_service import OCR_DPI, enhance_for_ocr, render_page_gray
+
+
+def legacy_prepare(page):
+    mat = fitz.Matrix(OCR_DPI / 72, OCR_DPI / 72)
+    pix = page.get_pixmap(matrix=mat)
+    img = Image.open(io.BytesIO(pix.tobytes("png")))
+    img = ImageEnhance.Contrast(img).enhance(2.0)
+    return ImageEnhance.Sharpness(img).enhance(1.5)
+
+
+def numpy_prepare(page):
+    gray, _pix = render_page_gray(page)
+    return Image.fromarray(enhance_for_ocr(gray), mode="L")
+
+
+def measure(mode, pdf_path):
+    prepare = legacy_prepare if mode == "legacy" else numpy_prepare
+    timings = []
+    with fitz.open(pdf_path) as pdf:
+        for page in pdf:
+            start = time.perf_counter()
+            prepare(page)
+            timings.append(time.perf_counter() - start)
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"ms_per_page": 1000 * sum(timings) / len(timings), "peak_rss_mb": peak_kb / 1024}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--child":
+        print(json.dumps(measure(sys.argv[2], sys.argv[3])))
+        sys.exit(0)
+
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    tmp_dir = tempfile.mkdtemp(prefix="ocr_prep_bench_")
+    try:
+        pdf_path = make_scanned_pdf(os.path.join(tmp_dir, "scanned.pdf"), pages=pages)
+        print(f"\n📊 Render + preprocess at {OCR_DPI} DPI ({pages} pages)")
+        print(f"{'mode':>8} {'ms/page':>9} {'peak RSS (MB)':>14}")
+        for mode in ("legacy", "numpy"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_ocr_preprocess", "--child", mode, pdf_path],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            result = json.loads(out)
+            print(f"{mode:>8} {result['ms_per_page']:>9.1f} {result['peak_rss_mb']:>14.1f}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
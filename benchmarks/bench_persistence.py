@@ -0,0 +1,71 @@
+"""
+Benchmark: cost of persisting one upload as the corpus grows.
+
+Run from the repository root:
+    python -m benchmarks.bench_persistence
+
+Compares the old full rewrite (save_local + keyword index + metadata
+pickle) with the write-ahead log append now done per batch, at growing
+corpus sizes, then reloads the store from snapshot + WAL and checks
+nothing was lost.
+"""
+import os
+import pickle
+import shutil
+import time
+
+from benchmarks.common import CountingEmbeddings, synthetic_document, use_temp_vectorstore
+
+CORPUS_SIZES = [50, 200, 800]
+
+
+def full_rewrite(vector_store, tmp_dir):
+    """What every upload batch used to write."""
+    start = time.perf_counter()
+    vector_store._vectorstore.save_local(os.path.join(tmp_dir, "faiss_index"))
+    vector_store._keyword_index.save(os.path.join(tmp_dir, "keyword_index.pkl"))
+    with open(os.path.join(tmp_dir, "metadata.pkl"), "wb") as f:
+        pickle.dump(vector_store.get_all_documents_metadata(), f)
+    return time.perf_counter() - start
+
+
+def reload(vector_store):
+    vector_store._loaded = False
+    vector_store._vectorstore = None
+    vector_store._keyword_index = None
+    vector_store._wal.close()
+    vector_store._load_vectorstore()
+
+
+if __name__ == "__main__":
+    embedder = CountingEmbeddings()
+    vector_store, tmp_dir = use_temp_vectorstore(embedder)
+    vector_store.FAISS_MMAP = False  # keep heap indexes, which the old full rewrite saves
+    results = []
+    try:
+        added = 0
+        for size in CORPUS_SIZES:
+            while added < size:
+                vector_store.add_document_to_vectorstore(synthetic_document(added), f"doc_{added}.pdf")
+                added += 1
+            if size == CORPUS_SIZES[1]:
+                vector_store.compact_vectorstore()
+
+            start = time.perf_counter()
+            vector_store.add_document_to_vectorstore(synthetic_document(10_000 + size), f"probe_{size}.pdf")
+            upload = time.perf_counter() - start
+            added_chunks = vector_store._vectorstore.index.ntotal
+            results.append((size, added_chunks, upload, full_rewrite(vector_store, tmp_dir)))
+
+        before = (vector_store._vectorstore.index.ntotal, len(vector_store.get_all_documents_metadata()), len(vector_store._keyword_index))
+        reload(vector_store)
+        after = (vector_store._vectorstore.index.ntotal, len(vector_store.get_all_documents_metadata()), len(vector_store._keyword_index))
+        assert before == after, f"state lost on reload: {before} != {after}"
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print("\n📊 Persisting one 20-page upload")
+    print(f"{'docs':>6} {'chunks':>8} {'upload w/ WAL (ms)':>19} {'old full rewrite (ms)':>22}")
+    for size, chunks, upload, rewrite in results:
+        print(f"{size:>6} {chunks:>8} {upload * 1000:>19.1f} {rewrite * 1000:>22.1f}")
+    print(f"\n✅ Reload from snapshot + WAL: {after[0]} chunks, {after[1]} documents")
@@ -0,0 +1,88 @@
+"""
+Benchmark: memory per chunk and recall of shortened / quantized vectors.
+
+Run from the repository root:
+    python -m benchmarks.bench_quantization --vectors 20000
+
+Indexes synthetic clustered 3072-d unit vectors at several sizes (shortened
+like the API's `dimensions` parameter: truncated and renormalised) and
+storage types (VECTOR_STORAGE), then measures recall@k against exact
+float32 search on the full-size vectors, with and without the
+full-precision re-rank of ANN_RERANK_FACTOR × k candidates. The synthetic
+dimensions are independent, so truncating them loses more than it does for
+text-embedding-3 vectors, which are trained to keep their leading
+dimensions informative; treat the shortened rows as a lower bound.
+"""
+import time
+import argparse
+
+import faiss
+import numpy as np
+
+from benchmarks.bench_ann import clustered_vectors
+from services.ann_index import VECTOR_STORAGES, new_flat_index
+
+FULL_DIM = 3072
+
+
+def shorten(vectors, dim):
+    short = np.ascontiguousarray(vectors[:, :dim])
+    return short / np.linalg.norm(short, axis=1, keepdims=True)
+
+
+def build(vectors, storage):
+    index = new_flat_index(vectors.shape[1], storage)
+    if not index.is_trained:
+        index.train(vectors[:64])  # the vector store trains on the first ingest batch
+    index.add(vectors)
+    return index
+
+
+def recall(index, vectors, queries, truth, k, factor):
+    hits = 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        _distances, labels = index.search(query.reshape(1, -1), k * factor)
+        candidates = labels[0][labels[0] != -1]
+        if factor > 1:
+            distances = ((vectors[candidates] - query) ** 2).sum(axis=1)
+            candidates = candidates[np.argsort(distances)[:k]]
+        hits += len(set(candidates[:k].tolist()) & set(expected.tolist()))
+    latency = (time.perf_counter() - start) / len(queries)
+    return hits / (len(queries) * k), latency * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dims", type=int, nargs="+", default=[3072, 1024, 256])
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    args = parser.parse_args()
+    k = args.k
+
+    data = clustered_vectors(args.vectors + args.queries, FULL_DIM)
+    exact = faiss.IndexFlatL2(FULL_DIM)
+    exact.add(data[:args.vectors])
+    _distances, truth = exact.search(data[args.vectors:], k)
+    del exact
+
+    rows = []
+    for dim in args.dims:
+        short = shorten(data, dim) if dim < FULL_DIM else data
+        vectors, queries = short[:args.vectors], short[args.vectors:]
+        for storage in VECTOR_STORAGES:
+            index = build(vectors, storage)
+            per_chunk = faiss.serialize_index(index).nbytes / index.ntotal
+            plain, plain_ms = recall(index, vectors, queries, truth, k, 1)
+            reranked, reranked_ms = recall(index, vectors, queries, truth, k, args.rerank_factor)
+            rows.append((dim, storage, per_chunk, plain, plain_ms, reranked, reranked_ms))
+            del index
+
+    print(f"\n📊 {args.vectors} chunks, recall@{k} vs exact full-size float32, {args.queries} queries")
+    print(f"{'dims':>5} {'storage':>8} {'B/chunk':>8} {'recall':>7} {'ms/q':>6} "
+          f"{'recall w/ rerank':>17} {'ms/q':>6}")
+    for dim, storage, per_chunk, plain, plain_ms, reranked, reranked_ms in rows:
+        print(f"{dim:>5} {storage:>8} {per_chunk:>8.0f} {plain:>7.3f} {plain_ms:>6.2f} "
+              f"{reranked:>17.3f} {reranked_ms:>6.2f}")
@@ -0,0 +1,52 @@
+"""
+Benchmark: per-stage retrieval latency with and without re-ranking.
+
+Run from the repository root:
+    python -m benchmarks.bench_rerank --documents 50
+
+Indexes synthetic documents, then runs the same queries through
+query_vectorstore without re-ranking and with RERANK_CANDIDATES candidates
+re-ranked (lexical scorer, or the cross-encoder when RERANKER=cross-encoder
+and sentence-transformers is installed). Prints the average time of each
+stage, to size RERANK_CANDIDATES / RERANK_BUDGET_MS.
+"""
+import shutil
+import argparse
+
+import numpy as np
+
+from benchmarks.common import CountingEmbeddings, synthetic_document, use_temp_vectorstore
+
+
+def run(vector_store, questions, rerank):
+    vector_store._stage_timings.clear()
+    for question in questions:
+        vector_store.query_vectorstore(question, rerank=rerank)
+    return vector_store.get_retrieval_stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    vector_store, tmp_dir = use_temp_vectorstore(CountingEmbeddings())
+    try:
+        for n in range(args.documents):
+            vector_store.add_document_to_vectorstore(synthetic_document(n), f"doc_{n}.pdf")
+
+        rng = np.random.default_rng(0)
+        questions = [" ".join(f"term{i}" for i in rng.integers(0, 5000, size=4)) for _ in range(args.queries)]
+        rows = [("off", run(vector_store, questions, False)), ("on", run(vector_store, questions, True))]
+
+        stages = ["semantic", "keyword", "fusion", "fetch", "rerank"]
+        print(f"\n📊 {vector_store._vectorstore.index.ntotal} chunks, {args.queries} queries, avg ms per stage")
+        print(f"{'rerank':>7} " + " ".join(f"{stage:>9}" for stage in stages) + f" {'total':>9}")
+        for label, stats in rows:
+            stage_ms = stats["stage_ms"]
+            print(f"{label:>7} " + " ".join(f"{stage_ms.get(stage, 0.0):>9.2f}" for stage in stages)
+                  + f" {sum(stage_ms.values()):>9.2f}")
+        print(f"\nRe-ranker: {rows[1][1]['reranker']}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,135 @@
+"""
+Benchmark: CPU time and SSE frames per streamed answer.
+
+Run from the repository root:
+    python -m benchmarks.bench_streaming --answers 50
+
+Streams synthetic answers (Markdown tables with separator rows, bullets
+and prose) from a fake chat model in small tokens, and pushes them
+through
+  before  the old pipeline: `buffer += token`, a regex per token, one
+          JSON frame per token, `full_answer += token`
+  after   generate_answer_stream's line-buffered separator filter plus
+          the chat route's frame coalescing (SSE_FRAME_MAX_CHARS / _DELAY_MS)
+and reports CPU time per answer, frames per answer and whether every
+separator row was removed with all data rows kept.
+"""
+import os
+import re
+import json
+import time
+import argparse
+from types import SimpleNamespace
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-placeholder")
+
+from config import langchain_config
+from config.langchain_config import generate_answer_stream, remove_second_row_from_all_tables
+from langchain_core.documents import Document
+from services.streaming import coalesce, sse_event
+
+
+def synthetic_answer(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    lines = ["**Perjanjian Pinjaman**", "", "| Field | Value |", "|---|---|"]
+    for i in range(rows):
+        lines.append(f"| Item {i} | RM{rng.integers(1000, 99999):,} |")
+    lines += ["", "Documents:", *[f"◉ Dokumen {i}" for i in range(rows // 4)], "", "| A | B |", "| :--- | ---: |",
+              "| 1 | 2 |", "", "---", "Summary of the terms above."]
+    return "\n".join(lines)
+
+
+def tokens_of(text, rng):
+    """Split text into 1–6 character tokens, the way a chat model streams it."""
+    tokens, i = [], 0
+    while i < len(text):
+        size = int(rng.integers(1, 7))
+        tokens.append(text[i:i + size])
+        i += size
+    return tokens
+
+
+class FakeChatClient:
+    """Stands in for OpenAI(): chat.completions.create(stream=True) yields the prepared tokens."""
+
+    def __init__(self):
+        self.tokens = []
+        self.interval = 0.0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **_kwargs):
+        for token in self.tokens:
+            if self.interval:
+                time.sleep(self.interval)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+
+def before(client):
+    """The previous generate_answer_stream + route loop."""
+    frames = 0
+    full_answer = ""
+    buffer = ""
+    for chunk in client.chat.completions.create(stream=True):
+        token = chunk.choices[0].delta.content
+        buffer += token
+        if re.match(r'^\s*\|?\s*[-: ]+\s*(\|\s*[-: ]+\s*)*\|?\s*$', token.strip()):
+            continue
+        full_answer += token
+        frames += 1
+        _frame = f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+    remove_second_row_from_all_tables(buffer)
+    return full_answer, frames
+
+
+def after(chunks):
+    frames = []
+    for text in coalesce(generate_answer_stream("question", chunks)):
+        frames.append(text)
+        _frame = sse_event({'type': 'token', 'content': text})
+    return "".join(frames), len(frames)
+
+
+def is_clean(answer, expected):
+    separators = [line for line in answer.splitlines() if re.match(r'^\s*\|[\s\-:|]*-[\s\-:|]*\|\s*$', line)]
+    return not separators and answer.splitlines() == expected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--answers", type=int, default=50)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--token-interval-ms", type=float, default=0.0,
+                        help="delay between fake tokens (frames then also close on SSE_FRAME_MAX_DELAY_MS)")
+    args = parser.parse_args()
+
+    client = FakeChatClient()
+    client.interval = args.token_interval_ms / 1000
+    langchain_config.client = client
+    chunks = [Document(page_content="Jumlah Pinjaman RM10,000", metadata={"filename": "offer.pdf"})]
+    rng = np.random.default_rng(0)
+
+    rows = []
+    for n_rows in args.rows:
+        text = synthetic_answer(n_rows)
+        expected = [line for line in text.splitlines() if line not in ("|---|---|", "| :--- | ---: |")]
+        answers = [tokens_of(text, rng) for _ in range(args.answers)]
+        for name, run in (("before", lambda: before(client)), ("after", lambda: after(chunks))):
+            cpu = 0.0
+            frames = 0
+            clean = True
+            for tokens in answers:
+                client.tokens = tokens
+                start = time.process_time()
+                answer, n_frames = run()
+                cpu += time.process_time() - start
+                frames += n_frames
+                clean = clean and is_clean(answer, expected)
+            n_tokens = sum(len(t) for t in answers) / len(answers)
+            rows.append((n_rows, name, n_tokens, cpu / len(answers) * 1000, frames / len(answers), clean))
+
+    print(f"\n📊 {args.answers} answers per size, fake model, {args.token_interval_ms} ms between tokens")
+    print(f"{'rows':>6} {'pipeline':>9} {'tokens':>8} {'CPU ms/answer':>14} {'frames/answer':>14} {'separators removed':>19}")
+    for n_rows, name, n_tokens, cpu_ms, frames, clean in rows:
+        print(f"{n_rows:>6} {name:>9} {n_tokens:>8.0f} {cpu_ms:>14.2f} {frames:>14.1f} {'yes' if clean else 'NO':>19}")
@@ -0,0 +1,84 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks never talk to OpenAI: they swap the embedding model for a
+local stand-in that returns deterministic vectors and counts its calls.
+"""
+import os
+import sys
+import hashlib
+import tempfile
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-placeholder")
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic hash-based embedder that counts API-equivalent calls."""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.calls = 0
+        self.texts_embedded = 0
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vec = np.random.default_rng(seed).standard_normal(self.dim).astype("float32")
+        return (vec / np.linalg.norm(vec)).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        self.texts_embedded += 1
+        return self._vector(text)
+
+    def reset(self):
+        self.calls = 0
+        self.texts_embedded = 0
+
+
+def synthetic_document(doc_no, pages=20, words_per_page=180):
+    """Generate a reproducible multi-page document body."""
+    rng = np.random.default_rng(doc_no)
+    vocab = [f"term{i}" for i in range(5000)]
+    pages_text = []
+    for page in range(pages):
+        words = rng.choice(vocab, size=words_per_page)
+        pages_text.append(f"Document {doc_no} page {page + 1}. " + " ".join(words))
+    return "\n\n".join(pages_text)
+
+
+def use_temp_vectorstore(embedder):
+    """Point services.vector_store at a fresh temp directory and the given embedder."""
+    from services import vector_store, document_store
+    from services.embedding_cache import ChunkEmbeddingCache
+
+    tmp_dir = tempfile.mkdtemp(prefix="vector_db_bench_")
+    vector_store.VECTOR_STORE_DIR = tmp_dir
+    vector_store.VECTOR_STORE_PATH = os.path.join(tmp_dir, "faiss_index")
+    vector_store.METADATA_PATH = os.path.join(tmp_dir, "metadata.pkl")
+    vector_store.KEYWORD_INDEX_PATH = os.path.join(tmp_dir, "keyword_index.pkl")
+    vector_store.INDEX_DIR = os.path.join(tmp_dir, "index")
+    document_store.DOCUMENTS_DB_PATH = os.path.join(tmp_dir, "documents.db")
+    document_store.init_db()
+    vector_store.embeddings = embedder
+    vector_store.chunk_embeddings = ChunkEmbeddingCache(
+        embedder, directory=os.path.join(tmp_dir, "embedding_cache"), namespace="bench"
+    )
+    vector_store._vectorstore = None
+    vector_store._loaded = False
+    vector_store._wal = None
+    vector_store._snapshot_generation = None
+    vector_store._keyword_index = None
+    vector_store._positions_by_id = None
+    vector_store._ann = None
+    vector_store._ann_pending = None
+    vector_store._ann_retry_at = None
+    return vector_store, tmp_dir
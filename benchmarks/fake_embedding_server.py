@@ -0,0 +1,114 @@
+"""
+Local stand-in for the OpenAI embeddings endpoint.
+
+Serves POST /v1/embeddings with deterministic vectors, and can inject
+latency and 429 responses so the embedding client's concurrency,
+backoff and rate limiting can be exercised without network access:
+
+    python -m benchmarks.fake_embedding_server --port 8089 --latency 0.2 --error-rate 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python app.py
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class FakeEmbeddingServer:
+    def __init__(self, port=0, dim=256, latency=0.05, error_rate=0.0, retry_after=0.1):
+        self.dim = dim
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rejected = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def vector(self, text, dimensions=None):
+        """Unit vector for `text`; `dimensions` shortens it like the real API (truncate + renormalise)."""
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vec = np.random.default_rng(seed).standard_normal(self.dim).astype("float32")[:dimensions]
+        return (vec / np.linalg.norm(vec)).tolist()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with server._lock:
+                    server.requests += 1
+                    server._in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server._in_flight)
+                try:
+                    time.sleep(server.latency)
+                    if random.random() < server.error_rate:
+                        with server._lock:
+                            server.rejected += 1
+                        self._send(
+                            429,
+                            {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                            {"Retry-After": str(server.retry_after)},
+                        )
+                        return
+
+                    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                    self._send(200, {
+                        "object": "list",
+                        "model": body.get("model"),
+                        "data": [
+                            {"object": "embedding", "index": i, "embedding": server.vector(text, body.get("dimensions"))}
+                            for i, text in enumerate(inputs)
+                        ],
+                        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                    })
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeEmbeddingServer(args.port, args.dim, args.latency, args.error_rate)
+    print(f"🧪 Fake embedding server on {server.base_url}")
+    server.httpd.serve_forever()
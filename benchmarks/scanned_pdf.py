@@ -0,0 +1,23 @@
+"""Generate scanned-looking (image-only) PDFs for the OCR benchmarks."""
+import fitz  # PyMuPDF
+
+from benchmarks.common import synthetic_document
+
+
+def make_scanned_pdf(path, pages=12, dpi=150):
+    """Write a PDF whose pages are raster images of text (no text layer)."""
+    text_pages = synthetic_document(0, pages=pages, words_per_page=120).split("\n\n")
+    source = fitz.open()
+    scanned = fitz.open()
+
+    for text in text_pages:
+        page = source.new_page()
+        page.insert_textbox(fitz.Rect(54, 54, 558, 738), text, fontsize=11)
+        pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72))
+        out = scanned.new_page(width=page.rect.width, height=page.rect.height)
+        out.insert_image(out.rect, pixmap=pix)
+
+    scanned.save(path)
+    source.close()
+    scanned.close()
+    return path
@@ -2,6 +2,15 @@ import os
 import re
 from dotenv import load_dotenv
 from openai import OpenAI
+from services.context_packer import (
+    CHAT_TOKEN_BUDGET,
+    ANSWER_MAX_TOKENS,
+    SUMMARY_MAX_TOKENS,
+    count_message_tokens,
+    pack_chunks,
+    truncate_tokens,
+)
+from services.streaming import SeparatorRowFilter
 
 # Load environment variables
 load_dotenv()
@@ -15,31 +24,21 @@ client = OpenAI(api_key=OPENAI_API_KEY)
 # Model configuration
 MODEL_NAME = os.getenv("CHAT_MODEL", "gpt-4o-mini")
 TEMPERATURE = float(os.getenv("MODEL_TEMPERATURE", "0.1"))
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", MODEL_NAME)
 
 
 # Helper: Prepare Document Context
 
-def build_context_from_chunks(relevant_chunks, limit=15000):
+def build_context_from_chunks(relevant_chunks, max_tokens=CHAT_TOKEN_BUDGET - ANSWER_MAX_TOKENS):
     """
-    Combine text chunks into a formatted context block.
-    Truncate if too long to prevent token overflow.
+    Combine ranked text chunks into a formatted context block of at most
+    `max_tokens` tokens (whole chunks, best first, overlaps removed).
     """
     if not relevant_chunks:
         return ""
 
-    context_parts = []
-    for i, chunk in enumerate(relevant_chunks, 1):
-        filename = chunk.metadata.get("filename", "Unknown")
-        content = chunk.page_content.strip()
-        if not content:
-            continue
-        context_parts.append(f"--- Section {i} (from {filename}) ---\n{content}")
-
-    context = "\n\n".join(context_parts).strip()
-
-    if len(context) > limit:
-        context = context[:limit] + "\n\n[Context truncated for length.]"
-
+    context, stats = pack_chunks(relevant_chunks, max_tokens)
+    print(f"🧩 Context: {stats['chunks']}/{stats['candidates']} chunks, {stats['tokens']} tokens")
     return context
 
 
@@ -94,58 +93,42 @@ def clean_and_format_answer(answer: str) -> str:
     return answer
 
 
-# Streaming Answer Function
-def generate_answer_stream(user_input, relevant_chunks):
-    """
-    True streaming response with live token output.
-    - Removes Markdown separator rows (|---|---| or dashed lines).
-    - Uses tables only for multi-row structured data.
-    - Uses direct text with heading for single answers.
-    """
-    try:
-        context = build_context_from_chunks(relevant_chunks)
-        if not context:
-            yield "⚠️ No information available."
-            return
-
-        messages = [
-            {
-                "role": "system",
-                "content": (
-                    "You are a **professional, context-aware document analysis assistant**.\n"
-                    "Your task is to read, understand, and extract precise information from the provided document text.\n"
-                    "You must always respond **strictly based on document content**.\n\n"
-                    "### Core Rules:\n"
-                    "1. Never guess, assume, or infer beyond the document.\n"
-                    "   If the answer is missing, reply exactly: ⚠️ No information available.\n"
-                    "2. Be **concise**, **factual**, and **neutral** — no greetings, filler, or opinions.\n"
-                    "3. Maintain **professional formatting** that fits the complexity of the data.\n\n"
-                    "### Formatting Logic:\n"
-                    "- **Heading** have a simple heading dynamically created even for single answer\n"
-                    "- **Single answer:** Use → `**Field:** Value`\n"
-                    "  Example →** Nama Peminjam:** ROBINJOT SINGH A/L SARBAN SINGH\n\n"
-                    "- **Multiple related details:** Use a clean, Markdown table.\n"
-                    "  Example:\n"
-                    "  | Borrower Name | John Doe |\n"
-                    "  | Identity Number | 041011101685 |\n\n"
-                    "- **Lists (multiple entries or items):** Use bullet points.\n"
-                    "  Example:\n"
-                    "  ◉ Surat Tawaran\n"
-                    "  ◉ Dokumen Perjanjian\n"
-                    "  ◉ Salinan Kad Pengenalan\n\n"
-                    "- **Hierarchical info (sections/subsections):** Use headings.\n"
-                    "  Example:\n"
-                    "  **Perjanjian Pinjaman**\n"
-                    "  | Tarikh | 10 Oktober 2025 |\n"
-                    "  | Jumlah Pinjaman | RM10,000 |\n\n"
-                    "- **Dates, amounts, and IDs** must match document exactly.\n"
-                    "- Do **not** add Markdown separator rows (|---|---|).\n"
-                    "- Do **not** include any explanations — only clean extracted data.\n"
-                ),
-            },
-            {
-                "role": "user",
-                "content": f"""QUESTION:
+# Prompt
+SYSTEM_PROMPT = (
+    "You are a **professional, context-aware document analysis assistant**.\n"
+    "Your task is to read, understand, and extract precise information from the provided document text.\n"
+    "You must always respond **strictly based on document content**.\n\n"
+    "### Core Rules:\n"
+    "1. Never guess, assume, or infer beyond the document.\n"
+    "   If the answer is missing, reply exactly: ⚠️ No information available.\n"
+    "2. Be **concise**, **factual**, and **neutral** — no greetings, filler, or opinions.\n"
+    "3. Maintain **professional formatting** that fits the complexity of the data.\n\n"
+    "### Formatting Logic:\n"
+    "- **Heading** have a simple heading dynamically created even for single answer\n"
+    "- **Single answer:** Use → `**Field:** Value`\n"
+    "  Example →** Nama Peminjam:** ROBINJOT SINGH A/L SARBAN SINGH\n\n"
+    "- **Multiple related details:** Use a clean, Markdown table.\n"
+    "  Example:\n"
+    "  | Borrower Name | John Doe |\n"
+    "  | Identity Number | 041011101685 |\n\n"
+    "- **Lists (multiple entries or items):** Use bullet points.\n"
+    "  Example:\n"
+    "  ◉ Surat Tawaran\n"
+    "  ◉ Dokumen Perjanjian\n"
+    "  ◉ Salinan Kad Pengenalan\n\n"
+    "- **Hierarchical info (sections/subsections):** Use headings.\n"
+    "  Example:\n"
+    "  **Perjanjian Pinjaman**\n"
+    "  | Tarikh | 10 Oktober 2025 |\n"
+    "  | Jumlah Pinjaman | RM10,000 |\n\n"
+    "- **Dates, amounts, and IDs** must match document exactly.\n"
+    "- Do **not** add Markdown separator rows (|---|---|).\n"
+    "- Do **not** include any explanations — only clean extracted data.\n"
+)
+
+
+def _user_prompt(user_input, context):
+    return f"""QUESTION:
 {user_input}
 
 DOCUMENT CONTEXT:
@@ -159,41 +142,124 @@ INSTRUCTIONS:
 5. DO NOT include separator rows with dashes (|---|---|).
 6. Keep concise, factual, and direct.
 
-FINAL ANSWER:""",
-            },
-        ]
+FINAL ANSWER:"""
+
+
+# Streaming Answer Function
+def generate_answer_stream(user_input, relevant_chunks, status=None):
+    """
+    True streaming response with live token output.
+    - Removes Markdown separator rows (|---|---| or dashed lines).
+    - Uses tables only for multi-row structured data.
+    - Uses direct text with heading for single answers.
+    - On failure an error message is streamed instead, and the error is
+      recorded in the optional `status` dict as status["error"].
+    """
+    try:
+        # Fit the context into what the prompt and answer leave of the budget
+        def build_messages(context):
+            return [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": _user_prompt(user_input, context)},
+            ]
+
+        fixed_tokens = count_message_tokens(build_messages(""))
+        context = build_context_from_chunks(relevant_chunks, CHAT_TOKEN_BUDGET - ANSWER_MAX_TOKENS - fixed_tokens)
+        if not context:
+            yield "⚠️ No information available."
+            return
+
+        messages = build_messages(context)
+        print(f"🧮 Prompt: {count_message_tokens(messages)} tokens (budget {CHAT_TOKEN_BUDGET - ANSWER_MAX_TOKENS})")
 
         # Start OpenAI stream
         stream = client.chat.completions.create(
             model=MODEL_NAME,
             temperature=TEMPERATURE,
             messages=messages,
-            max_tokens=600,
+            max_tokens=ANSWER_MAX_TOKENS,
             stream=True,
         )
  
         print(f"✅ True streaming answer using {MODEL_NAME}")
 
-        buffer = ""
+        # Drop table separator rows line by line, even when split across tokens
+        separator_filter = SeparatorRowFilter()
         for chunk in stream:
             delta = chunk.choices[0].delta
             if not delta or not delta.content:
                 continue
 
-            token = delta.content
-            buffer += token
-
-            # Skip markdown separator or dashed lines live
-            if re.match(r'^\s*\|?\s*[-: ]+\s*(\|\s*[-: ]+\s*)*\|?\s*$', token.strip()):
-                continue  # don't yield separator rows
+            text = separator_filter.feed(delta.content)
+            if text:
+                yield text
 
-            yield token
-
-        # Clean up final buffer internally (optional)
-        remove_second_row_from_all_tables(buffer)
+        tail = separator_filter.finish()
+        if tail:
+            yield tail
 
     except Exception as e:
         print(f"❌ Error generating streaming answer: {e}")
         import traceback
         traceback.print_exc()
+        if status is not None:
+            status["error"] = str(e)
         yield f"\n\n❌ Error: {str(e)}"
+
+
+# Conversation Summary (runs in the chat summary worker, off the request path)
+def summarize_conversation(summary, messages):
+    """Fold older chat messages into the running summary of a session."""
+    transcript = "\n".join(
+        f"{m['role'].upper()}: {truncate_tokens(m['content'], 1000)}" for m in messages
+    )
+    response = client.chat.completions.create(
+        model=SUMMARY_MODEL,
+        temperature=0,
+        max_tokens=SUMMARY_MAX_TOKENS,
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "You maintain the running summary of a conversation between a user and a document assistant.\n"
+                    "Merge the new turns into the current summary. Keep what the user asked about, the facts, "
+                    "figures, names, dates and documents mentioned, and anything left open.\n"
+                    "Drop tables, formatting and pleasantries. Reply with the updated summary only, "
+                    f"in at most {SUMMARY_MAX_TOKENS * 3 // 4} words."
+                ),
+            },
+            {
+                "role": "user",
+                "content": f"CURRENT SUMMARY:\n{summary or '(none)'}\n\nNEW TURNS:\n{transcript}",
+            },
+        ],
+    )
+    return response.choices[0].message.content.strip()
+
+
+# Search Query Rewriting (QUERY_REWRITE=llm, follow-up questions only)
+def rewrite_search_query(question, history, summary=""):
+    """Turn a follow-up question into a standalone search query using the recent turns."""
+    turns = "\n".join(
+        f"{m['role'].upper()}: {truncate_tokens(m['content'], 200)}" for m in history[-4:]
+    )
+    response = client.chat.completions.create(
+        model=SUMMARY_MODEL,
+        temperature=0,
+        max_tokens=60,
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "Rewrite the user's follow-up question as one standalone search query for a document search engine.\n"
+                    "Resolve pronouns and omitted subjects from the conversation. Keep names, numbers and the question's language.\n"
+                    "Reply with the query only."
+                ),
+            },
+            {
+                "role": "user",
+                "content": f"EARLIER CONVERSATION:\n{summary}\n{turns}\n\nFOLLOW-UP QUESTION:\n{question}",
+            },
+        ],
+    )
+    return response.choices[0].message.content.strip().strip('"')
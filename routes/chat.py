@@ -1,11 +1,37 @@
 from flask import Blueprint, request, jsonify, Response, stream_with_context
-from services.vector_store import query_vectorstore, get_all_documents_metadata
-from config.langchain_config import generate_answer_stream
-from services.chat_memory import get_chat_history, append_to_history, clear_chat_history
+from services.vector_store import query_vectorstore, get_all_documents_metadata, embed_question, get_index_version
+from services.answer_cache import answer_cache
+from services.context_packer import pack_history
+from services.query_rewriter import build_search_query
+from services.streaming import coalesce, sse_event
+from services.fusion import FUSION_METHODS
+from config.langchain_config import generate_answer_stream, summarize_conversation, rewrite_search_query
+from services.chat_memory import (
+    get_chat_history, get_chat_summary, append_to_history, clear_chat_history,
+    start_summary_worker, request_summary,
+)
 import json
 
 chat_bp = Blueprint('chat', __name__)
 
+
+def start_chat_workers():
+    """Start the background worker that keeps rolling conversation summaries."""
+    start_summary_worker(summarize_conversation)
+
+
+def _event_stream(events):
+    """Server-sent events response for a generator of `data:` frames."""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
 # Accept both '/api/chat' and '/api/chat/' and handle OPTIONS preflight
 @chat_bp.route('', methods=['POST', 'OPTIONS'])
 @chat_bp.route('/', methods=['POST', 'OPTIONS'])
@@ -28,6 +54,30 @@ def chat():
         if not question:
             return jsonify({'error': 'Question cannot be empty'}), 400
 
+        # --- Optional retrieval settings: {"fusion", "weights", "rrf_k", "top_k", "rerank"} ---
+        retrieval = data.get('retrieval') or {}
+        if not isinstance(retrieval, dict):
+            return jsonify({'error': 'retrieval must be an object'}), 400
+        fusion = retrieval.get('fusion')
+        if fusion is not None and fusion not in FUSION_METHODS:
+            return jsonify({'error': f"retrieval.fusion must be one of {', '.join(FUSION_METHODS)}"}), 400
+        weights = retrieval.get('weights')
+        if weights is not None and not (
+            isinstance(weights, dict)
+            and all(isinstance(w, (int, float)) for w in weights.values())
+        ):
+            return jsonify({'error': 'retrieval.weights must map source names to numbers'}), 400
+        try:
+            rrf_k = float(retrieval['rrf_k']) if retrieval.get('rrf_k') is not None else None
+            top_k = int(retrieval['top_k']) if retrieval.get('top_k') is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'retrieval.rrf_k and retrieval.top_k must be numbers'}), 400
+        if top_k is not None and top_k < 1:
+            return jsonify({'error': 'retrieval.top_k must be at least 1'}), 400
+        rerank = retrieval.get('rerank')
+        if rerank is not None and not isinstance(rerank, bool):
+            return jsonify({'error': 'retrieval.rerank must be true or false'}), 400
+
         print(f"\n{'='*60}")
         print(f"💬 Session ID: {session_id}")
         print(f"💬 User Question: {question}")
@@ -38,10 +88,17 @@ def chat():
         # --- Retrieve previous short-term memory ---
         chat_history = get_chat_history(session_id)
 
-        # --- Build conversation context from last few turns ---
-        conversation_context = ""
-        for msg in chat_history[-5:]:
-            conversation_context += f"\n{msg['role'].upper()}: {msg['content']}"
+        chat_summary = get_chat_summary(session_id)
+
+        # --- Rolling summary + latest turns, within HISTORY_TOKEN_BUDGET ---
+        conversation_context = pack_history(chat_history, summary=chat_summary)
+
+        # --- Standalone search query: follow-ups resolved against recent turns ---
+        search_query = build_search_query(
+            question, chat_history, chat_summary, session_id, rewrite=rewrite_search_query
+        )
+        if search_query != question:
+            print(f"🔁 Search query: {search_query}")
 
         # --- Combine chat memory + current question ---
         combined_input = (
@@ -49,8 +106,39 @@ def chat():
             f"User's new question:\n{question}"
         )
 
+        # --- Answer cache: a similar earlier question on the same index version ---
+        # (set "cache": false in the request to bypass it)
+        cache_key = None
+        if data.get('cache', True) is not False:
+            try:
+                cache_key = (
+                    embed_question(search_query),
+                    (document_id or '', json.dumps(retrieval, sort_keys=True)),
+                    get_index_version(),
+                )
+                cached = answer_cache.lookup(*cache_key)
+            except Exception as e:
+                print(f"⚠️ Answer cache unavailable: {e}")
+                cache_key, cached = None, None
+
+            if cached is not None:
+                print(f"♻️ Answer cache hit (similarity {cached['similarity']:.3f})")
+
+                def replay():
+                    yield sse_event({'type': 'sources', 'sources': cached['sources']})
+                    for token in cached['tokens']:
+                        yield sse_event({'type': 'token', 'content': token})
+                    yield sse_event({'type': 'done', 'session_id': session_id, 'cached': True})
+                    append_to_history(session_id, "user", question)
+                    append_to_history(session_id, "assistant", "".join(cached['tokens']))
+                    request_summary(session_id)
+
+                return _event_stream(replay())
+
         # --- Query your vector store for relevant document chunks ---
-        relevant_chunks = query_vectorstore(question, document_id)
+        relevant_chunks = query_vectorstore(
+            search_query, document_id, fusion=fusion, weights=weights, rrf_k=rrf_k, top_k=top_k, rerank=rerank
+        )
         if not relevant_chunks:
             return jsonify({
                 'answer': 'No relevant information found in the uploaded documents. Please make sure you have uploaded a document first.',
@@ -67,36 +155,37 @@ def chat():
                 sources.append({
                     'document_id': doc_id,
                     'filename': chunk.metadata.get('filename', 'Unknown'),
-                    'chunk_index': chunk.metadata.get('chunk_index', 0)
+                    'chunk_index': chunk.metadata.get('chunk_index', 0),
+                    'retrieval': chunk.metadata.get('retrieval')
                 })
 
         # --- Stream the response ---
         def generate():
-            full_answer = ""
+            frames = []
+            status = {}
             
             # Send sources first
-            yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
+            yield sse_event({'type': 'sources', 'sources': sources})
+            
+            # Stream the answer, tokens coalesced into frames (SSE_FRAME_MAX_CHARS / _DELAY_MS)
+            for text in coalesce(generate_answer_stream(combined_input, relevant_chunks, status)):
+                frames.append(text)
+                yield sse_event({'type': 'token', 'content': text})
+            full_answer = "".join(frames)
             
-            # Stream the answer token by token
-            for token in generate_answer_stream(combined_input, relevant_chunks):
-                full_answer += token
-                yield f"data: {json.dumps({'type': 'token', 'content': token})}\n\n"
+            # Only complete, successful answers are reused
+            if cache_key is not None and "error" not in status:
+                answer_cache.store(*cache_key, frames, sources)
             
             # Send completion signal
-            yield f"data: {json.dumps({'type': 'done', 'session_id': session_id})}\n\n"
+            yield sse_event({'type': 'done', 'session_id': session_id})
             
             # --- Update short-term memory after streaming completes ---
             append_to_history(session_id, "user", question)
             append_to_history(session_id, "assistant", full_answer)
+            request_summary(session_id)
 
-        return Response(
-            stream_with_context(generate()),
-            mimetype='text/event-stream',
-            headers={
-                'Cache-Control': 'no-cache',
-                'X-Accel-Buffering': 'no'
-            }
-        )
+        return _event_stream(generate())
 
     except Exception as e:
         print(f"❌ Chat error: {str(e)}")
@@ -121,7 +210,7 @@ def clear_memory():
 
 @chat_bp.route('/documents', methods=['GET'])
 def get_documents():
-    """List all uploaded documents"""
+    """List all uploaded documents with their status ('indexing' until searchable, then 'ready')"""
     try:
         metadata = get_all_documents_metadata()
         documents = []
@@ -129,6 +218,7 @@ def get_documents():
             documents.append({
                 'document_id': doc_id,
                 'filename': info.get('filename', 'Unknown'),
+                'status': info.get('status', 'ready'),
                 'total_chunks': info.get('total_chunks', 0)
             })
 
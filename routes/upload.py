@@ -1,24 +1,20 @@
 from flask import Blueprint, request, jsonify
 import os
 import sys
+import uuid
 from werkzeug.utils import secure_filename
-import io
-import fitz  # PyMuPDF
-from PIL import Image
-import pytesseract
-import numpy as np
+from itertools import chain
 from docx import Document
 
 # Import services
-from services.pdf_service import extract_text_from_pdf
-from services.vector_store import add_document_to_vectorstore, delete_document_from_vectorstore
+from services.pdf_service import iter_pdf_pages
+from services.ocr_service import extract_text_with_ocr
+from services.vector_store import add_document_to_vectorstore, delete_document_from_vectorstore, get_document_metadata
+from services.job_queue import enqueue_job, get_job, update_progress, start_workers
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# 🔧 Configure Tesseract path for Windows (adjust if needed)
-pytesseract.pytesseract.tesseract_cmd = r'C:\Users\robin\AppData\Local\Programs\Tesseract-OCR\tesseract.exe'
-
 upload_bp = Blueprint('upload', __name__)
 
 UPLOAD_FOLDER = 'uploads'
@@ -33,61 +29,6 @@ def allowed_file(filename):
 
 
 
-# 🧠 OCR Image Preprocessing
-
-def preprocess_image_for_ocr(image):
-    """Enhance image for better OCR accuracy."""
-    try:
-        from PIL import ImageEnhance
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(2.0)
-        enhancer = ImageEnhance.Sharpness(image)
-        image = enhancer.enhance(1.5)
-        return image
-    except Exception as e:
-        print(f"⚠️ Image preprocessing failed: {e}")
-        return image
-
-
-# 🔍 OCR Extraction (for scanned PDFs or images)
-
-def extract_text_with_ocr(input_path):
-    """Extract text from images or scanned PDFs using Tesseract."""
-    text_output = ""
-
-    # --- Image file (JPG, PNG, etc.)
-    if input_path.lower().endswith(('.png', '.jpg', '.jpeg')):
-        print(f"🧠 Running OCR on image: {input_path}")
-        try:
-            image = Image.open(input_path)
-            image = preprocess_image_for_ocr(image)
-            text_output = pytesseract.image_to_string(image, lang="eng", config='--oem 3 --psm 6')
-            print(f"✅ OCR extracted {len(text_output)} characters from image")
-        except Exception as e:
-            print(f"❌ OCR failed on image: {e}")
-        return text_output.strip()
-
-    # --- PDF file
-    try:
-        pdf_document = fitz.open(input_path)
-        total_pages = len(pdf_document)
-        print(f"📄 Performing OCR on {total_pages} pages...")
-        for i in range(total_pages):
-            page = pdf_document.load_page(i)
-            mat = fitz.Matrix(300 / 72, 300 / 72)
-            pix = page.get_pixmap(matrix=mat)
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            img = preprocess_image_for_ocr(img)
-            page_text = pytesseract.image_to_string(img, lang="eng", config='--oem 3 --psm 6')
-            text_output += f"\n\n--- Page {i+1} ---\n{page_text.strip()}"
-        pdf_document.close()
-        print(f"✅ OCR completed: {len(text_output)} characters extracted.")
-    except Exception as e:
-        print(f"❌ OCR extraction failed: {e}")
-
-    return text_output.strip()
-
-
 # 📘 Word Document Text Extraction
 
 def extract_text_from_docx(docx_path):
@@ -118,23 +59,114 @@ def extract_text_from_txt(txt_path):
         return ""
 
 
-# 🧩 Detect Scanned PDF
-def check_if_scanned_pdf(pdf_path):
-    """Detect if PDF is scanned (no text layer)."""
+# 🧩 Minimum-text check for streamed pages
+def require_text(pages, min_chars=10):
+    """
+    Pass through a stream of page texts, failing early if it holds fewer
+    than `min_chars` non-blank characters. Only the leading pages needed to
+    reach the threshold are buffered.
+    """
+    pages = iter(pages)
+    head = []
+    seen = 0
+    for page_text in pages:
+        head.append(page_text)
+        seen += len(page_text.strip())
+        if seen >= min_chars:
+            return chain(head, pages)
+    raise ValueError('No readable text extracted. File may be empty or image-only.')
+
+
+# ⚙️ Background ingestion (runs in the job queue workers)
+def process_upload_job(job):
+    """Extract, chunk, embed and index one uploaded file."""
+    job_id = job["job_id"]
+    payload = job["payload"]
+    filepath = payload["filepath"]
+    filename = payload["filename"]
+    file_ext = filename.rsplit('.', 1)[1].lower()
+
+    text_stats = {'chars': 0, 'ocr_pages': 0}
+    page_report = []
+
+    def on_pdf_page(page_number, method, total_pages, seconds):
+        if method == 'ocr':
+            text_stats['ocr_pages'] += 1
+        page_report.append({'page': page_number, 'method': method, 'ms': round(seconds * 1000, 1)})
+        update_progress(job_id, pages_total=total_pages, pages_done=page_number, pages_ocr_done=text_stats['ocr_pages'])
+
+    def embed_progress(done, total):
+        if total is None:
+            update_progress(job_id, stage='indexing', chunks_embedded=done)
+        else:
+            update_progress(job_id, stage='indexing', chunks_total=total, chunks_embedded=done)
+
+    def count_chars(pages):
+        for page_text in pages:
+            text_stats['chars'] += len(page_text)
+            yield page_text
+
     try:
-        pdf = fitz.open(pdf_path)
-        total_text = sum(len(pdf.load_page(i).get_text().strip()) for i in range(min(3, len(pdf))))
-        pdf.close()
-        return total_text < 100
+        update_progress(job_id, stage='extracting')
+
+        # --- Route based on file type ---
+        if file_ext == 'pdf':
+            # One pass over the PDF: text layer per page, OCR only where missing
+            pages = iter_pdf_pages(filepath, on_page=on_pdf_page)
+
+        elif file_ext == 'docx':
+            pages = [extract_text_from_docx(filepath)]
+
+        elif file_ext == 'txt':
+            pages = [extract_text_from_txt(filepath)]
+
+        elif file_ext in ['png', 'jpg', 'jpeg']:
+            pages = [extract_text_with_ocr(filepath)]
+            text_stats['ocr_pages'] = 1
+
+        # --- Validation ---
+        pages = require_text(pages)
+
+        # --- Store in vector DB (pages stream straight into the chunker) ---
+        document_id = add_document_to_vectorstore(
+            count_chars(pages), filename, document_id=payload["document_id"], progress=embed_progress
+        )
+        if document_id is None:
+            # Deleted while it was being indexed: nothing left to report on
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return {
+                'document_id': payload["document_id"],
+                'filename': filename,
+                'deleted': True,
+                'message': 'Document deleted during ingestion'
+            }
+        print(f"✅ Final extracted length: {text_stats['chars']} characters")
+        print(f"📦 Stored to vector store: {document_id}")
+        doc_meta = get_document_metadata(document_id) or {}
+
+        return {
+            'document_id': document_id,
+            'filename': filename,
+            'textLength': text_stats['chars'],
+            'ocrUsed': text_stats['ocr_pages'] > 0,
+            'ocrPages': text_stats['ocr_pages'],
+            'pages': page_report,
+            'cachedChunks': doc_meta.get('cached_chunks', 0),
+            'embeddedChunks': doc_meta.get('embedded_chunks', 0)
+        }
+
     except Exception:
-        return False
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        raise
 
 
 # 📤 Universal Upload Endpoint
 @upload_bp.route('', methods=['POST', 'OPTIONS'])
 @upload_bp.route('/', methods=['POST', 'OPTIONS'])
 def upload_file():
-    """Handle uploads for PDF, DOCX, TXT, and image files with OCR support."""
+    """Accept PDF, DOCX, TXT, and image uploads and queue them for ingestion."""
     filepath = None
     try:
         if request.method == 'OPTIONS':
@@ -148,7 +180,12 @@ def upload_file():
             return jsonify({'error': f'Unsupported file type. Allowed: {", ".join(ALLOWED_EXTENSIONS)}'}), 400
 
         filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
+        if not allowed_file(filename):
+            return jsonify({'error': 'Unsupported file type'}), 400
+
+        # Prefix with the document ID so concurrent uploads never collide
+        document_id = str(uuid.uuid4())
+        filepath = os.path.join(UPLOAD_FOLDER, f"{document_id}_{filename}")
         file.save(filepath)
 
         print(f"\n{'='*60}")
@@ -157,51 +194,21 @@ def upload_file():
         print(f"   Size: {os.path.getsize(filepath) / 1024:.2f} KB")
         print(f"{'='*60}\n")
 
-        file_ext = filename.rsplit('.', 1)[1].lower()
-        extracted_text = ""
-
-        # --- Route based on file type ---
-        if file_ext == 'pdf':
-            if check_if_scanned_pdf(filepath):
-                print("🔍 Scanned PDF detected. Using OCR...")
-                extracted_text = extract_text_with_ocr(filepath)
-            else:
-                extracted_text = extract_text_from_pdf(filepath)
-                if not extracted_text.strip():
-                    print("⚠️ Fallback to OCR (empty PDF text)...")
-                    extracted_text = extract_text_with_ocr(filepath)
-
-        elif file_ext == 'docx':
-            extracted_text = extract_text_from_docx(filepath)
-
-        elif file_ext == 'txt':
-            extracted_text = extract_text_from_txt(filepath)
-
-        elif file_ext in ['png', 'jpg', 'jpeg']:
-            extracted_text = extract_text_with_ocr(filepath)
-
-        else:
-            return jsonify({'error': 'Unsupported file type'}), 400
-
-        # --- Validation ---
-        if not extracted_text or len(extracted_text.strip()) < 10:
-            os.remove(filepath)
-            return jsonify({'error': 'No readable text extracted. File may be empty or image-only.', 'success': False}), 400
-
-        print(f"✅ Final extracted length: {len(extracted_text)} characters")
-
-        # --- Store in vector DB ---
-        document_id = add_document_to_vectorstore(extracted_text, filename)
-        print(f"📦 Stored to vector store: {document_id}")
+        job_id = enqueue_job({
+            'document_id': document_id,
+            'filename': filename,
+            'filepath': filepath,
+        })
+        print(f"🗂️ Queued ingestion job {job_id}")
 
         return jsonify({
             'success': True,
-            'message': 'File uploaded and processed successfully',
+            'message': 'File uploaded and queued for processing',
+            'job_id': job_id,
             'document_id': document_id,
             'filename': filename,
-            'textLength': len(extracted_text),
-            'ocrUsed': file_ext in ['png', 'jpg', 'jpeg']
-        }), 200
+            'status': 'queued'
+        }), 202
 
     except Exception as e:
         print(f"❌ UPLOAD ERROR: {e}")
@@ -211,6 +218,31 @@ def upload_file():
         return jsonify({'error': str(e), 'success': False}), 500
 
 
+# 📊 Job Status Endpoint
+@upload_bp.route('/jobs/<job_id>', methods=['GET'])
+def upload_job_status(job_id):
+    """Report the status and per-stage progress of an ingestion job."""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify({
+        'job_id': job['job_id'],
+        'document_id': job['payload'].get('document_id'),
+        'filename': job['payload'].get('filename'),
+        'status': job['status'],
+        'stage': job['stage'],
+        'progress': job['progress'],
+        'result': job['result'],
+        'error': job['error'],
+    }), 200
+
+
+def start_ingestion_workers():
+    """Start the background workers that process queued uploads."""
+    start_workers(process_upload_job)
+
+
 # 🗑️ DELETE ENDPOINT
 @upload_bp.route('/<document_id>', methods=['DELETE'])
 def delete_file(document_id):
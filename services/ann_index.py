@@ -0,0 +1,373 @@
+import os
+import json
+import math
+
+import faiss
+import numpy as np
+
+from services.chunk_store import IdColumns, write_id_columns
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+# Per-vector storage: float32 (4 B/dim), float16 (2 B/dim), sq8 (1 B/dim)
+VECTOR_STORAGES = ("float32", "float16", "sq8")
+
+# HNSW: graph degree, build and search beam widths
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+# IVF-PQ: inverted lists (0 = 4·√n), lists probed per query, PQ sub-quantizers (0 = dim / 16)
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+IVF_PQ_M = int(os.getenv("IVF_PQ_M", "0"))
+IVF_TRAIN_SIZE = int(os.getenv("IVF_TRAIN_SIZE", "100000"))
+_PQ_BITS = 8  # per sub-quantizer code: 2^8 centroids, each needing a training point
+
+
+def _pq_subquantizers(dim: int):
+    """Largest divisor of `dim` up to IVF_PQ_M (or dim / 16)."""
+    target = IVF_PQ_M or max(1, dim // 16)
+    return max(m for m in range(1, min(target, dim) + 1) if dim % m == 0)
+
+
+def _scalar_quantizer(storage: str):
+    if storage == "float16":
+        return faiss.ScalarQuantizer.QT_fp16
+    return faiss.ScalarQuantizer.QT_8bit_uniform
+
+
+def _widen_sq_range(index):
+    """
+    8-bit codes cover one value range for all dimensions. It is trained on
+    the first vectors seen, so widen it by 50% each way: later vectors are
+    rarely clipped, at a small loss of resolution.
+    """
+    index.sq.rangestat = faiss.ScalarQuantizer.RS_minmax
+    index.sq.rangestat_arg = 0.5
+
+
+def new_flat_index(dim: int, storage: str = "float32"):
+    """Exact (brute-force) index storing vectors as float32, float16 or 8-bit codes."""
+    if storage == "float32":
+        return faiss.IndexFlatL2(dim)
+    index = faiss.IndexScalarQuantizer(dim, _scalar_quantizer(storage), faiss.METRIC_L2)
+    _widen_sq_range(index)
+    return index
+
+
+def _flat_like(ivf):
+    """An empty flat index storing vectors like the to_mappable index `ivf`."""
+    if isinstance(ivf, faiss.IndexIVFScalarQuantizer):
+        index = faiss.IndexScalarQuantizer(ivf.d, ivf.sq.qtype, faiss.METRIC_L2)
+        index.sq = ivf.sq
+        index.is_trained = True
+        return index
+    return faiss.IndexFlatL2(ivf.d)
+
+
+def _list_codes(ivf):
+    """The codes of a to_mappable index's list, one row per vector (a view)."""
+    n = ivf.invlists.list_size(0)
+    if not n:
+        return np.zeros((0, ivf.code_size), dtype="uint8")
+    return faiss.rev_swig_ptr(ivf.invlists.get_codes(0), n * ivf.code_size).reshape(n, ivf.code_size)
+
+
+def to_mappable(index):
+    """
+    The codes of a flat index (or a SnapshotIndex) as a one-list IVF
+    index, for snapshots: searching it is still exact, and faiss 1.7 can
+    memory-map IVF lists (IO_FLAG_MMAP) but reads flat codes into the heap.
+    """
+    if isinstance(index, SnapshotIndex):
+        flat, codes = index.delta, index.codes().reshape(-1)
+    else:
+        flat, codes = index, faiss.vector_to_array(index.codes)
+
+    dim = flat.d
+    quantizer = faiss.IndexFlatL2(dim)
+    quantizer.add(np.zeros((1, dim), dtype="float32"))
+    if isinstance(flat, faiss.IndexScalarQuantizer):
+        ivf = faiss.IndexIVFScalarQuantizer(quantizer, dim, 1, flat.sq.qtype, faiss.METRIC_L2, False)
+        ivf.sq = flat.sq
+    else:
+        ivf = faiss.IndexIVFFlat(quantizer, dim, 1, faiss.METRIC_L2)
+    ivf.is_trained = True
+
+    n = len(codes) // flat.code_size
+    if n:
+        ids = np.arange(n, dtype="int64")  # list order == flat position
+        ivf.invlists.add_entries(0, n, faiss.swig_ptr(ids), faiss.swig_ptr(codes))
+        ivf.ntotal = n
+    return ivf
+
+
+def from_mappable(ivf):
+    """A writable flat index holding the codes of a to_mappable index."""
+    index = _flat_like(ivf)
+    codes = _list_codes(ivf)
+    if len(codes):
+        faiss.copy_array_to_vector(codes.reshape(-1).copy(), index.codes)
+        index.ntotal = len(codes)
+    return index
+
+
+class SnapshotIndex:
+    """
+    Exact index over a memory-mapped snapshot (a to_mappable index, read
+    only, its pages shared by worker processes through the OS cache) plus
+    a heap index of the vectors added since. Removed snapshot rows are
+    tombstoned and excluded inside the search by an ID selector; compaction
+    writes the live vectors into the next snapshot.
+
+    Positions number the live snapshot rows, then the delta rows, and shift
+    down on removal as in a flat index (as ColumnarIdMap does).
+    """
+
+    is_trained = True
+
+    def __init__(self, base):
+        self.base = base
+        self.d = base.d
+        self.delta = _flat_like(base)
+        self._removed = np.zeros(0, dtype=np.int64)  # sorted snapshot rows
+        self._shift = self._removed
+        self._params = None
+        self._selectors = None
+
+    def _live(self):
+        return self.base.ntotal - len(self._removed)
+
+    @property
+    def ntotal(self):
+        return self._live() + self.delta.ntotal
+
+    def _rows(self, positions):
+        """Snapshot rows of live snapshot positions."""
+        return positions + np.searchsorted(self._shift, positions, side="right")
+
+    def _search_params(self):
+        if self._params is None and len(self._removed):
+            # The SWIG wrappers do not keep selectors alive: hold them here
+            removed = faiss.IDSelectorBatch(self._removed)
+            self._selectors = (removed, faiss.IDSelectorNot(removed))
+            self._params = faiss.SearchParametersIVF(sel=self._selectors[1], nprobe=1)
+        return self._params
+
+    def train(self, vectors):
+        pass
+
+    def add(self, vectors):
+        self.delta.add(vectors)
+
+    def remove_ids(self, positions):
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        live = self._live()
+        snapshot = positions[positions < live]
+        if len(snapshot):
+            self._removed = np.union1d(self._removed, self._rows(snapshot))
+            self._shift = self._removed - np.arange(len(self._removed))
+            self._params = None
+        delta = positions[positions >= live] - live
+        if len(delta):
+            self.delta.remove_ids(delta)
+        return len(positions)
+
+    def search(self, queries, k: int, params=None):
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        distances, rows = self.base.search(queries, k, params=self._search_params())
+        positions = np.where(rows >= 0, rows - np.searchsorted(self._removed, rows), -1)
+        if self.delta.ntotal:
+            delta_distances, delta_positions = self.delta.search(queries, k)
+            distances = np.hstack([distances, delta_distances])
+            positions = np.hstack([positions, np.where(delta_positions >= 0, delta_positions + self._live(), -1)])
+            order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+            distances = np.take_along_axis(distances, order, axis=1)
+            positions = np.take_along_axis(positions, order, axis=1)
+        return distances, positions
+
+    def reconstruct_batch(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        vectors = np.empty((len(positions), self.d), dtype="float32")
+        live = self._live()
+        in_snapshot = positions < live
+        if in_snapshot.any():
+            vectors[in_snapshot] = self.base.reconstruct_batch(self._rows(positions[in_snapshot]))
+        if not in_snapshot.all():
+            vectors[~in_snapshot] = self.delta.reconstruct_batch(positions[~in_snapshot] - live)
+        return vectors
+
+    def reconstruct(self, position: int):
+        return self.reconstruct_batch([position])[0]
+
+    def codes(self):
+        """Codes of the live vectors in position order."""
+        snapshot = _list_codes(self.base)
+        keep = np.ones(len(snapshot), dtype=bool)
+        keep[self._removed] = False
+        delta = faiss.vector_to_array(self.delta.codes).reshape(-1, self.delta.code_size)
+        return np.concatenate([snapshot[keep], delta])
+
+
+def _ivf_nlist(n_vectors: int):
+    nlist = IVF_NLIST or int(4 * math.sqrt(max(n_vectors, 1)))
+    training = min(n_vectors, IVF_TRAIN_SIZE)
+    return max(1, min(nlist, training // 39 or 1))  # faiss wants ≥ 39 training points per list
+
+
+def can_train(kind: str, n_vectors: int) -> bool:
+    """
+    Whether a `kind` index over `n_vectors` gets enough training points
+    (up to IVF_TRAIN_SIZE of them): IVF-PQ needs 39 per list and one per
+    PQ centroid. HNSW needs no training.
+    """
+    if kind != "ivfpq":
+        return True
+    return min(n_vectors, IVF_TRAIN_SIZE) >= max(39 * _ivf_nlist(n_vectors), 2 ** _PQ_BITS)
+
+
+def new_index(kind: str, dim: int, n_vectors: int, storage: str = "float32"):
+    """An empty FAISS index of `kind` sized for about `n_vectors` vectors."""
+    if kind == "hnsw":
+        if storage == "float32":
+            index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        else:
+            index = faiss.IndexHNSWSQ(dim, _scalar_quantizer(storage), HNSW_M)
+            _widen_sq_range(faiss.downcast_index(index.storage))
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return index
+
+    if kind == "ivfpq":
+        nlist = _ivf_nlist(n_vectors)
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, _pq_subquantizers(dim), _PQ_BITS)
+        index.nprobe = min(IVF_NPROBE, nlist)
+        return index
+
+    raise ValueError(f"Unknown ANN index type: {kind}")
+
+
+class AnnIndex:
+    """
+    Approximate nearest-neighbour index (HNSW or IVF-PQ) over chunk vectors.
+
+    FAISS labels are insertion numbers; they map to vector IDs through the
+    ID columns of the snapshot it was loaded from plus a list of later
+    additions. HNSW cannot remove nodes, so deleted labels are tombstoned
+    and excluded inside the search by an ID selector; the owner rebuilds
+    the index once too many accumulate.
+    """
+
+    def __init__(self, kind: str, index, columns: IdColumns | None = None, deleted=()):
+        self.kind = kind
+        self.index = index
+        self.columns = columns  # IDs of labels stored in a snapshot
+        self._ids = []  # IDs of labels added since ("" once deleted)
+        self._labels = {}  # vector ID → label for self._ids
+        self._deleted = set(deleted)
+        self._params = None
+        self._selectors = None
+
+    @property
+    def _base(self):
+        return len(self.columns) if self.columns is not None else 0
+
+    def __len__(self):
+        """Live (not deleted) vectors."""
+        return self.index.ntotal - len(self._deleted)
+
+    @property
+    def deleted(self):
+        return len(self._deleted)
+
+    def train(self, vectors):
+        if not self.index.is_trained:
+            self.index.train(np.ascontiguousarray(vectors, dtype="float32"))
+
+    def _label(self, vector_id: str):
+        label = self._labels.get(vector_id)
+        if label is None and self.columns is not None:
+            label = self.columns.row(vector_id)
+        if label is None or label in self._deleted:
+            return None
+        return label
+
+    def add(self, vector_ids, vectors):
+        label = self.index.ntotal
+        self.index.add(np.ascontiguousarray(vectors, dtype="float32"))
+        for vector_id in vector_ids:
+            self._ids.append(vector_id)
+            self._labels[vector_id] = label
+            label += 1
+
+    def remove(self, vector_ids):
+        for vector_id in vector_ids:
+            label = self._label(vector_id)
+            if label is None:
+                continue
+            self._deleted.add(label)
+            if label >= self._base:
+                self._ids[label - self._base] = ""
+                del self._labels[vector_id]
+        self._params = None
+
+    def _search_params(self):
+        if self._params is None:
+            selector = None
+            if self._deleted:
+                # The SWIG wrappers do not keep selectors alive: hold them here
+                deleted = faiss.IDSelectorBatch(np.fromiter(self._deleted, dtype="int64"))
+                self._selectors = (deleted, faiss.IDSelectorNot(deleted))
+                selector = self._selectors[1]
+            if self.kind == "hnsw":
+                self._params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.index.hnsw.efSearch)
+            else:
+                self._params = faiss.SearchParametersIVF(sel=selector, nprobe=self.index.nprobe)
+        return self._params
+
+    def search(self, query, k: int):
+        """Vector IDs of the (approximate) k nearest neighbours of one query vector."""
+        _distances, labels = self.index.search(
+            np.asarray(query, dtype="float32").reshape(1, -1), k, params=self._search_params()
+        )
+        return [self.id_at(int(label)) for label in labels[0] if label != -1]
+
+    def id_at(self, label: int) -> str:
+        if label < self._base:
+            return self.columns.id_at(label)
+        return self._ids[label - self._base]
+
+    def frozen_ids(self):
+        """Label → ID order ("" for deleted labels), unaffected by later writes."""
+        base, extra, deleted = self._base, list(self._ids), set(self._deleted)
+
+        def ids():
+            for label in range(base):
+                yield "" if label in deleted else self.columns.id_at(label)
+            yield from extra
+
+        return ids()
+
+
+def write_ann(directory: str, kind: str, index_bytes, label_ids):
+    """Write a serialized ANN index and its label → ID columns."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "index.faiss"), "wb") as f:
+        f.write(index_bytes.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    write_id_columns(os.path.join(directory, "ids"), label_ids)
+    with open(os.path.join(directory, "params.json"), "w", encoding="utf-8") as f:
+        json.dump({"kind": kind}, f)
+
+
+def read_ann(directory: str):
+    """Load an index written by write_ann (None if there is none)."""
+    params_path = os.path.join(directory, "params.json")
+    if not os.path.exists(params_path):
+        return None
+    with open(params_path, "r", encoding="utf-8") as f:
+        kind = json.load(f)["kind"]
+
+    columns = IdColumns(os.path.join(directory, "ids"))
+    deleted = np.flatnonzero(columns.ids == b"").tolist()
+    return AnnIndex(kind, faiss.read_index(os.path.join(directory, "index.faiss")), columns, deleted)
@@ -0,0 +1,141 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Cosine similarity a new question needs to reuse an earlier answer
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))  # seconds
+
+
+class AnswerCache:
+    """
+    Bounded LRU cache of streamed answers, matched by question embedding.
+
+    Entries are grouped by scope (document filter + retrieval options).
+    Each scope remembers the index version its answers were generated
+    against; once an upload or delete bumps the version, the scope's
+    answers are dropped on the next lookup. Within a scope the best match
+    is one matrix-vector product over the cached question vectors.
+    """
+
+    def __init__(self, max_size: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key → entry dict, least recently used first
+        self._scopes = {}  # scope → {"version", "keys", "vectors" (stacked on demand)}
+        self._next_key = 0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        scope = self._scopes[entry["scope"]]
+        scope["keys"].remove(key)
+        scope["vectors"] = None
+        if not scope["keys"]:
+            del self._scopes[entry["scope"]]
+
+    def _scope(self, scope, version: int):
+        """The scope's state, emptied first if its answers predate `version`."""
+        state = self._scopes.get(scope)
+        if state is not None and state["version"] < version:
+            self.invalidations += len(state["keys"])
+            for key in list(state["keys"]):
+                self._drop(key)
+            state = None
+        return state
+
+    def lookup(self, vector, scope, version: int):
+        """The cached entry for the closest earlier question, or None."""
+        vector = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            state = self._scope(scope, version)
+            if state is None or state["version"] != version:
+                self.misses += 1
+                return None
+            if state["vectors"] is None:
+                state["vectors"] = np.stack([self._entries[key]["vector"] for key in state["keys"]])
+
+            similarities = state["vectors"] @ vector
+            best = int(np.argmax(similarities))
+            key = state["keys"][best]
+            entry = self._entries[key]
+            if entry["expires"] <= now:
+                self.expirations += 1
+                self._drop(key)
+                entry = None
+            if entry is None or similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return {**entry, "similarity": float(similarities[best])}
+
+    def store(self, vector, scope, version: int, tokens, sources):
+        """Remember an answer (its streamed tokens and sources) for a question."""
+        if self.max_size <= 0:
+            return
+        now = time.time()
+        with self._lock:
+            state = self._scope(scope, version)
+            if state is not None and state["version"] > version:
+                return  # generated against an index that has changed since
+
+            if len(self._entries) >= self.max_size:
+                for key in [k for k, e in self._entries.items() if e["expires"] <= now]:
+                    self.expirations += 1
+                    self._drop(key)
+            while len(self._entries) >= self.max_size:
+                self.evictions += 1
+                self._drop(next(iter(self._entries)))
+            state = self._scopes.setdefault(scope, {"version": version, "keys": [], "vectors": None})
+
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = {
+                "scope": scope,
+                "vector": self._unit(vector),
+                "tokens": list(tokens),
+                "sources": sources,
+                "expires": now + self.ttl,
+            }
+            state["keys"].append(key)
+            state["vectors"] = None
+
+    def stats(self):
+        """Hit/miss and eviction counters for monitoring."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "scopes": len(self._scopes),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+answer_cache = AnswerCache()
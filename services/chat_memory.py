@@ -1,21 +1,354 @@
 # services/chat_memory.py
 
-from collections import defaultdict
+import os
+import time
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# 💬 Short-term chat memory: "memory" (per process) or "sqlite" (shared by all workers)
+CHAT_MEMORY_BACKEND = os.getenv("CHAT_MEMORY_BACKEND", "memory").lower()
+CHAT_MEMORY_MAX_MESSAGES = int(os.getenv("CHAT_MEMORY_MAX_MESSAGES", "10"))  # per session
+CHAT_MEMORY_MAX_SESSIONS = int(os.getenv("CHAT_MEMORY_MAX_SESSIONS", "10000"))
+CHAT_MEMORY_TTL = float(os.getenv("CHAT_MEMORY_TTL", str(24 * 3600)))  # seconds since last use
+CHAT_MEMORY_DB_PATH = os.getenv("CHAT_MEMORY_DB_PATH", os.path.join("./vector_db", "chat_memory.db"))
+# Raw messages kept next to the rolling summary; older ones are folded into it
+CHAT_MEMORY_KEEP_MESSAGES = int(os.getenv("CHAT_MEMORY_KEEP_MESSAGES", "4"))
+
+
+def _size(content: str) -> int:
+    return len(content.encode("utf-8"))
+
+
+class InMemoryChatMemory:
+    """
+    Per-process memory: the last `max_messages` of each session in a
+    bounded deque plus its rolling summary, sessions kept in LRU order, at
+    most `max_sessions` of them, each expiring `ttl` seconds after its
+    last use.
+    """
+
+    def __init__(self, max_messages=CHAT_MEMORY_MAX_MESSAGES, max_sessions=CHAT_MEMORY_MAX_SESSIONS,
+                 ttl=CHAT_MEMORY_TTL):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # session_id → {"messages", "summary", "seq", "bytes", "used"}
+        self._bytes = 0
+
+    def _drop(self, session_id):
+        self._bytes -= self._sessions.pop(session_id)["bytes"]
+
+    def _expire(self, now):
+        # Least recently used first, so stop at the first live session
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session["used"] + self.ttl > now:
+                break
+            self._drop(session_id)
+            self.expirations += 1
+
+    def get(self, session_id):
+        with self._lock:
+            self._expire(time.time())
+            session = self._sessions.get(session_id)
+            return list(session["messages"]) if session else []
+
+    def get_summary(self, session_id):
+        with self._lock:
+            self._expire(time.time())
+            session = self._sessions.get(session_id)
+            return session["summary"] if session else ""
+
+    def append(self, session_id, role, content):
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                while len(self._sessions) >= self.max_sessions:
+                    self._drop(next(iter(self._sessions)))
+                    self.evictions += 1
+                session = self._sessions[session_id] = {
+                    "messages": deque(maxlen=self.max_messages), "summary": "", "seq": 0, "bytes": 0, "used": now,
+                }
+            messages = session["messages"]
+            if len(messages) == messages.maxlen:
+                dropped = _size(messages[0]["content"])
+                session["bytes"] -= dropped
+                self._bytes -= dropped
+            session["seq"] += 1
+            messages.append({"role": role, "content": content, "seq": session["seq"]})
+            session["bytes"] += _size(content)
+            self._bytes += _size(content)
+            session["used"] = now
+            self._sessions.move_to_end(session_id)
+
+    def fold(self, session_id, upto_seq, summary, previous_summary):
+        """
+        Replace messages up to `upto_seq` by `summary`, unless the summary
+        changed since it was read as `previous_summary`.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session["summary"] != previous_summary:
+                return False
+            messages = session["messages"]
+            freed = _size(session["summary"]) - _size(summary)
+            while messages and messages[0]["seq"] <= upto_seq:
+                freed += _size(messages.popleft()["content"])
+            session["summary"] = summary
+            session["bytes"] -= freed
+            self._bytes -= freed
+            return True
+
+    def clear(self, session_id):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.time())
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SqliteChatMemory:
+    """
+    Memory shared by all worker processes through one SQLite database
+    (WAL mode), created on first use. Each session keeps its last
+    `max_messages` and its rolling summary; expired sessions and those
+    beyond `max_sessions` (least recently used first) are purged every
+    `purge_every` writes.
+    """
+
+    def __init__(self, path=CHAT_MEMORY_DB_PATH, max_messages=CHAT_MEMORY_MAX_MESSAGES,
+                 max_sessions=CHAT_MEMORY_MAX_SESSIONS, ttl=CHAT_MEMORY_TTL, purge_every=100):
+        self.path = path
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._initialized = False  # tables created on first use, not on import
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connect(self):
+        if not self._initialized:
+            self.init_db()
+        conn = self._open()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def init_db(self):
+        """Create the sessions and messages tables if needed (done on first use)."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = self._open()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(session_id TEXT PRIMARY KEY, used_at REAL NOT NULL, summary TEXT NOT NULL DEFAULT '')"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_used ON sessions (used_at)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL REFERENCES sessions (session_id) ON DELETE CASCADE,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+        finally:
+            conn.close()
+        self._initialized = True
+
+    def get(self, session_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT used_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None or row[0] + self.ttl <= time.time():
+                return []
+            rows = conn.execute(
+                "SELECT id, role, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_messages),
+            ).fetchall()
+        return [{"role": role, "content": content, "seq": seq} for seq, role, content in reversed(rows)]
+
+    def get_summary(self, session_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT summary FROM sessions WHERE session_id = ? AND used_at > ?",
+                (session_id, time.time() - self.ttl),
+            ).fetchone()
+        return row[0] if row else ""
+
+    def fold(self, session_id, upto_seq, summary, previous_summary):
+        """
+        Replace messages up to `upto_seq` by `summary`, unless the summary
+        changed since it was read as `previous_summary` (another worker
+        folded first).
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT summary FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None or row[0] != previous_summary:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute("DELETE FROM messages WHERE session_id = ? AND id <= ?", (session_id, upto_seq))
+            conn.execute("UPDATE sessions SET summary = ? WHERE session_id = ?", (summary, session_id))
+            conn.execute("COMMIT")
+        return True
+
+    def append(self, session_id, role, content):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # A session past its TTL starts over
+            conn.execute("DELETE FROM sessions WHERE session_id = ? AND used_at <= ?", (session_id, now - self.ttl))
+            conn.execute(
+                "INSERT INTO sessions (session_id, used_at) VALUES (?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET used_at = excluded.used_at",
+                (session_id, now),
+            )
+            conn.execute(
+                "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)", (session_id, role, content)
+            )
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id <= "
+                "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (session_id, session_id, self.max_messages),
+            )
+            conn.execute("COMMIT")
+
+        with self._writes_lock:
+            self._writes += 1
+            purge = self._writes % self.purge_every == 0
+        if purge:
+            self.purge()
+
+    def purge(self):
+        """Drop expired sessions, then the least recently used beyond max_sessions."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM sessions WHERE used_at <= ?", (time.time() - self.ttl,))
+            conn.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,),
+            )
+            conn.execute("COMMIT")
+
+    def clear(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def stats(self):
+        with self._connect() as conn:
+            sessions = conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE used_at > ?", (time.time() - self.ttl,)
+            ).fetchone()[0]
+            held = conn.execute("SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM messages").fetchone()[0]
+            held += conn.execute("SELECT COALESCE(SUM(LENGTH(CAST(summary AS BLOB))), 0) FROM sessions").fetchone()[0]
+        return {"backend": "sqlite", "sessions": sessions, "bytes": held}
+
+
+if CHAT_MEMORY_BACKEND == "sqlite":
+    _backend = SqliteChatMemory()
+elif CHAT_MEMORY_BACKEND == "memory":
+    _backend = InMemoryChatMemory()
+else:
+    raise ValueError("❌ CHAT_MEMORY_BACKEND must be 'memory' or 'sqlite'")
 
-# simple in-memory store { session_id: [ {role, content}, ... ] }
-_memory_store = defaultdict(list)
 
 def get_chat_history(session_id):
-    """Retrieve chat history for a session"""
-    return _memory_store.get(session_id, [])
+    """Retrieve chat history for a session (messages not yet folded into its summary)"""
+    return _backend.get(session_id)
+
+def get_chat_summary(session_id):
+    """Rolling summary of a session's older messages ("" if none yet)"""
+    return _backend.get_summary(session_id)
 
 def append_to_history(session_id, role, content):
-    """Add a message to the session memory"""
-    _memory_store[session_id].append({"role": role, "content": content})
-    # keep memory short (last 10 messages)
-    _memory_store[session_id] = _memory_store[session_id][-10:]
+    """Add a message to the session memory (keeps the last CHAT_MEMORY_MAX_MESSAGES)"""
+    _backend.append(session_id, role, content)
 
 def clear_chat_history(session_id):
     """Clear a session's memory"""
-    if session_id in _memory_store:
-        del _memory_store[session_id]
+    _backend.clear(session_id)
+
+def get_memory_stats():
+    """Session count and message bytes held by the memory backend"""
+    return _backend.stats()
+
+
+# 📝 Rolling summaries, built off the request path
+_summarize = None
+_summary_queue = queue.Queue()
+_summary_pending = set()
+_summary_lock = threading.Lock()
+
+
+def start_summary_worker(summarize):
+    """
+    Start the background thread that folds messages older than the last
+    CHAT_MEMORY_KEEP_MESSAGES into each session's summary.
+    `summarize(summary, messages)` returns the updated summary.
+    """
+    global _summarize
+    with _summary_lock:
+        if _summarize is not None:
+            return
+        _summarize = summarize
+    threading.Thread(target=_summary_worker, daemon=True, name="chat-summary").start()
+    print("📝 Chat summary worker started")
+
+def request_summary(session_id):
+    """Queue a session for summarization (no-op without the worker or if already queued)"""
+    if _summarize is None:
+        return
+    with _summary_lock:
+        if session_id in _summary_pending:
+            return
+        _summary_pending.add(session_id)
+    _summary_queue.put(session_id)
+
+def _summary_worker():
+    while True:
+        session_id = _summary_queue.get()
+        with _summary_lock:
+            _summary_pending.discard(session_id)
+        try:
+            messages = _backend.get(session_id)
+            if len(messages) <= CHAT_MEMORY_KEEP_MESSAGES:
+                continue
+            older = messages[:-CHAT_MEMORY_KEEP_MESSAGES] if CHAT_MEMORY_KEEP_MESSAGES else messages
+            previous = _backend.get_summary(session_id)
+            summary = _summarize(previous, older)
+            if _backend.fold(session_id, older[-1]["seq"], summary, previous):
+                print(f"📝 Summarized {len(older)} message(s) of session {session_id}")
+        except Exception as e:
+            print(f"❌ Chat summary error: {e}")
+            import traceback; traceback.print_exc()
@@ -0,0 +1,144 @@
+import os
+from collections.abc import MutableMapping
+
+import numpy as np
+
+
+def save_npy(path: str, array):
+    with open(path, "wb") as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_id_columns(directory: str, vector_ids):
+    """
+    Write vector IDs in FAISS order as memory-mappable column files:
+
+      ids.npy                           fixed-width UTF-8 IDs, row i == FAISS position i
+      sorted_ids.npy, sorted_rows.npy   the IDs sorted, for binary-search lookups
+    """
+    os.makedirs(directory, exist_ok=True)
+    ids = [vector_id.encode("utf-8") for vector_id in vector_ids]
+    id_array = np.array(ids, dtype=f"S{max((len(i) for i in ids), default=1)}")
+    order = np.argsort(id_array, kind="stable")
+    save_npy(os.path.join(directory, "ids.npy"), id_array)
+    save_npy(os.path.join(directory, "sorted_ids.npy"), id_array[order])
+    save_npy(os.path.join(directory, "sorted_rows.npy"), order.astype(np.int64))
+
+
+class IdColumns:
+    """Read-only, memory-mapped view of the files written by write_id_columns."""
+
+    def __init__(self, directory: str):
+        def load(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        self.ids = load("ids.npy")
+        self.sorted_ids = load("sorted_ids.npy")
+        self.sorted_rows = load("sorted_rows.npy")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, vector_id: str):
+        """Row of `vector_id`, or None (binary search over the sorted IDs)."""
+        key = vector_id.encode("utf-8")
+        if not len(self.ids) or len(key) > self.ids.dtype.itemsize:
+            return None
+        i = int(np.searchsorted(self.sorted_ids, key))
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == key:
+            return int(self.sorted_rows[i])
+        return None
+
+    def id_at(self, row: int) -> str:
+        return self.ids[row].decode("utf-8")
+
+
+class ColumnarIdMap(MutableMapping):
+    """
+    FAISS position → docstore ID for a store opened from a snapshot:
+    snapshot rows are read from the mapped ID column, later ones from a
+    list. `remove` renumbers positions as FAISS remove_ids does; removed
+    snapshot rows are kept as a sorted array, so the column stays shared
+    and memory grows only with the deletions.
+    """
+
+    def __init__(self, columns: IdColumns, extra=None, removed=None):
+        self.columns = columns
+        self._extra = list(extra) if extra is not None else []
+        self._removed = removed if removed is not None else np.zeros(0, dtype=np.int64)  # sorted column rows
+        self._shift = self._removed - np.arange(len(self._removed))  # snapshot rows kept before each removed one
+        self._positions = None  # ID → position for the extra rows, built on demand
+
+    def _live(self):
+        return len(self.columns) - len(self._removed)
+
+    def _rows(self, positions):
+        """Column rows of snapshot positions."""
+        return positions + np.searchsorted(self._shift, positions, side="right")
+
+    def __getitem__(self, position):
+        position = int(position)
+        live = self._live()
+        if 0 <= position < live:
+            return self.columns.id_at(int(self._rows(position)))
+        if live <= position < len(self):
+            return self._extra[position - live]
+        raise KeyError(position)
+
+    def __setitem__(self, position, vector_id):
+        position = int(position)
+        live = self._live()
+        if position == len(self):
+            self._extra.append(vector_id)
+        elif live <= position < len(self):
+            self._extra[position - live] = vector_id
+        else:
+            raise KeyError(f"Position {position} belongs to the snapshot and is read-only")
+        self._positions = None
+
+    def __delitem__(self, position):
+        raise KeyError("Use remove(), which renumbers the following positions")
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __len__(self):
+        return self._live() + len(self._extra)
+
+    def position(self, vector_id: str):
+        """FAISS position of `vector_id`, or None."""
+        row = self.columns.row(vector_id)
+        if row is not None:
+            i = int(np.searchsorted(self._removed, row))
+            if i == len(self._removed) or self._removed[i] != row:
+                return row - i
+        if self._positions is None:
+            live = self._live()
+            self._positions = {v: live + i for i, v in enumerate(self._extra)}
+        return self._positions.get(vector_id)
+
+    def remove(self, positions):
+        """Drop `positions` and shift the later ones down."""
+        positions = np.unique(np.asarray(list(positions), dtype=np.int64))
+        live = self._live()
+        snapshot = positions[positions < live]
+        if len(snapshot):
+            self._removed = np.union1d(self._removed, self._rows(snapshot))
+            self._shift = self._removed - np.arange(len(self._removed))
+        extra = set((positions[positions >= live] - live).tolist())
+        if extra:
+            self._extra = [v for i, v in enumerate(self._extra) if i not in extra]
+        self._positions = None
+
+    def ids(self):
+        """All IDs in position order."""
+        keep = np.ones(len(self.columns), dtype=bool)
+        keep[self._removed] = False
+        for row in np.flatnonzero(keep):
+            yield self.columns.id_at(int(row))
+        yield from self._extra
+
+    def frozen(self):
+        return ColumnarIdMap(self.columns, self._extra, self._removed)
@@ -0,0 +1,124 @@
+import os
+
+from services.embedding_client import get_encoding
+
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
+# Tokens per chat request (prompt + answer), and the shares kept for
+# conversation history and for the answer; document context gets the rest
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "6000"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "800"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "300"))  # rolling conversation summary
+ANSWER_MAX_TOKENS = int(os.getenv("ANSWER_MAX_TOKENS", "600"))
+# Characters repeated between neighbouring chunks (the splitter's chunk_overlap)
+CHUNK_OVERLAP_CHARS = int(os.getenv("CHUNK_OVERLAP_CHARS", "200"))
+_MESSAGE_OVERHEAD = 4  # tokens the chat format adds per message
+
+
+def count_tokens(text: str) -> int:
+    """Tokens of `text` for the chat model (characters / 4 without tiktoken)."""
+    encoding = get_encoding(CHAT_MODEL)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages) -> int:
+    """Prompt tokens of a list of chat messages."""
+    return sum(count_tokens(m["content"]) + _MESSAGE_OVERHEAD for m in messages) + 3
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of `text` within `max_tokens`."""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding(CHAT_MODEL)
+    if encoding is None:
+        return text[:max_tokens * 4 - 1]  # count_tokens estimates len // 4 + 1
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+
+
+def _overlap(head: str, tail: str) -> int:
+    """Length of the longest end of `head` (up to CHUNK_OVERLAP_CHARS) that starts `tail`."""
+    for size in range(min(CHUNK_OVERLAP_CHARS, len(head), len(tail)), 0, -1):
+        if head.endswith(tail[:size]):
+            return size
+    return 0
+
+
+def pack_chunks(chunks, max_tokens: int):
+    """
+    Greedily fill `max_tokens` with ranked chunks, best first.
+
+    Whole chunks only: one that does not fit is skipped for smaller,
+    lower-ranked ones (only the best chunk is truncated, when nothing else
+    would fit). Duplicate chunks are dropped and text repeated from a
+    neighbouring chunk of the same document (the splitter's overlap) is
+    cut. Returns the context text and packing stats.
+    """
+    sections = []
+    used = 0
+    seen = set()
+    kept = {}  # (document_id, chunk_index) → content
+
+    for chunk in chunks:
+        content = chunk.page_content.strip()
+        if not content or content in seen:
+            continue
+        seen.add(content)
+
+        document_id = chunk.metadata.get("document_id")
+        index = chunk.metadata.get("chunk_index")
+        if index is not None:
+            previous = kept.get((document_id, index - 1))
+            if previous is not None:
+                content = content[_overlap(previous, content):]
+            following = kept.get((document_id, index + 1))
+            if following is not None:
+                content = content[:len(content) - _overlap(content, following)]
+            content = content.strip()
+            if not content:
+                continue
+
+        filename = chunk.metadata.get("filename", "Unknown")
+        section = f"--- Section {len(sections) + 1} (from {filename}) ---\n{content}"
+        tokens = count_tokens(section) + 2  # "\n\n" separator
+        if used + tokens > max_tokens:
+            if sections:
+                continue
+            note = "\n[Section truncated for length.]"
+            section = truncate_tokens(section, max_tokens - 2 - count_tokens(note)) + note
+            tokens = count_tokens(section) + 2
+
+        sections.append(section)
+        used += tokens
+        if index is not None:
+            kept[(document_id, index)] = chunk.page_content.strip()
+
+    stats = {"chunks": len(sections), "candidates": len(chunks), "tokens": used}
+    return "\n\n".join(sections), stats
+
+
+def pack_history(messages, max_tokens: int = HISTORY_TOKEN_BUDGET, summary: str = "") -> str:
+    """
+    Conversation lines ("ROLE: content"), newest kept first, within
+    `max_tokens`; the newest message is truncated if it alone is too long.
+    A rolling `summary` of earlier turns comes first, out of the same budget.
+    """
+    head = ""
+    if summary:
+        head = truncate_tokens(f"SUMMARY OF EARLIER CONVERSATION: {summary}", min(SUMMARY_MAX_TOKENS, max_tokens // 2))
+        max_tokens -= count_tokens(head) + 1
+
+    lines = []
+    used = 0
+    for message in reversed(messages):
+        line = f"{message['role'].upper()}: {message['content']}"
+        tokens = count_tokens(line) + 1
+        if used + tokens > max_tokens:
+            if not lines:
+                lines.append(truncate_tokens(line, max_tokens))
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(([head] if head else []) + lines[::-1])
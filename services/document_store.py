@@ -0,0 +1,294 @@
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+
+from langchain_core.documents import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+# 📂 Document store: document metadata + chunk text, shared by all processes
+DOCUMENTS_DB_PATH = os.getenv("DOCUMENTS_DB_PATH", os.path.join("./vector_db", "documents.db"))
+# Memory-map the database so worker processes share its pages via the OS cache
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(1024 * 1024 * 1024)))
+_MAX_PARAMS = 500  # IDs per IN (...) lookup
+
+_initialized_path = None  # database whose tables exist (created on first use, not on import)
+
+
+def _open():
+    conn = sqlite3.connect(DOCUMENTS_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    return conn
+
+
+@contextmanager
+def _connect():
+    if _initialized_path != DOCUMENTS_DB_PATH:
+        init_db()
+    conn = _open()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _transaction():
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def init_db():
+    """Create the documents and chunks tables if needed (done on first use)."""
+    global _initialized_path
+    os.makedirs(os.path.dirname(DOCUMENTS_DB_PATH) or ".", exist_ok=True)
+    conn = _open()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total_chunks INTEGER NOT NULL DEFAULT 0,
+                cached_chunks INTEGER NOT NULL DEFAULT 0,
+                embedded_chunks INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_created ON documents (created_at)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                vector_id TEXT PRIMARY KEY,
+                document_id TEXT NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+                chunk_index INTEGER NOT NULL,
+                content TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks (document_id, chunk_index)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS index_version (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)"
+        )
+        conn.execute("INSERT OR IGNORE INTO index_version (id, version) VALUES (1, 0)")
+    finally:
+        conn.close()
+    _initialized_path = DOCUMENTS_DB_PATH
+
+
+def _row_to_document(row):
+    if row is None:
+        return None
+    return {
+        "filename": row["filename"],
+        "status": row["status"],
+        "total_chunks": row["total_chunks"],
+        "cached_chunks": row["cached_chunks"],
+        "embedded_chunks": row["embedded_chunks"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+# 📄 Documents
+def create_document(document_id: str, filename: str, status: str = "indexing"):
+    """Insert a document row (no-op if it already exists, so WAL replay is safe)."""
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO documents (id, filename, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (document_id, filename, status, now, now),
+        )
+
+
+def update_document(document_id: str, **fields):
+    """Set columns of a document row (e.g. status)."""
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with _connect() as conn:
+        conn.execute(
+            f"UPDATE documents SET {assignments}, updated_at = ? WHERE id = ?",
+            (*fields.values(), time.time(), document_id),
+        )
+
+
+def get_document(document_id: str):
+    """Return one document's metadata, or None."""
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM documents WHERE id = ?", (document_id,)).fetchone()
+    return _row_to_document(row)
+
+
+def list_documents():
+    """All documents' metadata by ID, oldest first."""
+    with _connect() as conn:
+        rows = conn.execute("SELECT * FROM documents ORDER BY created_at").fetchall()
+    return {row["id"]: _row_to_document(row) for row in rows}
+
+
+def delete_document(document_id: str, created_at: float | None = None):
+    """
+    Delete a document and (by cascade) its chunks. With `created_at`, a
+    row re-created since (same ID, newer timestamp) is left alone, so a
+    replayed delete cannot remove a later upload.
+    """
+    with _connect() as conn:
+        if created_at is None:
+            conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+        else:
+            conn.execute("DELETE FROM documents WHERE id = ? AND created_at <= ?", (document_id, created_at))
+
+
+# 🔢 Index version: bumped whenever the searchable document set changes
+def bump_index_version():
+    with _connect() as conn:
+        conn.execute("UPDATE index_version SET version = version + 1 WHERE id = 1")
+
+
+def get_index_version() -> int:
+    with _connect() as conn:
+        return conn.execute("SELECT version FROM index_version WHERE id = 1").fetchone()["version"]
+
+
+# 🧩 Chunks
+def add_chunks(document_id: str, vector_ids, texts, cached: int = 0):
+    """
+    Store a batch of chunks and bump the document's counters in one
+    transaction. Chunks already stored are skipped, so replaying a batch
+    is harmless. Returns the number of chunks inserted, or None when the
+    document no longer exists (deleted while it was being ingested).
+    """
+    rows = [
+        (vector_id, document_id, int(vector_id.rsplit(":", 1)[1]), text)
+        for vector_id, text in zip(vector_ids, texts)
+    ]
+    with _transaction() as conn:
+        if conn.execute("SELECT 1 FROM documents WHERE id = ?", (document_id,)).fetchone() is None:
+            return None
+        inserted = conn.executemany(
+            "INSERT OR IGNORE INTO chunks (vector_id, document_id, chunk_index, content) VALUES (?, ?, ?, ?)",
+            rows,
+        ).rowcount
+        if inserted:
+            cached = min(cached, inserted)
+            conn.execute(
+                """
+                UPDATE documents
+                SET total_chunks = total_chunks + ?, cached_chunks = cached_chunks + ?,
+                    embedded_chunks = embedded_chunks + ?, updated_at = ?
+                WHERE id = ?
+                """,
+                (inserted, cached, inserted - cached, time.time(), document_id),
+            )
+    return inserted
+
+
+def has_chunk(vector_id: str) -> bool:
+    with _connect() as conn:
+        return conn.execute("SELECT 1 FROM chunks WHERE vector_id = ?", (vector_id,)).fetchone() is not None
+
+
+def get_chunks(vector_ids):
+    """
+    Batched lookup of chunks by vector ID → {vector_id: Document}.
+    Only the requested rows are read.
+    """
+    vector_ids = list(dict.fromkeys(vector_ids))
+    found = {}
+    with _connect() as conn:
+        for start in range(0, len(vector_ids), _MAX_PARAMS):
+            batch = vector_ids[start:start + _MAX_PARAMS]
+            rows = conn.execute(
+                f"""
+                SELECT c.vector_id, c.document_id, c.chunk_index, c.content, d.filename
+                FROM chunks c JOIN documents d ON d.id = c.document_id
+                WHERE c.vector_id IN ({", ".join("?" * len(batch))})
+                """,
+                batch,
+            ).fetchall()
+            for row in rows:
+                found[row["vector_id"]] = Document(
+                    id=row["vector_id"],
+                    page_content=row["content"],
+                    metadata={
+                        "document_id": row["document_id"],
+                        "filename": row["filename"],
+                        "chunk_index": row["chunk_index"],
+                    },
+                )
+    return found
+
+
+def vector_ids_for_document(document_id: str):
+    """A document's chunk IDs in chunk order (index lookup)."""
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT vector_id FROM chunks WHERE document_id = ? ORDER BY chunk_index", (document_id,)
+        ).fetchall()
+    return [row["vector_id"] for row in rows]
+
+
+def is_empty() -> bool:
+    with _connect() as conn:
+        return conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone() is None
+
+
+def import_documents(metadata: dict, chunks):
+    """
+    One-off import of a pickled store: `metadata` is the old
+    {document_id: {...}} dict, `chunks` yields (vector_id, Document).
+    """
+    now = time.time()
+    with _transaction() as conn:
+        for document_id, meta in metadata.items():
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO documents
+                    (id, filename, status, total_chunks, cached_chunks, embedded_chunks, created_at, updated_at)
+                VALUES (?, ?, ?, 0, ?, ?, ?, ?)
+                """,
+                (
+                    document_id, meta.get("filename", "Unknown"), meta.get("status", "ready"),
+                    meta.get("cached_chunks", 0), meta.get("embedded_chunks", 0), now, now,
+                ),
+            )
+        conn.executemany(
+            "INSERT OR IGNORE INTO chunks (vector_id, document_id, chunk_index, content) VALUES (?, ?, ?, ?)",
+            (
+                (vector_id, doc.metadata["document_id"], doc.metadata.get("chunk_index", 0), doc.page_content)
+                for vector_id, doc in chunks
+                if doc.metadata.get("document_id") in metadata
+            ),
+        )
+        conn.execute(
+            "UPDATE documents SET total_chunks = (SELECT COUNT(*) FROM chunks WHERE chunks.document_id = documents.id)"
+        )
+
+
+class ChunkDocstore(Docstore, AddableMixin):
+    """
+    LangChain docstore view of the chunks table. Rows are written by
+    add_chunks (in the same order as the WAL), so add/delete are no-ops
+    here; FAISS only calls them to keep its own bookkeeping.
+    """
+
+    def search(self, search: str):
+        return get_chunks([search]).get(search) or f"ID {search} not found."
+
+    def add(self, texts):
+        pass
+
+    def delete(self, ids):
+        pass
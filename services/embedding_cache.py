@@ -0,0 +1,365 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from services.index_log import file_lock
+
+
+def normalize_question(text: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+
+class QueryEmbeddingCache(Embeddings):
+    """
+    Bounded LRU cache of question → embedding in front of another
+    `Embeddings` instance. Document embeddings pass straight through.
+
+    With `path` set, vectors live in a memory-mapped .npy file so the cache
+    stays warm across restarts and is shared by all worker processes. Each
+    row stores the key digest, a last-use tick and the vector; rows are
+    claimed under a file lock, taking the least recently used one, and a
+    local miss re-reads the key column for entries other processes added.
+    A file written for another max_size or vector dimension is rebuilt
+    under that lock, and the other processes map the new file.
+    """
+
+    def __init__(self, underlying: Embeddings, max_size: int = 1024, path: str | None = None, namespace: str = ""):
+        self.underlying = underlying
+        self.max_size = max_size
+        self.path = path
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._slots = OrderedDict()  # key digest → row in self._rows (rows are re-checked before use)
+        self._rows = None
+        self._free = []  # in-memory cache only
+        self._inode = None  # of the mapped file, to notice another process rebuilding it
+        self._tick = 0
+
+        if path and os.path.exists(path):
+            self._open(path)
+
+    # 🔑 Keys & storage
+    def _digest(self, text: str) -> bytes:
+        key = f"{self.namespace}\x00{normalize_question(text)}"
+        return hashlib.sha256(key.encode("utf-8")).digest()
+
+    def _dtype(self, dim: int):
+        return np.dtype([("key", "u1", (32,)), ("tick", "<u8"), ("vec", "<f4", (dim,))])
+
+    def _map(self, path: str):
+        """The persisted rows, memory-mapped, or None if the file is not a cache file."""
+        try:
+            rows = np.load(path, mmap_mode="r+")
+            if rows.dtype.names != ("key", "tick", "vec"):
+                raise ValueError("unexpected row layout")
+            return rows
+        except Exception as e:
+            print(f"⚠️ Unreadable query embedding cache at {path}, rebuilding it on the next store: {e}")
+            return None
+
+    def _open(self, path: str, dim: int | None = None) -> bool:
+        """
+        Map a persisted cache (never truncating it) and rebuild its LRU order.
+        False if the file holds another number of rows (or another vector
+        dimension than `dim`); the next store then rebuilds it.
+        """
+        rows = self._map(path)
+        if rows is None:
+            return False
+        if len(rows) != self.max_size or (dim is not None and rows["vec"].shape[1] != dim):
+            return False
+
+        self._rows = rows
+        self._inode = os.stat(path).st_ino
+        self._slots.clear()
+        used = np.nonzero(rows["tick"])[0]
+        for row in used[np.argsort(rows["tick"][used])]:
+            self._slots[rows["key"][row].tobytes()] = int(row)
+        self._tick = int(rows["tick"].max()) if len(used) else 0
+        print(f"♻️ Loaded {len(self._slots)} cached query embedding(s)")
+        return True
+
+    def _replaced(self) -> bool:
+        """True once another process has rebuilt (or removed) the mapped file."""
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    def _create(self, dim: int):
+        """
+        Map the cache file, creating it if no process has yet (caller holds
+        the file lock). A file sized for another max_size or dimension is
+        rebuilt in place of the old one, keeping its most recently used
+        rows when the dimension still matches.
+        """
+        if os.path.exists(self.path) and self._open(self.path, dim):
+            return
+
+        rows = np.zeros(self.max_size, dtype=self._dtype(dim))
+        old = self._map(self.path) if os.path.exists(self.path) else None
+        if old is not None:
+            print(f"🔄 Rebuilding query embedding cache at {self.path}: {len(old)} x {old['vec'].shape[1]}-d rows "
+                  f"→ {self.max_size} x {dim}-d")
+        if old is not None and old["vec"].shape[1] == dim:
+            used = np.nonzero(old["tick"])[0]
+            order = used[np.argsort(old["tick"][used])]
+            keep = order[max(len(order) - self.max_size, 0):]
+            rows[:len(keep)] = old[keep]
+        del old
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, rows)
+        os.replace(tmp_path, self.path)
+        self._open(self.path)
+
+    def _find(self, digest: bytes):
+        """Row holding `digest` in the shared file, or None."""
+        match = np.nonzero((self._rows["key"] == np.frombuffer(digest, dtype="u1")).all(axis=1))[0]
+        return int(match[0]) if len(match) else None
+
+    def _read(self, row: int, digest: bytes):
+        """The row's vector, or None if it holds another key (before or after the copy)."""
+        if self._rows["key"][row].tobytes() != digest:
+            return None
+        vector = self._rows["vec"][row].tolist()
+        return vector if self._rows["key"][row].tobytes() == digest else None
+
+    def _write(self, row: int, digest: bytes, vector, tick: int):
+        # Clear the key first so readers in other processes never match a half-written row
+        self._rows["key"][row] = 0
+        self._rows["vec"][row] = vector
+        self._rows["key"][row] = np.frombuffer(digest, dtype="u1")
+        self._rows["tick"][row] = tick
+        self._slots[digest] = row
+        self._slots.move_to_end(digest)
+
+    def _store(self, digest: bytes, vector):
+        if not self.path:
+            if self._rows is None:
+                self._rows = np.zeros(self.max_size, dtype=self._dtype(len(vector)))
+                self._free = list(range(self.max_size - 1, -1, -1))
+            row = self._free.pop() if self._free else self._slots.popitem(last=False)[1]
+            self._tick += 1
+            self._write(row, digest, vector, self._tick)
+            return
+
+        with file_lock(f"{self.path}.lock"):
+            # Processes configured with another max_size or dimension rebuild the file in turn
+            if self._rows is None or self._replaced() or self._rows["vec"].shape[1] != len(vector):
+                self._rows = None
+                self._slots.clear()
+                self._create(len(vector))
+            row = self._find(digest)
+            if row is None:
+                # Free rows have tick 0, so they go before the least recently used one
+                ticks = np.asarray(self._rows["tick"])
+                row = int(np.argmin(ticks))
+                self._slots.pop(self._rows["key"][row].tobytes(), None)
+            self._tick = int(self._rows["tick"].max()) + 1
+            self._write(row, digest, vector, self._tick)
+
+    # 🔎 Embeddings interface
+    def embed_query(self, text: str):
+        digest = self._digest(text)
+
+        with self._lock:
+            if self.path and (self._rows is None or self._replaced()):
+                self._rows = None
+                self._slots.clear()
+                if os.path.exists(self.path):
+                    self._open(self.path)
+            row = self._slots.get(digest)
+            if row is None and self.path and self._rows is not None:
+                row = self._find(digest)  # added by another process
+            vector = self._read(row, digest) if row is not None else None
+            if vector is not None:
+                self._slots[digest] = row
+                self._slots.move_to_end(digest)
+                self._tick = max(self._tick, int(self._rows["tick"].max())) + 1
+                self._rows["tick"][row] = self._tick
+                self.hits += 1
+                return vector
+            # Another process sharing the file may have reused the row
+            self._slots.pop(digest, None)
+            self.misses += 1
+
+        vector = self.underlying.embed_query(text)
+
+        with self._lock:
+            if digest not in self._slots:
+                self._store(digest, vector)
+
+        return vector
+
+    def embed_documents(self, texts):
+        return self.underlying.embed_documents(texts)
+
+    def stats(self):
+        """Hit/miss counters for monitoring."""
+        total = self.hits + self.misses
+        with self._lock:
+            size = int(np.count_nonzero(self._rows["tick"])) if self._rows is not None else 0
+        return {
+            "size": size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class ChunkEmbeddingCache:
+    """
+    Content-addressed store of chunk embeddings: sha256(model + text) → vector.
+
+    On disk it is two append-only files per model: `keys.bin` (32-byte
+    digests) and `vectors.f32` (raw float32 rows in the same order), so a
+    re-uploaded or mostly unchanged document only sends novel chunks to the
+    embedding API.
+    """
+
+    def __init__(self, underlying: Embeddings, directory: str, namespace: str):
+        self.underlying = underlying
+        self.namespace = namespace
+        self.directory = os.path.join(directory, namespace)
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock_path = os.path.join(self.directory, "lock")
+
+        self._lock = threading.Lock()
+        self._rows = {}  # key digest → row
+        self._synced = 0  # rows of keys.bin indexed so far
+        self._dim = None
+        self._vectors = None
+
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+
+        with file_lock(self.lock_path):
+            self._read_dim()
+            # A crash between the two appends leaves a partial tail; cut it off
+            n_rows = self._complete_rows()
+            for path, row_size in ((self.keys_path, 32), (self.vectors_path, 4 * self._dim)):
+                if os.path.exists(path):
+                    os.truncate(path, n_rows * row_size)
+        self._refresh()
+        print(f"♻️ Chunk embedding cache: {self._synced} vector(s) for {self.namespace}")
+
+    def _read_dim(self):
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            self._dim = json.load(f)["dim"]
+
+    def _complete_rows(self) -> int:
+        """Rows with both key and vector on disk (vectors are written first)."""
+        sizes = [os.path.getsize(p) if os.path.exists(p) else 0 for p in (self.keys_path, self.vectors_path)]
+        return min(sizes[0] // 32, sizes[1] // (4 * self._dim))
+
+    def _refresh(self):
+        """Index rows appended since keys.bin was last read, by this or any other process."""
+        if self._dim is None:
+            if not os.path.exists(self.meta_path):
+                return
+            self._read_dim()
+        n_rows = self._complete_rows()
+        if n_rows <= self._synced:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._synced * 32)
+            keys = f.read((n_rows - self._synced) * 32)
+        for i in range(len(keys) // 32):
+            self._rows.setdefault(keys[i * 32:(i + 1) * 32], self._synced + i)
+        self._synced += len(keys) // 32
+
+    def _digest(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.namespace}\x00{text}".encode("utf-8")).digest()
+
+    def _read(self, row: int):
+        if self._vectors is None or row >= len(self._vectors):
+            self._vectors = np.memmap(self.vectors_path, dtype="<f4", mode="r").reshape(-1, self._dim)
+        return self._vectors[row]
+
+    def _append(self, digests, vectors):
+        """
+        Append new rows under a lock shared by all processes; row numbers
+        come from the files themselves, after indexing what others appended.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with file_lock(self.lock_path):
+            if self._dim is None:
+                if os.path.exists(self.meta_path):
+                    self._read_dim()
+                else:
+                    self._dim = len(vectors[0])
+                    with open(self.meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"dim": self._dim}, f)
+
+            self._refresh()
+            fresh = [(d, v) for d, v in zip(digests, vectors) if d not in self._rows]
+            if not fresh:
+                return
+
+            start = self._synced
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(start * 4 * self._dim)
+                f.write(np.asarray([v for _, v in fresh], dtype="<f4").tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.truncate(start * 32)
+                f.write(b"".join(d for d, _ in fresh))
+
+            for i, (digest, _) in enumerate(fresh):
+                self._rows[digest] = start + i
+            self._synced = start + len(fresh)
+
+    def embed_documents_with_stats(self, texts):
+        """
+        Embed `texts`, calling the API only for content not seen before.
+        Returns (vectors, cached_count).
+        """
+        digests = [self._digest(t) for t in texts]
+
+        with self._lock:
+            if any(d not in self._rows for d in digests):
+                self._refresh()
+            novel = {}
+            for digest, text in zip(digests, texts):
+                if digest not in self._rows and digest not in novel:
+                    novel[digest] = text
+
+        if novel:
+            new_vectors = self.underlying.embed_documents(list(novel.values()))
+            with self._lock:
+                self._append(list(novel), new_vectors)
+
+        with self._lock:
+            vectors = [self._read(self._rows[d]).tolist() for d in digests]
+
+        cached = sum(1 for d in digests if d not in novel)
+        return vectors, cached
+
+    def lookup(self, texts):
+        """Cached float32 vectors for `texts` (None where missing); never calls the API."""
+        digests = [self._digest(t) for t in texts]
+        with self._lock:
+            if any(d not in self._rows for d in digests):
+                self._refresh()
+            rows = [self._rows.get(d) for d in digests]
+            return [np.array(self._read(row)) if row is not None else None for row in rows]
+
+    def __len__(self):
+        return len(self._rows)
@@ -0,0 +1,188 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import openai
+import tiktoken
+from openai import OpenAI
+from langchain_core.embeddings import Embeddings
+
+MAX_INPUT_TOKENS = 8191  # per-input limit of the OpenAI embedding models
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """
+    tiktoken encoder for a model (cached; cl100k_base if unknown).
+    Returns None when the encoding files cannot be loaded (e.g. offline).
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"⚠️ tiktoken unavailable, estimating tokens as characters / 4: {e}")
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` units per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0):
+        """Block until `amount` units are available, then take them."""
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmbeddingClient(Embeddings):
+    """
+    Batch embedding client for the OpenAI embeddings API.
+
+    - Shards inputs into requests of at most `batch_size` texts and
+      `batch_tokens` tokens (counted with tiktoken).
+    - Runs up to `concurrency` requests in flight, shared by all callers.
+    - Paces requests and tokens per minute with token buckets.
+    - Retries 429s, timeouts, connection errors and 5xx with exponential
+      backoff and full jitter, honouring Retry-After when the server sends it.
+
+    `dimensions` requests shortened embeddings (text-embedding-3 models).
+    `base_url` (or OPENAI_BASE_URL) can point at a local fake server.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        api_key: str,
+        base_url: str | None = None,
+        dimensions: int | None = None,
+        batch_size: int = 256,
+        batch_tokens: int = 250_000,
+        concurrency: int = 4,
+        requests_per_minute: int = 3000,
+        tokens_per_minute: int = 1_000_000,
+        max_retries: int = 6,
+        timeout: float = 60.0,
+    ):
+        self.model = model
+        self.dimensions = dimensions
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.max_retries = max_retries
+
+        # Retries are handled here, with jitter and rate limiting, not by the SDK
+        self._client = OpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed")
+        self._request_bucket = TokenBucket(requests_per_minute / 60.0, max(1, requests_per_minute // 60))
+        self._token_bucket = TokenBucket(tokens_per_minute / 60.0, max(batch_tokens, tokens_per_minute // 60))
+        self._encoding = get_encoding(model)
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "rate_limited": 0, "texts": 0, "tokens": 0}
+
+    # 🔢 Token counting & sharding
+    def _prepare(self, text: str):
+        """Return (text, token_count), truncating inputs over the model limit."""
+        text = text or " "
+        if self._encoding is None:
+            text = text[:MAX_INPUT_TOKENS * 4]
+            return text, self.count_tokens(text)
+
+        tokens = self._encoding.encode(text, disallowed_special=())
+        if len(tokens) > MAX_INPUT_TOKENS:
+            tokens = tokens[:MAX_INPUT_TOKENS]
+            text = self._encoding.decode(tokens)
+        return text, len(tokens)
+
+    def _shard(self, prepared):
+        """Group (text, tokens) pairs into request-sized batches, keeping order."""
+        batch, batch_tokens = [], 0
+        for text, n_tokens in prepared:
+            if batch and (len(batch) >= self.batch_size or batch_tokens + n_tokens > self.batch_tokens):
+                yield batch, batch_tokens
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += n_tokens
+        if batch:
+            yield batch, batch_tokens
+
+    # 🌐 Requests
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    def _retry_delay(self, attempt: int, error):
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        backoff = random.uniform(0, min(30.0, 0.5 * 2 ** attempt))
+        return max(backoff, retry_after or 0.0)
+
+    def _embed_batch(self, texts, n_tokens):
+        for attempt in range(self.max_retries + 1):
+            self._request_bucket.acquire(1)
+            self._token_bucket.acquire(n_tokens)
+            try:
+                extra = {"dimensions": self.dimensions} if self.dimensions else {}
+                response = self._client.embeddings.create(
+                    model=self.model, input=texts, encoding_format="float", **extra
+                )
+                self._count(requests=1, texts=len(texts), tokens=n_tokens)
+                return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+            except (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                self._count(retries=1, rate_limited=int(isinstance(e, openai.RateLimitError)))
+                print(f"⏳ Embedding request failed ({type(e).__name__}); retry {attempt + 1} in {delay:.1f}s")
+                time.sleep(delay)
+
+    # 🔎 Embeddings interface
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        prepared = [self._prepare(t) for t in texts]
+        futures = [self._pool.submit(self._embed_batch, batch, n_tokens) for batch, n_tokens in self._shard(prepared)]
+
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+    def embed_query(self, text: str):
+        prepared_text, n_tokens = self._prepare(text)
+        return self._embed_batch([prepared_text], n_tokens)[0]
+
+    def count_tokens(self, text: str) -> int:
+        if self._encoding is None:
+            return len(text) // 4 + 1
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def stats(self):
+        """Request/retry/token counters for monitoring."""
+        with self._stats_lock:
+            return dict(self._stats)
@@ -0,0 +1,65 @@
+import numpy as np
+
+FUSION_METHODS = ("rrf", "weighted")
+
+
+def _min_max(scores):
+    """Scale present (non-NaN) scores of each row to [0, 1]; absent ones become 0."""
+    low = np.nanmin(scores, axis=1, keepdims=True)
+    span = np.nanmax(scores, axis=1, keepdims=True) - low
+    scaled = np.divide(scores - low, span, out=np.ones_like(scores), where=span > 0)
+    return np.where(np.isnan(scores), 0.0, scaled)
+
+
+def fuse(ranked: dict, method: str = "rrf", weights: dict | None = None, rrf_k: float = 60.0, top_k: int | None = 5):
+    """
+    Fuse ranked hit lists from several retrievers into one ranking.
+
+    `ranked` maps a source name to (ids, scores), best first, with higher
+    scores better. Candidates are deduplicated on ID; each source's ranks
+    and scores become rows of a (sources × candidates) matrix, fused with
+
+      rrf        Σ weight / (rrf_k + rank)
+      weighted   Σ weight · min-max-normalised score
+
+    Returns up to `top_k` (all when None) (id, fused score,
+    {source: {"rank", "score"}}) tuples, best first; a source that did
+    not return a candidate is left out of its dict.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method: {method}")
+
+    names = [name for name, (ids, _scores) in ranked.items() if len(ids)]
+    if not names:
+        return []
+
+    all_ids = np.concatenate([np.asarray(ranked[name][0], dtype=object) for name in names])
+    candidates, columns = np.unique(all_ids, return_inverse=True)
+
+    ranks = np.full((len(names), len(candidates)), np.inf)
+    scores = np.full((len(names), len(candidates)), np.nan)
+    start = 0
+    for row, name in enumerate(names):
+        ids, source_scores = ranked[name]
+        cols = columns[start:start + len(ids)]
+        start += len(ids)
+        # A source listing an ID twice keeps its best (first) entry
+        ranks[row, cols[::-1]] = np.arange(len(ids), 0, -1)
+        scores[row, cols[::-1]] = np.asarray(source_scores, dtype=float)[::-1]
+
+    weight = np.array([(weights or {}).get(name, 1.0) for name in names], dtype=float)[:, None]
+    if method == "rrf":
+        fused = (weight / (rrf_k + ranks)).sum(axis=0)
+    else:
+        fused = (weight * _min_max(scores)).sum(axis=0)
+
+    order = np.argsort(-fused, kind="stable")[:top_k]
+    hits = []
+    for col in order:
+        sources = {
+            name: {"rank": int(ranks[row, col]), "score": float(scores[row, col])}
+            for row, name in enumerate(names)
+            if np.isfinite(ranks[row, col])
+        }
+        hits.append((candidates[col], float(fused[col]), sources))
+    return hits
@@ -0,0 +1,249 @@
+import os
+import re
+import zlib
+import pickle
+import struct
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process file locks, one writer process only
+    fcntl = None
+
+_HEADER = struct.Struct("<II")  # payload length, crc32
+_WAL_RE = re.compile(r"^wal-(\d+)\.log$")
+
+
+def atomic_write(path: str, data: bytes):
+    """Write `data` to `path` via a temp file, fsync and rename."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def fsync_dir(path: str):
+    """Persist a rename/creation inside `path` (no-op where unsupported)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_current(directory: str):
+    """Generation named by the CURRENT file, or None if there is none."""
+    try:
+        with open(os.path.join(directory, "CURRENT"), "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_current(directory: str, generation: int):
+    """Atomically point CURRENT at a snapshot generation."""
+    atomic_write(os.path.join(directory, "CURRENT"), f"{generation}\n".encode("utf-8"))
+    fsync_dir(directory)
+
+
+def wal_path(directory: str, generation: int):
+    return os.path.join(directory, f"wal-{generation:08d}.log")
+
+
+def wal_generations(directory: str):
+    """Generations of the WAL files present in `directory`, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(m.group(1)) for m in map(_WAL_RE.match, os.listdir(directory)) if m)
+
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True):
+    """
+    Exclusive lock on `path` shared by all processes (a no-op without fcntl).
+    Yields False instead of waiting when `blocking` is off and it is taken.
+    """
+    with open(path, "a+b") as f:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class WalGapError(RuntimeError):
+    """The log segments this reader still needed were compacted away."""
+
+
+class WriteAheadLog:
+    """
+    Append-only log of index mutations, split into generations
+    (`wal-<gen>.log`); rotating starts the next generation.
+
+    Each record is a pickled dict framed by its length and CRC32, so a write
+    torn by a crash is detected and cut off instead of corrupting the
+    records before it.
+
+    Several processes can share the log. Appends hold an exclusive lock on
+    the active segment and first read whatever other processes appended,
+    so every process applies the records in the same order. Readers follow
+    the log into the next generation once a segment has been rotated.
+    """
+
+    def __init__(self, directory: str, generation: int, fsync: bool = True):
+        self.directory = directory
+        self.generation = generation
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = None
+        self._offset = 0
+
+    @property
+    def path(self):
+        return wal_path(self.directory, self.generation)
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(self.path, "a+b")
+        return self._file
+
+    def _switch(self, generation: int):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._offset = 0
+        self.generation = generation
+
+    def _sealed(self):
+        """True once a newer generation has been started."""
+        if os.path.exists(wal_path(self.directory, self.generation + 1)):
+            return True
+        current = read_current(self.directory)
+        if current is not None and current > self.generation:
+            raise WalGapError(f"WAL generation {self.generation} was compacted into snapshot {current}")
+        return False
+
+    def _read_segment(self, truncate: bool = False):
+        """Intact records after the read offset in the open segment."""
+        f = self._open()
+        f.seek(self._offset)
+        records = []
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                break
+            length, crc = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            records.append(pickle.loads(payload))
+            self._offset = f.tell()
+
+        if truncate and self._offset < os.fstat(f.fileno()).st_size:
+            print(f"⚠️ Truncating torn tail of {self.path} at byte {self._offset}")
+            f.truncate(self._offset)
+        return records
+
+    @contextmanager
+    def _locked(self):
+        """
+        Lock the active segment, reading (and returning via the yielded
+        list) the rest of any sealed segments passed on the way.
+        """
+        records = []
+        while True:
+            f = self._open()
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                if not self._sealed():
+                    records.extend(self._read_segment(truncate=True))
+                    yield records
+                    return
+                records.extend(self._read_segment())
+            finally:
+                if fcntl is not None and not f.closed:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            self._switch(self.generation + 1)
+
+    def pending(self):
+        """Cheap check for records (or a rotation) this reader has not seen."""
+        if self._file is None:
+            return True
+        try:
+            return os.fstat(self._file.fileno()).st_size > self._offset or self._sealed()
+        except WalGapError:
+            return True
+
+    def read_new(self, lock: bool = False):
+        """
+        Records appended since the last read, across rotations. With `lock`
+        the active segment is locked and a torn tail truncated (startup).
+        """
+        with self._lock:
+            if lock:
+                with self._locked() as records:
+                    return records
+
+            records = []
+            while True:
+                sealed = self._sealed()
+                records.extend(self._read_segment())
+                if not sealed:
+                    return records
+                self._switch(self.generation + 1)
+
+    def append(self, record: dict):
+        """
+        Durably append one record. Returns the records other processes
+        appended before it, which the caller must apply first.
+        """
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock, self._locked() as foreign:
+            f = self._file
+            f.seek(0, os.SEEK_END)
+            f.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            self._offset = f.tell()
+            return foreign
+
+    def rotate(self):
+        """
+        Seal the active segment and start the next generation.
+        Returns (records from other processes, new generation).
+        """
+        with self._lock:
+            with self._locked() as foreign:
+                generation = self.generation + 1
+                open(wal_path(self.directory, generation), "ab").close()
+                fsync_dir(self.directory)
+            self._switch(generation)
+            return foreign, generation
+
+    def size(self):
+        with self._lock:
+            return os.fstat(self._open().fileno()).st_size
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
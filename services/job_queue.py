@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# 📂 Job store
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join("./vector_db", "jobs.db"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+POLL_INTERVAL = 2.0
+
+_wakeup = threading.Event()
+_workers = []
+_initialized_path = None  # database whose table exists (created on first use, not on import)
+
+
+def _open():
+    conn = sqlite3.connect(JOBS_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+@contextmanager
+def _connect():
+    if _initialized_path != JOBS_DB_PATH:
+        init_db()
+    conn = _open()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def init_db():
+    """Create the jobs table if needed (done on first use)."""
+    global _initialized_path
+    os.makedirs(os.path.dirname(JOBS_DB_PATH) or ".", exist_ok=True)
+    conn = _open()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '{}',
+                result TEXT,
+                error TEXT,
+                owner_pid INTEGER,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+    finally:
+        conn.close()
+    _initialized_path = JOBS_DB_PATH
+
+
+def _row_to_job(row):
+    if row is None:
+        return None
+    return {
+        "job_id": row["id"],
+        "status": row["status"],
+        "stage": row["stage"],
+        "payload": json.loads(row["payload"]),
+        "progress": json.loads(row["progress"]),
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+
+# ➕ Producer side
+def enqueue_job(payload: dict):
+    """Persist a new job and wake a worker. Returns the job ID."""
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, status, stage, payload, created_at, updated_at) VALUES (?, 'queued', 'queued', ?, ?, ?)",
+            (job_id, json.dumps(payload), now, now),
+        )
+    _wakeup.set()
+    return job_id
+
+
+def get_job(job_id: str):
+    """Return a job as a dict, or None."""
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row)
+
+
+# 📈 Worker side
+def update_progress(job_id: str, stage: str | None = None, **progress):
+    """Merge progress counters (and optionally the stage) into a job."""
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT stage, progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            conn.execute("ROLLBACK")
+            return
+        merged = {**json.loads(row["progress"]), **progress}
+        conn.execute(
+            "UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ?",
+            (stage or row["stage"], json.dumps(merged), time.time(), job_id),
+        )
+        conn.execute("COMMIT")
+
+
+def _finish(job_id: str, status: str, result=None, error=None):
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, stage = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+        )
+
+
+def _claim_next_job():
+    """Atomically move the oldest queued job to 'running' and return it."""
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', owner_pid = ?, updated_at = ? WHERE id = ?",
+            (os.getpid(), time.time(), row["id"]),
+        )
+        conn.execute("COMMIT")
+    return get_job(row["id"])
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _requeue_orphaned_jobs():
+    """Put back jobs whose worker process died mid-run (e.g. a restart)."""
+    with _connect() as conn:
+        rows = conn.execute("SELECT id, owner_pid FROM jobs WHERE status = 'running'").fetchall()
+        for row in rows:
+            if row["owner_pid"] == os.getpid() or not _pid_alive(row["owner_pid"]):
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', owner_pid = NULL, updated_at = ? WHERE id = ? AND status = 'running'",
+                    (time.time(), row["id"]),
+                )
+                print(f"♻️ Re-queued interrupted job {row['id']}")
+
+
+def _worker_loop(handler):
+    while True:
+        job = _claim_next_job()
+        if job is None:
+            _wakeup.wait(POLL_INTERVAL)
+            _wakeup.clear()
+            continue
+
+        print(f"⚙️ Processing job {job['job_id']}")
+        try:
+            result = handler(job)
+            _finish(job["job_id"], "done", result=result)
+            print(f"✅ Job {job['job_id']} done")
+        except Exception as e:
+            print(f"❌ Job {job['job_id']} failed: {e}")
+            import traceback; traceback.print_exc()
+            _finish(job["job_id"], "failed", error=str(e))
+
+
+def start_workers(handler, num_workers: int = INGEST_WORKERS):
+    """
+    Start background worker threads that run `handler(job)` for each job.
+    `handler` returns a JSON-serialisable result; exceptions fail the job.
+    """
+    if _workers:
+        return
+
+    _requeue_orphaned_jobs()
+
+    for i in range(num_workers):
+        worker = threading.Thread(target=_worker_loop, args=(handler,), name=f"ingest-worker-{i}", daemon=True)
+        worker.start()
+        _workers.append(worker)
+    print(f"🧵 Started {num_workers} ingestion worker(s)")
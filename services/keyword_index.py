@@ -0,0 +1,348 @@
+import os
+import re
+import copy
+import json
+import math
+import heapq
+import pickle
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from services.chunk_store import IdColumns, save_npy, write_id_columns
+
+_TOKEN_RE = re.compile(r'\b\w+\b')
+
+
+def tokenize(text: str):
+    """Lowercase word tokens, matching the old keyword search."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class KeywordIndex:
+    """
+    Inverted index (token → {chunk_id: term frequency}) with BM25 scoring.
+    Query cost depends on the posting lists of the query terms, not on the
+    size of the corpus.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = {}
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, chunk_id: str, text: str):
+        """Index one chunk."""
+        if chunk_id in self.doc_lengths:
+            self.remove(chunk_id, text)
+
+        tokens = tokenize(text)
+        for token, tf in Counter(tokens).items():
+            self.postings.setdefault(token, {})[chunk_id] = tf
+
+        self.doc_lengths[chunk_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, chunk_id: str, text: str):
+        """Drop one chunk; `text` is the chunk content it was indexed with."""
+        length = self.doc_lengths.pop(chunk_id, None)
+        if length is None:
+            return
+
+        self.total_length -= length
+        for token in set(tokenize(text)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(chunk_id, None)
+            if not posting:
+                del self.postings[token]
+
+    def search(self, query: str, top_k: int = 5, allowed_ids=None):
+        """
+        Return up to `top_k` (chunk_id, bm25_score) pairs, best first.
+        `allowed_ids` optionally restricts the hits to a set of chunk IDs.
+        """
+        n_docs = len(self.doc_lengths)
+        if not n_docs:
+            return []
+
+        avg_length = self.total_length / n_docs or 1.0
+        scores = {}
+
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+
+            df = len(posting)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+            for chunk_id, tf in posting.items():
+                if allowed_ids is not None and chunk_id not in allowed_ids:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[chunk_id] / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    # 💾 Persistence
+    def save(self, path: str):
+        """Write the index to disk (temp file + rename)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Read an index saved with `save`."""
+        index = cls()
+        with open(path, "rb") as f:
+            index.__dict__.update(pickle.load(f))
+        return index
+
+    @classmethod
+    def from_documents(cls, items):
+        """Build an index from (chunk_id, Document) pairs."""
+        index = cls()
+        for chunk_id, doc in items:
+            index.add(chunk_id, doc.page_content)
+        return index
+
+    def frozen(self):
+        """A copy unaffected by later writes."""
+        index = KeywordIndex(self.k1, self.b)
+        index.postings = {token: dict(posting) for token, posting in self.postings.items()}
+        index.doc_lengths = dict(self.doc_lengths)
+        index.total_length = self.total_length
+        return index
+
+
+class MappedKeywordIndex:
+    """
+    BM25 over the postings of a snapshot (written by write_keyword_index),
+    memory-mapped so worker processes share their pages through the OS
+    cache, plus a KeywordIndex of the chunks added since. Chunks removed
+    from the snapshot are tombstoned until the next compaction. Scores
+    match a KeywordIndex holding the same chunks.
+    """
+
+    def __init__(self, directory: str):
+        def load(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        with open(os.path.join(directory, "params.json"), "r", encoding="utf-8") as f:
+            params = json.load(f)
+        self.k1 = params["k1"]
+        self.b = params["b"]
+        self.columns = IdColumns(os.path.join(directory, "ids"))  # chunk IDs by row
+        self.lengths = load("lengths.npy")  # tokens per row
+        self.tokens = load("tokens.npy")  # sorted, UTF-8
+        self.offsets = load("offsets.npy")  # postings of tokens[i]: offsets[i]:offsets[i + 1]
+        self.rows = load("rows.npy")
+        self.tfs = load("tfs.npy")
+        self.delta = KeywordIndex(self.k1, self.b)
+        self._snapshot_length = params["total_length"]
+        self._removed = set()  # snapshot rows
+        self._removed_length = 0
+        self._removed_rows = None  # sorted array of _removed, built on demand
+
+    def __len__(self):
+        return len(self.columns) - len(self._removed) + len(self.delta)
+
+    @property
+    def total_length(self):
+        return self._snapshot_length - self._removed_length + self.delta.total_length
+
+    def _live_row(self, chunk_id: str):
+        row = self.columns.row(chunk_id)
+        return None if row is None or row in self._removed else row
+
+    def _removed_array(self):
+        if self._removed_rows is None:
+            self._removed_rows = np.array(sorted(self._removed), dtype=np.int64)
+        return self._removed_rows
+
+    def add(self, chunk_id: str, text: str):
+        """Index one chunk."""
+        if self._live_row(chunk_id) is not None:
+            self.remove(chunk_id, text)
+        self.delta.add(chunk_id, text)
+
+    def remove(self, chunk_id: str, text: str):
+        """Drop one chunk; `text` is the chunk content it was indexed with."""
+        row = self._live_row(chunk_id)
+        if row is None:
+            self.delta.remove(chunk_id, text)
+            return
+        self._removed.add(row)
+        self._removed_length += int(self.lengths[row])
+        self._removed_rows = None
+
+    def _posting(self, token: str):
+        """Snapshot (rows, term frequencies) of `token`, tombstones included."""
+        key = token.encode("utf-8")
+        if len(key) <= self.tokens.dtype.itemsize:
+            i = int(np.searchsorted(self.tokens, key))
+            if i < len(self.tokens) and self.tokens[i] == key:
+                start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+                return self.rows[start:end], self.tfs[start:end]
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+
+    def search(self, query: str, top_k: int = 5, allowed_ids=None):
+        """
+        Return up to `top_k` (chunk_id, bm25_score) pairs, best first.
+        `allowed_ids` optionally restricts the hits to a set of chunk IDs.
+        """
+        n_docs = len(self)
+        if not n_docs:
+            return []
+
+        avg_length = self.total_length / n_docs or 1.0
+        removed = self._removed_array()
+        allowed_rows = None
+        if allowed_ids is not None:
+            allowed_rows = np.array([r for r in map(self._live_row, allowed_ids) if r is not None], dtype=np.int64)
+        found_rows, found_scores = [], []
+        delta_scores = {}
+
+        for token in set(tokenize(query)):
+            rows, tfs = self._posting(token)
+            if len(removed):
+                live = ~np.isin(rows, removed)
+                rows, tfs = rows[live], tfs[live]
+            delta_posting = self.delta.postings.get(token, {})
+            df = len(rows) + len(delta_posting)
+            if not df:
+                continue
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+            if allowed_rows is not None:
+                allowed = np.isin(rows, allowed_rows)
+                rows, tfs = rows[allowed], tfs[allowed]
+            if len(rows):
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[rows] / avg_length)
+                found_rows.append(rows)
+                found_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+            for chunk_id, tf in delta_posting.items():
+                if allowed_ids is not None and chunk_id not in allowed_ids:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.delta.doc_lengths[chunk_id] / avg_length)
+                delta_scores[chunk_id] = delta_scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        hits = list(delta_scores.items())
+        if found_rows:
+            rows, inverse = np.unique(np.concatenate(found_rows), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(found_scores))
+            best = np.argpartition(-scores, top_k)[:top_k] if len(scores) > top_k else range(len(scores))
+            hits.extend((self.columns.id_at(int(rows[i])), float(scores[i])) for i in best)
+        return heapq.nlargest(top_k, hits, key=lambda item: item[1])
+
+    def frozen(self):
+        """A view unaffected by later writes (the mapped files never change)."""
+        index = copy.copy(self)
+        index._removed = set(self._removed)
+        index.delta = self.delta.frozen()
+        return index
+
+
+def _write_columns(directory: str, ids, lengths, tokens, entry_tokens, rows, tfs, k1: float, b: float):
+    """
+    Write postings as memory-mappable columns: `tokens` in any order,
+    `entry_tokens`/`rows`/`tfs` one entry per (token, chunk) pair.
+    """
+    os.makedirs(directory, exist_ok=True)
+    encoded = [token.encode("utf-8") for token in tokens]
+    token_array = np.array(encoded, dtype=f"S{max((len(t) for t in encoded), default=1)}")
+    order = np.argsort(token_array, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    entry_ranks = rank[entry_tokens]
+    by_token = np.argsort(entry_ranks, kind="stable")
+    offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(entry_ranks, minlength=len(order)), out=offsets[1:])
+    lengths = np.asarray(lengths, dtype=np.int32)
+
+    write_id_columns(os.path.join(directory, "ids"), ids)
+    save_npy(os.path.join(directory, "lengths.npy"), lengths)
+    save_npy(os.path.join(directory, "tokens.npy"), token_array[order])
+    save_npy(os.path.join(directory, "offsets.npy"), offsets)
+    save_npy(os.path.join(directory, "rows.npy"), np.asarray(rows, dtype=np.int32)[by_token])
+    save_npy(os.path.join(directory, "tfs.npy"), np.asarray(tfs, dtype=np.int32)[by_token])
+    with open(os.path.join(directory, "params.json"), "w", encoding="utf-8") as f:
+        json.dump({"k1": k1, "b": b, "total_length": int(lengths.sum())}, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_keyword_index(directory: str, index):
+    """Write the chunks of a KeywordIndex or MappedKeywordIndex for MappedKeywordIndex to open."""
+    ids, tokens = [], []
+    lengths, entry_tokens, rows, tfs = (np.zeros(0, dtype=np.int64) for _ in range(4))
+    delta = index
+    if isinstance(index, MappedKeywordIndex):
+        delta = index.delta
+        keep = np.ones(len(index.columns), dtype=bool)
+        keep[index._removed_array()] = False
+        kept = keep[index.rows]
+        ids = [index.columns.id_at(int(row)) for row in np.flatnonzero(keep)]
+        tokens = [token.decode("utf-8") for token in index.tokens]
+        lengths = index.lengths[keep]
+        entry_tokens = np.repeat(np.arange(len(tokens)), np.diff(index.offsets))[kept]
+        rows = np.cumsum(keep)[index.rows[kept]] - 1  # renumbered without the removed rows
+        tfs = index.tfs[kept]
+
+    # Chunks added since: appended after the snapshot's rows
+    token_numbers = {token: i for i, token in enumerate(tokens)}
+    first_row = len(ids)
+    row_of = {chunk_id: first_row + i for i, chunk_id in enumerate(delta.doc_lengths)}
+    ids.extend(delta.doc_lengths)
+    delta_entries = [array("i") for _ in range(3)]
+    for token, posting in delta.postings.items():
+        number = token_numbers.setdefault(token, len(token_numbers))
+        for chunk_id, tf in posting.items():
+            delta_entries[0].append(number)
+            delta_entries[1].append(row_of[chunk_id])
+            delta_entries[2].append(tf)
+    tokens = list(token_numbers)
+
+    _write_columns(
+        directory, ids,
+        np.concatenate([lengths, np.fromiter(delta.doc_lengths.values(), dtype=np.int64)]),
+        tokens,
+        np.concatenate([entry_tokens, np.frombuffer(delta_entries[0], dtype=np.int32)]),
+        np.concatenate([rows, np.frombuffer(delta_entries[1], dtype=np.int32)]),
+        np.concatenate([tfs, np.frombuffer(delta_entries[2], dtype=np.int32)]),
+        index.k1, index.b,
+    )
+
+
+def write_keyword_columns(directory: str, items, k1: float = 1.5, b: float = 0.75):
+    """
+    Write (chunk_id, text) pairs straight into MappedKeywordIndex columns,
+    without holding a KeywordIndex of them (bulk imports, benchmarks).
+    """
+    ids, lengths = [], array("i")
+    token_numbers = {}
+    entries = [array("i") for _ in range(3)]
+    for row, (chunk_id, text) in enumerate(items):
+        tokens = tokenize(text)
+        ids.append(chunk_id)
+        lengths.append(len(tokens))
+        for token, tf in Counter(tokens).items():
+            entries[0].append(token_numbers.setdefault(token, len(token_numbers)))
+            entries[1].append(row)
+            entries[2].append(tf)
+    _write_columns(
+        directory, ids, np.frombuffer(lengths, dtype=np.int32), list(token_numbers),
+        *(np.frombuffer(column, dtype=np.int32) for column in entries), k1, b,
+    )
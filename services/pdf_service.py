@@ -1,86 +1,107 @@
-import PyPDF2
 import os
+import time
+from collections import deque
 
-def extract_text_from_pdf(filepath):
+import fitz  # PyMuPDF
+
+from services.ocr_service import OCR_WORKERS, ocr_page, submit_pdf_page_ocr
+
+# 🧩 Per-page text layer classification
+SCANNED_IMAGE_COVERAGE = 0.5
+SCANNED_MAX_TEXT_CHARS = 200
+
+
+def _is_garbage_text(text):
     """
-    Extract text content from a PDF file.
-    
-    Args:
-        filepath (str): Path to the PDF file
-        
-    Returns:
-        str: Extracted text content
-        
-    Raises:
-        Exception: If PDF extraction fails
+    Heuristic for broken text layers (bad font encodings, OCR-less scans
+    with junk glyphs): too many replacement/control/private-use characters,
+    or too few letters and digits overall.
     """
-    try:
-        if not os.path.exists(filepath):
-            raise FileNotFoundError(f"PDF file not found: {filepath}")
-        
-        text = ""
-        
-        with open(filepath, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            num_pages = len(pdf_reader.pages)
-            
-            print(f"📖 Reading PDF: {num_pages} page(s)")
-            
-            for page_num in range(num_pages):
-                try:
-                    page = pdf_reader.pages[page_num]
-                    page_text = page.extract_text()
-                    
-                    if page_text:
-                        text += page_text + "\n\n"
-                        print(f"   ✓ Page {page_num + 1}: {len(page_text)} chars")
-                    else:
-                        print(f"   ⚠ Page {page_num + 1}: No text found")
-                        
-                except Exception as page_error:
-                    print(f"   ❌ Error on page {page_num + 1}: {str(page_error)}")
-                    continue
-        
-        text = text.strip()
-        
-        if not text:
-            raise ValueError("No text could be extracted from the PDF. The file may contain only images or be corrupted.")
-        
-        print(f"✅ Total extracted: {len(text)} characters")
-        
-        return text
-        
-    except PyPDF2.errors.PdfReadError as e:
-        raise Exception(f"Invalid or corrupted PDF file: {str(e)}")
-    except Exception as e:
-        raise Exception(f"Error extracting text from PDF: {str(e)}")
+    visible = [c for c in text if not c.isspace()]
+    if not visible:
+        return True
 
+    bad = sum(
+        1 for c in visible
+        if c == "\ufffd" or not c.isprintable() or "\ue000" <= c <= "\uf8ff"
+    )
+    alnum = sum(1 for c in visible if c.isalnum())
+    return bad / len(visible) > 0.1 or alnum / len(visible) < 0.5
 
-def validate_pdf(filepath):
+
+def _image_coverage(page):
+    """Fraction of the page area covered by raster images."""
+    page_area = abs(page.rect) or 1.0
+    covered = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+    return min(covered / page_area, 1.0)
+
+
+def page_needs_ocr(page, text):
     """
-    Validate if a file is a readable PDF.
+    Decide whether a page must be OCR'd: its text layer is empty or
+    garbage, or it is essentially a full-page scan carrying only a few
+    characters of real text (e.g. a stamped page number).
+    """
+    if _is_garbage_text(text):
+        return True
+    return len(text) < SCANNED_MAX_TEXT_CHARS and _image_coverage(page) >= SCANNED_IMAGE_COVERAGE
+
+
+def iter_pdf_pages(filepath, on_page=None):
+    """
+    Stream the text of a PDF page by page, opening the document only once.
+    
+    Each page is classified on its own: pages with a usable text layer use
+    it; only pages whose text layer is missing or garbage are OCR'd (on the
+    OCR process pool when OCR_WORKERS > 1, keeping at most 2 × OCR_WORKERS
+    pages in flight). Pages are yielded in order.
     
     Args:
-        filepath (str): Path to the file
+        filepath (str): Path to the PDF file
+        on_page (callable): Optional on_page(page_number, method, total_pages, seconds),
+            called as each page is yielded; method is "text" or "ocr"
         
-    Returns:
-        tuple: (is_valid, error_message)
+    Yields:
+        str: Text of each page
     """
-    try:
-        with open(filepath, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            
-            # Check if we can read the number of pages
-            num_pages = len(pdf_reader.pages)
-            
-            if num_pages == 0:
-                return False, "PDF has no pages"
-            
-            # Try to read first page
-            first_page = pdf_reader.pages[0]
-            first_page.extract_text()
-            
-            return True, None
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"PDF file not found: {filepath}")
+    
+    with fitz.open(filepath) as pdf:
+        total_pages = len(pdf)
+        window = max(2 * OCR_WORKERS, 1)
+        pending = deque()  # (page_index, method, (text, seconds) or Future of it)
+        print(f"📖 Reading PDF: {total_pages} page(s)")
+        
+        def resolve(entry):
+            i, method, value = entry
+            text, seconds = value if isinstance(value, tuple) else value.result()
+            if on_page:
+                on_page(i + 1, method, total_pages, seconds)
+            return text
+        
+        try:
+            for i in range(total_pages):
+                start = time.perf_counter()
+                page = pdf.load_page(i)
+                text = page.get_text().strip()
+                
+                if not page_needs_ocr(page, text):
+                    pending.append((i, "text", (text, time.perf_counter() - start)))
+                elif OCR_WORKERS <= 1:
+                    text = ocr_page(page)
+                    pending.append((i, "ocr", (text, time.perf_counter() - start)))
+                else:
+                    pending.append((i, "ocr", submit_pdf_page_ocr(filepath, i)))
+                
+                # Emit everything that is ready, or block once the window is full
+                while pending and (isinstance(pending[0][2], tuple) or len(pending) >= window):
+                    yield resolve(pending.popleft())
             
-    except Exception as e:
-        return False, str(e)
\ No newline at end of file
+            while pending:
+                yield resolve(pending.popleft())
+        
+        finally:
+            for _, _, value in pending:
+                if not isinstance(value, tuple):
+                    value.cancel()
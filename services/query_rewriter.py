@@ -0,0 +1,132 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from services.keyword_index import tokenize
+
+# Standalone search queries for follow-up questions:
+#   heuristic  fold key terms of the previous question into the follow-up
+#   llm        ask the chat model (once per session turn), heuristic as fallback
+#   off        search with the question as asked
+QUERY_REWRITE_MODES = ("heuristic", "llm", "off")
+QUERY_REWRITE = os.getenv("QUERY_REWRITE", "heuristic").lower()
+if QUERY_REWRITE not in QUERY_REWRITE_MODES:
+    raise ValueError(f"❌ QUERY_REWRITE must be one of {', '.join(QUERY_REWRITE_MODES)}")
+QUERY_REWRITE_CONTEXT_TERMS = int(os.getenv("QUERY_REWRITE_CONTEXT_TERMS", "8"))
+QUERY_REWRITE_CACHE_SIZE = int(os.getenv("QUERY_REWRITE_CACHE_SIZE", "10000"))
+
+_FOLLOW_UP_START = re.compile(
+    r"^\s*(and also|and what about|what about|how about|and|also|but|so|then|dan|juga)\b[\s,]*", re.IGNORECASE
+)
+# Words that point back at an earlier turn. Personal pronouns always do;
+# demonstratives only when they stand alone ("explain that"), not as a
+# determiner ("this document") or Malay post-determiner ("dokumen ini");
+# "there" only outside "is there" / "there are".
+_PERSONAL = {"it", "its", "they", "them", "their", "he", "she", "him", "his", "her", "dia", "mereka"}
+_DEMONSTRATIVES = {"this", "that", "these", "those", "same", "above", "previous", "former", "latter"}
+_POST_DEMONSTRATIVES = {"ini", "itu", "tersebut"}
+_BE = {"is", "are", "was", "were", "be", "been", "s"}
+_SUBJECTS = {"i", "we", "you", "they", "he", "she", "it"}  # "the fee that I pay": a relative "that"
+_STOPWORDS = _PERSONAL | _DEMONSTRATIVES | _POST_DEMONSTRATIVES | {
+    "a", "an", "the", "and", "or", "but", "of", "to", "in", "on", "for", "with", "by", "at", "from", "as", "is",
+    "are", "was", "were", "be", "been", "do", "does", "did", "what", "which", "who", "whom", "whose", "when",
+    "where", "why", "how", "much", "many", "can", "could", "would", "should", "will", "please", "tell", "me",
+    "give", "show", "list", "about", "also", "any", "i", "my", "we", "our", "you", "your", "so", "then",
+    "there", "s", "mean", "means",
+    "apa", "siapa", "bila", "berapa", "mana", "yang", "dan", "atau", "di", "ke", "dari", "untuk", "dengan",
+    "adalah", "ialah", "juga", "bagaimana", "kenapa", "mengapa",
+}
+
+_cache = OrderedDict()  # (session_id, last message seq, question) → query
+_lock = threading.Lock()
+_stats = {"standalone": 0, "heuristic": 0, "llm": 0, "llm_cache_hits": 0, "llm_errors": 0}
+
+
+def _content_terms(text: str):
+    return [t for t in tokenize(text) if t not in _STOPWORDS]
+
+
+def _is_reference(tokens, i) -> bool:
+    token = tokens[i]
+    before = tokens[i - 1] if i > 0 else None
+    after = tokens[i + 1] if i + 1 < len(tokens) else None
+    if token in _PERSONAL:
+        return True
+    if token in _DEMONSTRATIVES:
+        return after is None or (after in _STOPWORDS and not (token == "that" and after in _SUBJECTS))
+    if token in _POST_DEMONSTRATIVES:
+        return (before is None or before in _STOPWORDS) and (after is None or after in _STOPWORDS)
+    if token == "there":
+        return before not in _BE and after not in _BE
+    return False
+
+
+def is_follow_up(question: str) -> bool:
+    """
+    Whether a question leans on earlier turns: it opens with "and"/"what
+    about", points back with a pronoun, or has nothing of its own to search.
+    """
+    tokens = tokenize(question)
+    return (
+        bool(_FOLLOW_UP_START.match(question))
+        or any(_is_reference(tokens, i) for i in range(len(tokens)))
+        or not _content_terms(question)
+    )
+
+
+def _heuristic(question: str, history, summary: str) -> str:
+    """The follow-up without its connective, plus key terms of the previous user question."""
+    previous = next((m["content"] for m in reversed(history) if m["role"] == "user"), summary)
+    cleaned = _FOLLOW_UP_START.sub("", question).strip()
+    asked = set(tokenize(cleaned))
+    terms = list(dict.fromkeys(t for t in _content_terms(previous) if t not in asked))
+    return " ".join([cleaned, *terms[:QUERY_REWRITE_CONTEXT_TERMS]]).strip()
+
+
+def build_search_query(question: str, history, summary: str = "", session_id: str | None = None, rewrite=None):
+    """
+    Standalone query for the keyword and vector retrievers.
+
+    Questions that stand on their own are searched as asked. Follow-ups
+    are resolved against the session's recent `history` (and `summary`):
+    by the local heuristic, or with QUERY_REWRITE=llm by
+    `rewrite(question, history, summary)`, cached per session turn.
+    """
+    if QUERY_REWRITE == "off" or not (history or summary) or not is_follow_up(question):
+        with _lock:
+            _stats["standalone"] += 1
+        return question
+
+    if QUERY_REWRITE == "llm" and rewrite is not None:
+        key = (session_id, history[-1].get("seq") if history else None, question)
+        with _lock:
+            query = _cache.get(key)
+            if query is not None:
+                _cache.move_to_end(key)
+                _stats["llm_cache_hits"] += 1
+                return query
+        try:
+            query = rewrite(question, history, summary).strip()
+        except Exception as e:
+            print(f"⚠️ Query rewrite failed, using heuristic: {e}")
+            query = ""
+            with _lock:
+                _stats["llm_errors"] += 1
+        if query:
+            with _lock:
+                _stats["llm"] += 1
+                _cache[key] = query
+                while len(_cache) > QUERY_REWRITE_CACHE_SIZE:
+                    _cache.popitem(last=False)
+            return query
+
+    with _lock:
+        _stats["heuristic"] += 1
+    return _heuristic(question, history, summary)
+
+
+def stats():
+    """How questions were turned into search queries."""
+    with _lock:
+        return {"mode": QUERY_REWRITE, **_stats, "cached": len(_cache)}
@@ -0,0 +1,159 @@
+import os
+import time
+import threading
+
+import numpy as np
+
+from services.keyword_index import tokenize
+
+# Re-ranking of the fused candidates: none | lexical | cross-encoder
+RERANKERS = ("none", "lexical", "cross-encoder")
+RERANKER = os.getenv("RERANKER", "none").lower()
+if RERANKER not in RERANKERS:
+    raise ValueError(f"❌ RERANKER must be one of {', '.join(RERANKERS)}")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Fused candidates fetched for re-ranking, pairs scored per batch, and the
+# time the stage may take before it is skipped (fusion order is kept)
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+# Lexical scores are blended with the fusion score, which carries the semantic signal
+RERANK_LEXICAL_WEIGHT = float(os.getenv("RERANK_LEXICAL_WEIGHT", "0.5"))
+
+_model = None
+_model_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"reranked": 0, "skipped_predicted": 0, "skipped_timeout": 0}
+_ms_per_pair = {}  # method → moving average of scoring cost
+
+
+def _cross_encoder():
+    """Load the cross-encoder once; None when sentence-transformers is not installed."""
+    global _model
+    with _model_lock:
+        if _model is None:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError:
+                print("⚠️ sentence-transformers not installed, using the lexical re-ranker")
+                _model = False
+                return None
+            print(f"🔄 Loading re-ranker model ({RERANK_MODEL})...")
+            _model = CrossEncoder(RERANK_MODEL, device="cpu")
+            print("✅ Re-ranker model loaded")
+        return _model or None
+
+
+def _min_max(scores):
+    span = scores.max() - scores.min()
+    return (scores - scores.min()) / span if span > 0 else np.ones_like(scores)
+
+
+def _lexical_scores(question: str, texts, deadline: float):
+    """
+    BM25 of the question over the candidates (IDF taken within the set),
+    plus the share of question terms each candidate covers and a bonus for
+    question bigrams found verbatim. None once `deadline` passes.
+    """
+    query = tokenize(question)
+    terms = list(dict.fromkeys(query))
+    if not terms:
+        return np.zeros(len(texts))
+    column = {term: i for i, term in enumerate(terms)}
+    bigrams = set(zip(query, query[1:]))
+
+    tf = np.zeros((len(texts), len(terms)))
+    lengths = np.zeros(len(texts))
+    adjacent = np.zeros(len(texts))
+    for start in range(0, len(texts), RERANK_BATCH_SIZE):
+        if time.perf_counter() > deadline:
+            return None
+        for row in range(start, min(start + RERANK_BATCH_SIZE, len(texts))):
+            tokens = tokenize(texts[row])
+            lengths[row] = len(tokens)
+            for token in tokens:
+                i = column.get(token)
+                if i is not None:
+                    tf[row, i] += 1
+            if bigrams:
+                adjacent[row] = sum(pair in bigrams for pair in zip(tokens, tokens[1:]))
+
+    k1, b = 1.2, 0.75
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1 + (len(texts) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / (lengths.mean() or 1.0))
+    bm25 = (idf * tf * (k1 + 1) / (tf + norm[:, None])).sum(axis=1)
+    coverage = (tf > 0).mean(axis=1)
+    return bm25 + coverage + 0.5 * np.minimum(adjacent, 3) / 3
+
+
+def _cross_encoder_scores(model, question: str, texts, deadline: float):
+    """Relevance logits of (question, chunk) pairs in batches; None once `deadline` passes."""
+    scores = []
+    for start in range(0, len(texts), RERANK_BATCH_SIZE):
+        if time.perf_counter() > deadline:
+            return None
+        pairs = [(question, text) for text in texts[start:start + RERANK_BATCH_SIZE]]
+        scores.append(np.asarray(model.predict(pairs, batch_size=RERANK_BATCH_SIZE), dtype=float))
+    return np.concatenate(scores) if scores else np.zeros(0)
+
+
+def rerank(question: str, docs, prior_scores, top_n: int, budget_ms: float | None = None):
+    """
+    Re-order candidate chunks (best first by fusion, with their fused
+    scores) and keep `top_n` as (Document, score) pairs.
+
+    Returns None when re-ranking is skipped: its cost predicted from earlier
+    queries exceeds `budget_ms` (default RERANK_BUDGET_MS), or scoring
+    runs past it.
+    """
+    if not docs:
+        return []
+    budget_ms = RERANK_BUDGET_MS if budget_ms is None else budget_ms
+    model = _cross_encoder() if RERANKER == "cross-encoder" else None
+    method = "cross-encoder" if model is not None else "lexical"
+
+    predicted = _ms_per_pair.get(method, 0.0) * len(docs)
+    if predicted > budget_ms:
+        with _stats_lock:
+            _stats["skipped_predicted"] += 1
+            # Decay the estimate so a slow spell does not disable re-ranking for good
+            _ms_per_pair[method] *= 0.9
+        return None
+
+    start = time.perf_counter()
+    deadline = start + budget_ms / 1000
+    texts = [doc.page_content for doc in docs]
+    if model is not None:
+        scores = _cross_encoder_scores(model, question, texts, deadline)
+    else:
+        scores = _lexical_scores(question, texts, deadline)
+        if scores is not None:
+            weight = RERANK_LEXICAL_WEIGHT
+            scores = weight * _min_max(scores) + (1 - weight) * _min_max(np.asarray(prior_scores, dtype=float))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    with _stats_lock:
+        per_pair = elapsed_ms / len(docs)
+        previous = _ms_per_pair.get(method)
+        _ms_per_pair[method] = per_pair if previous is None else 0.8 * previous + 0.2 * per_pair
+        if scores is None:
+            # Over budget: predict that for the next query of this size
+            _ms_per_pair[method] = max(_ms_per_pair[method], per_pair)
+            _stats["skipped_timeout"] += 1
+            return None
+        _stats["reranked"] += 1
+
+    order = np.argsort(-scores, kind="stable")[:top_n]
+    return [(docs[i], float(scores[i])) for i in order]
+
+
+def stats():
+    """Re-ranking counters and the per-pair cost estimate used by the budget."""
+    with _stats_lock:
+        return {
+            "reranker": RERANKER,
+            "budget_ms": RERANK_BUDGET_MS,
+            **_stats,
+            "ms_per_pair": {method: round(ms, 4) for method, ms in _ms_per_pair.items()},
+        }
@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import deque
+
+# Streamed answer text is sent in SSE frames of up to SSE_FRAME_MAX_CHARS,
+# or whatever arrived within SSE_FRAME_MAX_DELAY_MS; the first text goes out at once
+SSE_FRAME_MAX_CHARS = int(os.getenv("SSE_FRAME_MAX_CHARS", "64"))
+SSE_FRAME_MAX_DELAY_MS = float(os.getenv("SSE_FRAME_MAX_DELAY_MS", "40"))
+
+_SEPARATOR_CHARS = "|-: \t"
+_SEPARATOR_ROW = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+
+
+def sse_event(payload: dict) -> str:
+    """One server-sent event frame."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+class _FrameBuffer:
+    """
+    Joins pieces into frames on the thread reading the source. The reader
+    of frames is only woken when a frame is cut, a new one starts (to learn
+    its deadline) or the source ends, not for every piece.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.stopped = False
+        self._cond = threading.Condition()
+        self._frames = deque()
+        self._pieces = []
+        self._size = 0
+        self._started = None  # arrival of the oldest buffered piece
+        self._first = True
+        self._done = False
+        self._error = None
+
+    def _cut(self):
+        self._frames.append("".join(self._pieces))
+        self._pieces = []
+        self._size = 0
+        self._started = None
+
+    def feed(self, pieces):
+        """Read the source (on its own thread) until it ends or `stopped` is set."""
+        try:
+            for piece in pieces:
+                if self.stopped:
+                    break
+                if not piece:
+                    continue
+                with self._cond:
+                    self._pieces.append(piece)
+                    self._size += len(piece)
+                    if self._started is None:
+                        self._started = time.perf_counter()
+                        self._cond.notify()
+                    # The first piece goes out alone, so time to first token is unchanged
+                    if self._first or self._size >= self.max_chars:
+                        self._first = False
+                        self._cut()
+                        self._cond.notify()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify()
+
+    def next_frame(self, max_delay: float):
+        """The next frame, cut early once its oldest piece is `max_delay` seconds old; None at the end."""
+        with self._cond:
+            while True:
+                if self._frames:
+                    return self._frames.popleft()
+                if self._pieces and (self._done or time.perf_counter() - self._started >= max_delay):
+                    self._cut()
+                    continue
+                if self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return None
+                self._cond.wait(None if self._started is None else self._started + max_delay - time.perf_counter())
+
+
+def coalesce(pieces, max_chars: int = SSE_FRAME_MAX_CHARS, max_delay_ms: float = SSE_FRAME_MAX_DELAY_MS):
+    """
+    Join streamed text pieces into larger chunks: a chunk is cut once it
+    holds `max_chars` characters or its first piece is `max_delay_ms` old.
+    Pieces are read on a helper thread, so the deadline holds while the
+    source is stalled (e.g. the model pausing mid-answer). The first piece
+    is passed on alone, so time to first token is unchanged.
+    """
+    frames = _FrameBuffer(max_chars)
+    threading.Thread(target=frames.feed, args=(pieces,), name="sse-coalesce", daemon=True).start()
+    try:
+        while (frame := frames.next_frame(max_delay_ms / 1000)) is not None:
+            yield frame
+    finally:
+        frames.stopped = True
+
+
+class SeparatorRowFilter:
+    """
+    Drops Markdown table separator rows (|---|:--:|) from streamed text.
+
+    Text passes through as it arrives. Only a line made up so far of
+    separator characters (pipes, dashes, colons, blanks) is held back
+    until its newline shows whether it is a separator row, so rows split
+    across tokens are caught. A row of dashes counts as a separator when
+    it has a pipe or follows a table row; a lone `---` rule is kept.
+    """
+
+    def __init__(self):
+        self._held = []  # current line, while it may still be a separator row
+        self._holding = True
+        self._line_has_pipe = False
+        self._previous_was_table = False
+
+    def _is_separator(self, line: str) -> bool:
+        return (
+            "-" in line
+            and ("|" in line or self._previous_was_table)
+            and _SEPARATOR_ROW.match(line) is not None
+        )
+
+    def feed(self, text: str) -> str:
+        """Filter the next piece of text; returns what can be sent on now."""
+        out = []
+        start = 0
+        while start < len(text):
+            newline = text.find("\n", start)
+            end = len(text) if newline == -1 else newline
+            segment = text[start:end]
+            if segment:
+                if "|" in segment:
+                    self._line_has_pipe = True
+                if not self._holding:
+                    out.append(segment)
+                elif segment.strip(_SEPARATOR_CHARS):
+                    out.extend(self._held)
+                    out.append(segment)
+                    self._held.clear()
+                    self._holding = False
+                else:
+                    self._held.append(segment)
+            if newline == -1:
+                break
+
+            # End of line: a held line is either dropped or sent whole
+            if self._holding:
+                line = "".join(self._held)
+                self._held.clear()
+                if not self._is_separator(line):
+                    out.append(line + "\n")
+            else:
+                out.append("\n")
+            self._previous_was_table = self._line_has_pipe
+            self._line_has_pipe = False
+            self._holding = True
+            start = newline + 1
+        return "".join(out)
+
+    def finish(self) -> str:
+        """Whatever is still held once the stream ends."""
+        line = "".join(self._held)
+        self._held.clear()
+        return "" if self._is_separator(line) else line
@@ -1,12 +1,34 @@
 import os
-import re
+import json
+import time
 import uuid
 import pickle
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import faiss
+import numpy as np
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.docstore.document import Document
+from services.keyword_index import KeywordIndex, MappedKeywordIndex, write_keyword_index
+from services.embedding_cache import QueryEmbeddingCache, ChunkEmbeddingCache
+from services.embedding_client import EmbeddingClient
+from services import document_store
+from services.document_store import ChunkDocstore
+from services.chunk_store import IdColumns, ColumnarIdMap, write_id_columns
+from services.fusion import FUSION_METHODS, fuse
+from services import reranker
+from services.ann_index import (
+    INDEX_TYPES, VECTOR_STORAGES, IVF_TRAIN_SIZE, AnnIndex, can_train, new_flat_index, new_index, read_ann, write_ann,
+    SnapshotIndex, to_mappable, from_mappable,
+)
+from services.index_log import (
+    WriteAheadLog, WalGapError, atomic_write, file_lock, fsync_dir, read_current, write_current,
+    wal_path, wal_generations,
+)
 
 # 🔧 Environment Setup
 load_dotenv()
@@ -15,145 +37,923 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("❌ Missing OPENAI_API_KEY in .env file")
 
-# Initialize embeddings
-print("🔄 Loading OpenAI Embedding model (text-embedding-3-large)...")
-embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-large",
-    openai_api_key=OPENAI_API_KEY
-)
-print("✅ OpenAI embedding model loaded successfully!")
-
-
 # 📂 Vector Store Paths
 
 VECTOR_STORE_DIR = "./vector_db"
 VECTOR_STORE_PATH = os.path.join(VECTOR_STORE_DIR, "faiss_index")
 METADATA_PATH = os.path.join(VECTOR_STORE_DIR, "metadata.pkl")
+KEYWORD_INDEX_PATH = os.path.join(VECTOR_STORE_DIR, "keyword_index.pkl")
+
+# Snapshots + write-ahead log: index/CURRENT names the live snapshot-<gen>/,
+# wal-<gen>.log holds the mutations made since. A snapshot's BM25 postings
+# are memory-mapped, with chunks written since kept in memory on top.
+# Document metadata and chunk text live in SQLite (services/document_store.py).
+# The paths above are only read to import stores written by older versions.
+INDEX_DIR = os.path.join(VECTOR_STORE_DIR, "index")
+WAL_FSYNC = os.getenv("WAL_FSYNC", "1") != "0"
+COMPACT_WAL_BYTES = int(os.getenv("COMPACT_WAL_BYTES", str(128 * 1024 * 1024)))
+# Open snapshot indexes with faiss memory-mapping, so worker processes share
+# their pages through the OS cache (snapshots store the flat index as a
+# one-list IVF index, the form faiss can map). The mapping stays read-only:
+# later writes go to a small heap index on top until the next compaction.
+FAISS_MMAP = os.getenv("FAISS_MMAP", "1") != "0"
+
+# Approximate search: once the exact (flat) index holds ANN_MIN_VECTORS
+# vectors, an INDEX_TYPE index (hnsw | ivfpq) is built in the background and
+# serves whole-corpus searches; its candidates are re-ranked exactly.
+# "flat" keeps brute-force search only. IVF-PQ also waits for enough
+# vectors to train its codebooks, and a failed build is retried only once
+# the index has grown by ANN_REBUILD_RATIO.
+INDEX_TYPE = os.getenv("INDEX_TYPE", "hnsw").lower()
+if INDEX_TYPE not in INDEX_TYPES:
+    raise ValueError(f"❌ INDEX_TYPE must be one of {', '.join(INDEX_TYPES)}")
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "20000"))
+ANN_RERANK_FACTOR = int(os.getenv("ANN_RERANK_FACTOR", "4"))  # candidates per result (ANN or quantized search)
+ANN_REBUILD_RATIO = float(os.getenv("ANN_REBUILD_RATIO", "0.2"))  # deleted share that triggers a rebuild
+ANN_BUILD_BATCH = 10_000  # vectors copied out of the flat index per lock hold
+
+# Hybrid search: candidates taken from each retriever, how they are fused
+# (rrf | weighted), the RRF constant, default weights and results returned.
+# Method, weights, rrf_k and top_k can also be set per request.
+FUSION_CANDIDATES = int(os.getenv("FUSION_CANDIDATES", "20"))
+FUSION_METHOD = os.getenv("FUSION_METHOD", "rrf").lower()
+if FUSION_METHOD not in FUSION_METHODS:
+    raise ValueError(f"❌ FUSION_METHOD must be one of {', '.join(FUSION_METHODS)}")
+FUSION_RRF_K = float(os.getenv("FUSION_RRF_K", "60"))
+FUSION_WEIGHTS = {
+    "semantic": float(os.getenv("FUSION_SEMANTIC_WEIGHT", "1.0")),
+    "keyword": float(os.getenv("FUSION_KEYWORD_WEIGHT", "1.0")),
+}
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+
+# Running totals of time spent per retrieval stage (stage → [queries, ms])
+_stage_timings = {}
+_stage_timings_lock = threading.Lock()
+
+# Vector storage in the indexes: float32, float16 or sq8 (8-bit scalar
+# quantized: 4x smaller). With a quantized index, candidates are re-ranked
+# on the float32 vectors kept in the chunk embedding cache.
+VECTOR_STORAGE = os.getenv("VECTOR_STORAGE", "float32").lower()
+if VECTOR_STORAGE not in VECTOR_STORAGES:
+    raise ValueError(f"❌ VECTOR_STORAGE must be one of {', '.join(VECTOR_STORAGES)}")
+FULL_PRECISION_RERANK = os.getenv("FULL_PRECISION_RERANK", "1") != "0"
+
+# Query embedding cache (set QUERY_EMBEDDING_CACHE_PATH="" to keep it in memory only)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_CACHE_PATH = os.getenv(
+    "QUERY_EMBEDDING_CACHE_PATH", os.path.join(VECTOR_STORE_DIR, "query_embeddings.npy")
+)
+
+# Content-addressed cache of chunk embeddings, shared by all uploads
+CHUNK_EMBEDDING_CACHE_DIR = os.getenv(
+    "CHUNK_EMBEDDING_CACHE_DIR", os.path.join(VECTOR_STORE_DIR, "embedding_cache")
+)
+
+# Streaming ingestion: chunks per embedding batch, batches embedded concurrently
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "2"))
+
+# Embedding API client: request sizing, concurrency and rate limits
+# (OPENAI_BASE_URL can point at a local fake server for benchmarks)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+# Shortened embeddings via the API's `dimensions` parameter (0 = full size)
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_RPM = int(os.getenv("EMBEDDING_RPM", "3000"))
+EMBEDDING_TPM = int(os.getenv("EMBEDDING_TPM", "1000000"))
+
+# Initialize embeddings (caches are keyed by model and size)
+EMBEDDING_NAMESPACE = f"{EMBEDDING_MODEL}@{EMBEDDING_DIMENSIONS}" if EMBEDDING_DIMENSIONS else EMBEDDING_MODEL
+print(f"🔄 Loading OpenAI Embedding model ({EMBEDDING_MODEL})...")
+embedding_client = EmbeddingClient(
+    model=EMBEDDING_MODEL,
+    api_key=OPENAI_API_KEY,
+    base_url=os.getenv("OPENAI_BASE_URL") or None,
+    dimensions=EMBEDDING_DIMENSIONS or None,
+    batch_size=EMBEDDING_BATCH_SIZE,
+    concurrency=EMBEDDING_CONCURRENCY,
+    requests_per_minute=EMBEDDING_RPM,
+    tokens_per_minute=EMBEDDING_TPM,
+)
+embeddings = QueryEmbeddingCache(
+    embedding_client,
+    max_size=QUERY_EMBEDDING_CACHE_SIZE,
+    path=QUERY_EMBEDDING_CACHE_PATH or None,
+    namespace=EMBEDDING_NAMESPACE,
+)
+chunk_embeddings = ChunkEmbeddingCache(
+    embedding_client,
+    directory=CHUNK_EMBEDDING_CACHE_DIR,
+    namespace=EMBEDDING_NAMESPACE,
+)
+print("✅ OpenAI embedding model loaded successfully!")
 
 # Global cache
 _vectorstore = None
-_documents_metadata = {}
+_loaded = False
+_keyword_index = None
+_positions_by_id = None  # docstore ID → FAISS row, rebuilt lazily after writes
+_write_lock = threading.RLock()  # ingestion workers add/delete concurrently
+_snapshot_generation = None  # snapshot the index was opened from
+_wal = None
+_compaction_lock = threading.Lock()
+_compaction_pending = False
+_ann = None  # AnnIndex serving global searches once promoted
+_ann_pending = None  # writes made while an ANN index is being built (None when idle)
+_ann_retry_at = None  # after a failed build: exact-index size to wait for before retrying
 
 # ⚙️ Load / Save Helpers
+def _snapshot_dir(generation: int):
+    return os.path.join(INDEX_DIR, f"snapshot-{generation:08d}")
+
+
+def _read_faiss_index(path: str):
+    """
+    Read a snapshot's flat index (stored by to_mappable): memory-mapped
+    under a heap delta (SnapshotIndex) when FAISS_MMAP is on, else copied
+    into the heap.
+    """
+    if FAISS_MMAP:
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+            index.make_direct_map()  # reconstruct() by position
+            return SnapshotIndex(index)
+        except Exception as e:
+            print(f"⚠️ Memory-mapped index load failed, reading into memory: {e}")
+    return from_mappable(faiss.read_index(path))
+
+
+class IndexConfigError(ValueError):
+    """The stored index was built with a different embedding model, size or storage."""
+
+
+def _index_config():
+    return {"model": EMBEDDING_MODEL, "dimensions": EMBEDDING_DIMENSIONS, "storage": VECTOR_STORAGE}
+
+
+def _check_index_config(store):
+    """
+    Compare the configuration recorded in INDEX_DIR/index.json with the
+    current one; vectors from different models, sizes or encodings cannot
+    share an index. The first run records it (stores from older versions
+    were always full-size float32).
+    """
+    path = os.path.join(INDEX_DIR, "index.json")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            recorded = json.load(f)
+    else:
+        recorded = _index_config()
+        if store is not None:
+            recorded.update(dimensions=0, storage="float32")
+        atomic_write(path, json.dumps(recorded).encode("utf-8"))
+
+    if recorded != _index_config():
+        raise IndexConfigError(
+            f"Vector index was built with {recorded} but the configuration is {_index_config()}; "
+            f"restore the settings or re-index into an empty {VECTOR_STORE_DIR}"
+        )
+
+
+def _new_vectorstore(dim: int):
+    return FAISS(
+        embedding_function=embeddings,
+        index=new_flat_index(dim, VECTOR_STORAGE),
+        docstore=ChunkDocstore(),
+        index_to_docstore_id={},
+    )
+
+
+def _open_snapshot(snapshot: str):
+    """FAISS store for a snapshot directory (None if it holds no vectors)."""
+    if not os.path.exists(os.path.join(snapshot, "index.faiss")):
+        return None
+    index = _read_faiss_index(os.path.join(snapshot, "index.faiss"))
+    store = _new_vectorstore(index.d)
+    store.index = index
+    store.index_to_docstore_id = ColumnarIdMap(IdColumns(os.path.join(snapshot, "ids")))
+    return store
+
+
 def _load_vectorstore():
-    """Load existing FAISS store or create a new one."""
-    global _vectorstore, _documents_metadata
+    """
+    Load the latest snapshot (or a store saved by older versions) and
+    replay the write-ahead log on top of it. Runs once per process;
+    later calls only apply records other processes have logged since.
+    """
+    global _vectorstore, _loaded, _keyword_index, _wal, _ann, _ann_pending, _ann_retry_at, _snapshot_generation
 
-    if _vectorstore is not None:
+    if _loaded:
+        _catch_up()
         return _vectorstore
 
-    os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
-    try:
-        if os.path.exists(f"{VECTOR_STORE_PATH}.faiss") and os.path.exists(VECTOR_STORE_PATH):
-            _vectorstore = FAISS.load_local(
-                VECTOR_STORE_PATH, embeddings, allow_dangerous_deserialization=True
-            )
-            print("✅ Loaded existing FAISS vector store")
-        else:
+    with _write_lock:
+        if _loaded:
+            return _vectorstore
+
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        try:
+            start = time.perf_counter()
+            _ann = _ann_pending = _ann_retry_at = None
+            legacy = None
+            generation = read_current(INDEX_DIR)
+            if generation is not None:
+                snapshot = _snapshot_dir(generation)
+                _vectorstore = _open_snapshot(snapshot)
+                if INDEX_TYPE != "flat":
+                    _ann = read_ann(os.path.join(snapshot, "ann"))
+                _keyword_index = MappedKeywordIndex(os.path.join(snapshot, "keywords"))
+                print(f"✅ Loaded index snapshot {generation}")
+            else:
+                generation = 0
+                _vectorstore, legacy = _load_legacy_store()
+            _snapshot_generation = generation
+
+            if legacy is not None and document_store.is_empty():
+                metadata, chunks = legacy
+                document_store.import_documents(metadata, chunks)
+                print(f"📋 Imported {len(metadata)} document(s) into {document_store.DOCUMENTS_DB_PATH}")
+            if _vectorstore is not None:
+                _vectorstore.docstore = ChunkDocstore()
+            _check_index_config(_vectorstore)
+
+            _wal = WriteAheadLog(INDEX_DIR, generation, fsync=WAL_FSYNC)
+            records = _wal.read_new(lock=True)
+            for record in records:
+                _apply_record(record)
+            if records:
+                print(f"♻️ Replayed {len(records)} write-ahead log record(s)")
+            _maybe_build_ann()
+
+            _loaded = True
+            print(f"⏱️ Vector store ready in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return _vectorstore
+
+        except Exception as e:
+            print(f"❌ Error loading vectorstore: {e}")
+            import traceback; traceback.print_exc()
             _vectorstore = None
-            print("📝 No existing FAISS vector store — will create new one")
+            _keyword_index = None
+            if isinstance(e, IndexConfigError):
+                raise
+            return None
 
-        if os.path.exists(METADATA_PATH):
-            with open(METADATA_PATH, "rb") as f:
-                _documents_metadata = pickle.load(f)
-            print(f"📋 Loaded metadata for {len(_documents_metadata)} document(s)")
 
-        return _vectorstore
+def _catch_up():
+    """
+    Apply records other processes appended to the WAL since our last read.
+    Once another process has compacted them into a newer snapshot, the
+    index is reopened on its mapping, so the heap delta starts empty again.
+    """
+    if not _wal.pending():
+        return
 
-    except Exception as e:
-        print(f"❌ Error loading vectorstore: {e}")
-        _vectorstore = None
-        return None
+    with _write_lock:
+        try:
+            for record in _wal.read_new():
+                _apply_record(record)
+        except WalGapError as e:
+            # Idle long enough for the segments we needed to be compacted away
+            print(f"♻️ {e}; reloading from the snapshot")
+            _reopen()
+            return
+        if _snapshot_is_stale():
+            print("♻️ Index compacted into a newer snapshot; reopening it")
+            _reopen()
 
 
-def _save_metadata():
-    """Save all documents' metadata."""
-    os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
-    with open(METADATA_PATH, "wb") as f:
-        pickle.dump(_documents_metadata, f)
+def _snapshot_is_stale():
+    """With FAISS_MMAP, whether a newer snapshot replaced the one the index was opened from."""
+    return FAISS_MMAP and read_current(INDEX_DIR) not in (None, _snapshot_generation)
 
-# ➕ Add Document
-def add_document_to_vectorstore(text: str, filename: str):
+
+def _reopen():
+    """Load the current snapshot and replay its WAL. Callers hold _write_lock."""
+    global _loaded
+
+    _wal.close()
+    _loaded = False
+    _load_vectorstore()
+
+
+def _load_legacy_store():
     """
-    Add a document (PDF/Word/plain text) into FAISS vectorstore.
-    Splits, embeds, and stores chunks with metadata.
+    Load a store written with save_local + metadata.pkl (no snapshots yet).
+    Returns (store, legacy), where legacy is (metadata, chunks) to import
+    into the SQLite document store, or None without metadata.pkl.
     """
-    global _vectorstore, _documents_metadata
+    store = None
+    if os.path.exists(os.path.join(VECTOR_STORE_PATH, "index.faiss")):
+        store = FAISS.load_local(
+            VECTOR_STORE_PATH, embeddings, allow_dangerous_deserialization=True
+        )
+        print("✅ Loaded existing FAISS vector store")
+    else:
+        print("📝 No existing FAISS vector store — will create new one")
+
+    _load_keyword_index(store)
+
+    if not os.path.exists(METADATA_PATH):
+        return store, None
+    with open(METADATA_PATH, "rb") as f:
+        metadata = pickle.load(f)
+    print(f"📋 Loaded metadata for {len(metadata)} document(s)")
+    return store, (metadata, store.docstore._dict.items() if store is not None else [])
+
+
+def _load_keyword_index(store):
+    """Load the BM25 keyword index, rebuilding it from the docstore if missing."""
+    global _keyword_index
+
+    if os.path.exists(KEYWORD_INDEX_PATH):
+        _keyword_index = KeywordIndex.load(KEYWORD_INDEX_PATH)
+        print(f"🔤 Loaded keyword index ({len(_keyword_index)} chunks)")
+    elif store is not None:
+        _keyword_index = KeywordIndex.from_documents(store.docstore._dict.items())
+        print(f"🔤 Built keyword index from existing store ({len(_keyword_index)} chunks)")
+    else:
+        _keyword_index = KeywordIndex()
+
+    return _keyword_index
+
+
+# 📝 Write-Ahead Log
+def _apply_record(record: dict):
+    """
+    Apply one logged mutation (live writes and replay). SQLite writes are
+    idempotent, so whichever process applies a record first stores its
+    rows and the others only update their in-memory index.
+    """
+    global _vectorstore, _positions_by_id
+
+    op = record["op"]
+    document_id = record["document_id"]
+
+    if op == "create":
+        document_store.create_document(document_id, record["meta"]["filename"])
+
+    elif op == "update":
+        document_store.update_document(document_id, **record["fields"])
+
+    elif op == "add":
+        ids, texts = record["ids"], record["texts"]
+        if not document_store.has_chunk(ids[-1]):
+            if document_store.add_chunks(document_id, ids, texts, cached=record["cached"]) is None:
+                return  # the document was deleted meanwhile: index nothing for it
+
+        text_embeddings = list(zip(texts, record["vectors"]))
+        if _vectorstore is None:
+            _vectorstore = _new_vectorstore(len(record["vectors"][0]))
+            print(f"🆕 Created new FAISS vectorstore ({VECTOR_STORAGE})")
+        if not _vectorstore.index.is_trained:
+            _vectorstore.index.train(np.asarray(record["vectors"], dtype="float32"))
+        _vectorstore.add_embeddings(text_embeddings, ids=ids)
+        _positions_by_id = None
+        _track_ann("add", ids, record["vectors"])
+
+        for vector_id, text in zip(ids, texts):
+            _keyword_index.add(vector_id, text)
+
+    elif op == "delete":
+        ids, texts = record["ids"], record.get("texts")
+        if texts is None:
+            stored = document_store.get_chunks(ids)
+            texts = [stored[v].page_content if v in stored else "" for v in ids]
+
+        for vector_id, text in zip(ids, texts):
+            _keyword_index.remove(vector_id, text)
+        present = _indexed_ids(ids)
+        if present:
+            _delete_vectors(present)
+            _track_ann("delete", present)
+        document_store.delete_document(document_id, record.get("created_at"))
+
+
+def _delete_vectors(vector_ids):
+    """
+    Remove vectors from the exact index by ID. Unlike FAISS.delete, which
+    rebuilds the position → ID map as a dict of every ID, a snapshot's
+    mapped ID columns are kept and only the removed rows are recorded.
+    """
+    global _positions_by_id
+
+    positions = sorted(_vector_positions(vector_ids))
+    _vectorstore.index.remove_ids(np.asarray(positions, dtype="int64"))
+    id_map = _vectorstore.index_to_docstore_id
+    if isinstance(id_map, ColumnarIdMap):
+        id_map.remove(positions)
+    else:
+        removed = set(positions)
+        remaining = (vector_id for pos, vector_id in sorted(id_map.items()) if pos not in removed)
+        _vectorstore.index_to_docstore_id = dict(enumerate(remaining))
+    _positions_by_id = None
+
+
+def _log(record: dict):
+    """
+    Durably append a mutation to the WAL, then apply it. Callers hold
+    _write_lock. Cost depends on the record, not on the size of the index;
+    the full rewrite happens in background compaction.
+    """
+    global _compaction_pending
+
+    for foreign in _wal.append(record):
+        _apply_record(foreign)
+    _apply_record(record)
+
+    if not _compaction_pending and _wal.size() >= COMPACT_WAL_BYTES:
+        _compaction_pending = True
+        threading.Thread(target=compact_vectorstore, name="index-compaction", daemon=True).start()
+
+
+# 🧭 Approximate Index
+def _vectors_at(positions):
+    """Vectors at the given rows of the exact index."""
+    return _vectorstore.index.reconstruct_batch(np.asarray(positions, dtype="int64"))
+
+
+def _track_ann(op, vector_ids, vectors=None):
+    """Mirror a write into the ANN index (and into one being built). Callers hold _write_lock."""
+    if _ann_pending is not None:
+        _ann_pending.append((op, vector_ids, vectors))
+    if _ann is not None:
+        if op == "add":
+            _ann.add(vector_ids, vectors)
+        else:
+            _ann.remove(vector_ids)
+    _maybe_build_ann()
+
+
+def _maybe_build_ann():
+    """
+    Start a background ANN build when the exact index crosses
+    ANN_MIN_VECTORS, or a rebuild when INDEX_TYPE changed or too many
+    vectors were deleted from the current one. Callers hold _write_lock.
+    """
+    global _ann, _ann_pending
+
+    if INDEX_TYPE == "flat":
+        _ann = None
+        return
+    if _ann_pending is not None or _vectorstore is None:
+        return
+    ntotal = _vectorstore.index.ntotal
+    if _ann_retry_at is not None and ntotal < _ann_retry_at:
+        return
+
+    if _ann is None:
+        due = ntotal >= ANN_MIN_VECTORS and can_train(INDEX_TYPE, ntotal)
+    else:
+        due = _ann.kind != INDEX_TYPE or _ann.deleted > ANN_REBUILD_RATIO * _ann.index.ntotal
+    if due:
+        _ann_pending = []
+        threading.Thread(
+            target=_build_ann, args=(_ann_pending, _frozen_id_order()), name="ann-build", daemon=True
+        ).start()
+
+
+def _build_ann(pending, vector_ids):
+    """
+    Build an INDEX_TYPE index over `vector_ids` and swap it in atomically.
+
+    Vectors are copied out of the exact index a batch at a time under the
+    write lock; training and graph/list construction run outside it, so
+    searches (on the previous index) and writes carry on. Writes made
+    meanwhile are queued in `pending` and replayed just before the swap.
+    """
+    global _ann, _ann_pending, _ann_retry_at
+
+    def current():
+        return pending is _ann_pending  # False once a reload abandoned this build
 
     try:
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""],
-        )
-        chunks = splitter.split_text(text)
+        start = time.perf_counter()
+        vector_ids = list(vector_ids)
+        if len(vector_ids) < ANN_MIN_VECTORS or not can_train(INDEX_TYPE, len(vector_ids)):
+            with _write_lock:
+                if current():
+                    _ann, _ann_pending = None, None
+                    print("🧭 Too few vectors left for an ANN index; using exact search")
+            return
+
+        with _write_lock:
+            if not current():
+                return
+            ann = AnnIndex(INDEX_TYPE, new_index(INDEX_TYPE, _vectorstore.index.d, len(vector_ids), VECTOR_STORAGE))
+            training = None
+            if not ann.index.is_trained:
+                ntotal = _vectorstore.index.ntotal
+                sample = np.random.default_rng(0).choice(ntotal, min(IVF_TRAIN_SIZE, ntotal), replace=False)
+                training = _vectors_at(np.sort(sample))
+        if training is not None:
+            ann.train(training)
+            del training
+
+        for batch in _batched(vector_ids, ANN_BUILD_BATCH):
+            with _write_lock:
+                if not current():
+                    return
+                positions = _vector_positions(batch)
+                present = [_vectorstore.index_to_docstore_id[pos] for pos in positions]
+                vectors = _vectors_at(positions)
+            if present:
+                ann.add(present, vectors)
+
+        with _write_lock:
+            if not current():
+                return
+            for op, ids, vectors in pending:
+                if op == "add":
+                    ann.add(ids, vectors)
+                else:
+                    ann.remove(ids)
+            _ann, _ann_pending, _ann_retry_at = ann, None, None
+        print(f"🧭 Built {INDEX_TYPE} index over {len(ann)} vectors in {time.perf_counter() - start:.1f} s")
+
+    except Exception as e:
+        print(f"❌ ANN index build failed: {e}")
+        import traceback; traceback.print_exc()
+        with _write_lock:
+            if current():
+                _ann_pending = None
+                # Not again on every write: wait for the index to grow
+                _ann_retry_at = int(len(vector_ids) * (1 + ANN_REBUILD_RATIO)) + 1
+
+
+# 🗜️ Snapshots & Compaction
+def _write_snapshot(generation, index_bytes, id_order, keyword_index, ann_state=None):
+    """
+    Write a snapshot directory: the FAISS index, its vector IDs as
+    memory-mappable columns (FAISS order), the BM25 postings as
+    memory-mappable columns (keywords/) and, once promoted, the ANN index (ann/).
+    """
+    final_dir = _snapshot_dir(generation)
+    tmp_dir = f"{final_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    if index_bytes is not None:
+        atomic_write(os.path.join(tmp_dir, "index.faiss"), index_bytes.tobytes())
+        write_id_columns(os.path.join(tmp_dir, "ids"), id_order)
+    if ann_state is not None:
+        write_ann(os.path.join(tmp_dir, "ann"), *ann_state)
+    write_keyword_index(os.path.join(tmp_dir, "keywords"), keyword_index)
+    fsync_dir(tmp_dir)
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+    fsync_dir(INDEX_DIR)
+
+
+def _remove_stale_files(generation: int):
+    """Drop WAL segments and snapshots older than `generation`."""
+    for wal_generation in wal_generations(INDEX_DIR):
+        if wal_generation < generation:
+            os.remove(wal_path(INDEX_DIR, wal_generation))
+    for name in os.listdir(INDEX_DIR):
+        path = os.path.join(INDEX_DIR, name)
+        if name.startswith("snapshot-") and path != _snapshot_dir(generation):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _frozen_id_order():
+    """The FAISS position → ID order, unaffected by later writes."""
+    id_map = _vectorstore.index_to_docstore_id
+    if isinstance(id_map, ColumnarIdMap):
+        return id_map.frozen().ids()
+    return [id_map[pos] for pos in range(len(id_map))]
+
+
+def compact_vectorstore():
+    """
+    Fold the write-ahead log into a new snapshot.
+
+    The WAL is rotated and the in-memory state captured under the write
+    lock; serialising and writing the snapshot happens outside it, so
+    uploads and deletes keep going meanwhile. CURRENT is switched only once
+    the snapshot is complete, so a crash at any point leaves either the old
+    snapshot + WAL or the new one. Only one process compacts at a time;
+    each reopens the new snapshot once it sees it.
+    """
+    global _compaction_pending
+
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    with _compaction_lock, file_lock(os.path.join(INDEX_DIR, "compact.lock"), blocking=False) as acquired:
+        try:
+            if not acquired:
+                print("⏭️ Another process is compacting the index")
+                return
+
+            with _write_lock:
+                _load_vectorstore()
+                foreign, generation = _wal.rotate()
+                for record in foreign:
+                    _apply_record(record)
+
+                index_bytes = id_order = ann_state = None
+                if _vectorstore is not None:
+                    index_bytes = faiss.serialize_index(to_mappable(_vectorstore.index))
+                    id_order = _frozen_id_order()
+                if _ann is not None:
+                    ann_state = (_ann.kind, faiss.serialize_index(_ann.index), _ann.frozen_ids())
+                keyword_index = _keyword_index.frozen()
+
+            start = time.perf_counter()
+            _write_snapshot(generation, index_bytes, id_order, keyword_index, ann_state)
+            write_current(INDEX_DIR, generation)
+            _remove_stale_files(generation)
+            print(f"🗜️ Compacted index into snapshot {generation} ({(time.perf_counter() - start) * 1000:.0f} ms)")
+            if FAISS_MMAP:
+                with _write_lock:
+                    _reopen()  # onto the new snapshot's mapping, with an empty heap delta
+
+        except Exception as e:
+            print(f"❌ Index compaction failed: {e}")
+            import traceback; traceback.print_exc()
+        finally:
+            _compaction_pending = False
+
+# ➕ Add Document
+def _split_stream(pages, splitter):
+    """
+    Split a stream of page texts incrementally.
+    The last chunk of each step is carried into the next page, so chunk
+    boundaries match splitting the joined text while only one page (plus
+    the carry) is held in memory.
+    """
+    carry = ""
+    for page_text in pages:
+        if not page_text.strip():
+            continue
+        chunks = splitter.split_text(f"{carry}\n\n{page_text}" if carry else page_text)
         if not chunks:
-            raise ValueError("No text chunks generated. The file might be empty.")
-
-        document_id = str(uuid.uuid4())
-        print(f"📄 Adding document: {filename} ({len(chunks)} chunks)")
-
-        documents = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    "document_id": document_id,
-                    "filename": filename,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks),
-                },
-            )
-            for i, chunk in enumerate(chunks)
-        ]
+            continue
+        yield from chunks[:-1]
+        carry = chunks[-1]
+
+    if carry:
+        yield carry
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
 
-        # Update metadata
-        _documents_metadata[document_id] = {
-            "filename": filename,
-            "total_chunks": len(chunks),
-        }
-        _save_metadata()
 
+def _commit_batch(document_id, start_index, chunks, vectors, cached) -> bool:
+    """
+    Add one embedded batch to the index and log it (the resume point).
+    Returns False, logging nothing, if the document was deleted meanwhile.
+    """
+    vector_ids = [f"{document_id}:{start_index + i}" for i in range(len(chunks))]
+
+    with _write_lock:
         _load_vectorstore()
+        if document_store.get_document(document_id) is None:
+            return False
+        _log({
+            "op": "add",
+            "document_id": document_id,
+            "ids": vector_ids,
+            "texts": chunks,
+            "vectors": np.asarray(vectors, dtype="float32"),
+            "cached": cached,
+        })
+    return True
 
-        if _vectorstore is None:
-            _vectorstore = FAISS.from_documents(documents, embeddings)
-            print("🆕 Created new FAISS vectorstore")
+
+def add_document_to_vectorstore(text, filename: str, document_id: str | None = None, progress=None):
+    """
+    Add a document (PDF/Word/plain text) into FAISS vectorstore.
+
+    `text` is either the full text or an iterable of page texts. Pages are
+    split as they stream in, embedded in batches of INGEST_BATCH_SIZE chunks
+    (up to INGEST_CONCURRENCY batches in flight) and each batch is added to
+    the index and persisted in order, so memory stays bounded and vectors
+    become searchable while the rest of the document is still processing.
+
+    If a previous run for the same `document_id` died part-way, the chunks
+    it already committed are skipped and ingestion resumes after them.
+    `progress(chunks_done, total_chunks)` is called after each batch;
+    total_chunks is None until the stream is exhausted.
+
+    Returns the document ID, or None if the document was deleted while it
+    was being ingested (what was committed has been removed with it).
+    """
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", " ", ""],
+    )
+    pages = [text] if isinstance(text, str) else text
+    document_id = document_id or str(uuid.uuid4())
+
+    with _write_lock:
+        _load_vectorstore()
+        meta = document_store.get_document(document_id)
+        if meta and meta["status"] == "indexing":
+            print(f"♻️ Resuming '{filename}' after {meta['total_chunks']} committed chunks")
         else:
-            _vectorstore.add_documents(documents)
-            print("📚 Added new chunks to existing FAISS vectorstore")
+            if meta:
+                delete_document_from_vectorstore(document_id)
+            _log({"op": "create", "document_id": document_id, "meta": {"filename": filename}})
+            meta = document_store.get_document(document_id)
+    committed = meta["total_chunks"]
+
+    print(f"📄 Adding document: {filename} (batches of {INGEST_BATCH_SIZE})")
+    chunk_stream = islice(_split_stream(pages, splitter), committed, None)
+
+    try:
+        with ThreadPoolExecutor(max_workers=INGEST_CONCURRENCY) as pool:
+            in_flight = deque()
+            next_index = committed
 
-        _vectorstore.save_local(VECTOR_STORE_PATH)
-        print(f"✅ Stored {len(chunks)} chunks for '{filename}' (ID: {document_id})")
+            def commit_oldest():
+                start_index, chunks, future = in_flight.popleft()
+                vectors, cached = future.result()
+                if not _commit_batch(document_id, start_index, chunks, vectors, cached):
+                    return False
+                if progress:
+                    progress(start_index + len(chunks), None)
+                return True
+
+            deleted = False
+            for chunks in _batched(chunk_stream, INGEST_BATCH_SIZE):
+                # Only chunks not seen before go to the embedding API
+                in_flight.append((next_index, chunks, pool.submit(chunk_embeddings.embed_documents_with_stats, chunks)))
+                next_index += len(chunks)
+                if len(in_flight) >= INGEST_CONCURRENCY and not commit_oldest():
+                    deleted = True
+                    break
+
+            while in_flight and not deleted:
+                deleted = not commit_oldest()
+            for _start_index, _chunks, future in in_flight:
+                future.cancel()
+
+        with _write_lock:
+            meta = None if deleted else document_store.get_document(document_id)
+            if meta is None:
+                print(f"🗑️ '{filename}' was deleted during ingestion; stopped indexing it")
+                return None
+            if not meta["total_chunks"]:
+                _log({"op": "delete", "document_id": document_id, "ids": [], "texts": [], "created_at": meta["created_at"]})
+                raise ValueError("No text chunks generated. The file might be empty.")
+
+            _log({"op": "update", "document_id": document_id, "fields": {"status": "ready"}})
+            document_store.bump_index_version()
+
+        if progress:
+            progress(meta["total_chunks"], meta["total_chunks"])
+        print(f"🧮 Embeddings: {meta['cached_chunks']} cached, {meta['embedded_chunks']} new")
+        print(f"✅ Stored {meta['total_chunks']} chunks for '{filename}' (ID: {document_id})")
 
         return document_id
 
     except Exception as e:
         print(f"❌ Error adding document: {e}")
         import traceback; traceback.print_exc()
+        # Roll back what was committed; only a crashed process leaves a resumable partial
+        if document_store.get_document(document_id):
+            delete_document_from_vectorstore(document_id)
         raise
 
 # 🔎 Hybrid Search
-def _keyword_search(question: str, all_docs: list, top_k=5):
-    """Keyword-based fallback search for exact or partial term matches."""
-    question_lower = question.lower()
-    keywords = re.findall(r'\b\w+\b', question_lower)
-    scored = []
+def _keyword_search(question: str, document_id: str | None = None, top_k=5):
+    """BM25 keyword search over the inverted index; returns (chunk ID, score) pairs, best first."""
+    allowed_ids = set(_vector_ids_for_document(document_id)) if document_id else None
+    return _keyword_index.search(question, top_k=top_k, allowed_ids=allowed_ids)
+
+
+def _vector_positions(vector_ids):
+    """Map docstore IDs to their current rows in the FAISS index."""
+    global _positions_by_id
 
-    for doc in all_docs:
-        content = doc.page_content.lower()
-        score = sum(1 for kw in keywords if kw in content)
-        if score > 0:
-            scored.append((score, doc))
+    id_map = _vectorstore.index_to_docstore_id
+    if isinstance(id_map, ColumnarIdMap):
+        positions = (id_map.position(v) for v in vector_ids)
+        return [pos for pos in positions if pos is not None]
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [doc for _, doc in scored[:top_k]]
+    if _positions_by_id is None:
+        _positions_by_id = {doc_key: pos for pos, doc_key in id_map.items()}
+    return [_positions_by_id[v] for v in vector_ids if v in _positions_by_id]
 
 
-def query_vectorstore(question: str, document_id: str | None = None):
+def _indexed_ids(vector_ids):
+    """The subset of `vector_ids` that has a vector in the FAISS index."""
+    if _vectorstore is None:
+        return []
+    positions = _vector_positions(vector_ids)
+    return [_vectorstore.index_to_docstore_id[pos] for pos in positions]
+
+
+def embed_question(question: str):
+    """Query embedding of a question as a float32 array (cached)."""
+    return np.asarray(embeddings.embed_query(question), dtype="float32")
+
+
+def _nearest(query, positions, k):
+    """
+    (ID, squared L2 distance) of the k rows among `positions` closest to
+    `query`, by the index's own vectors.
+    """
+    if not positions:
+        return []
+    distances = ((_vectors_at(positions) - query) ** 2).sum(axis=1)
+    top = np.argsort(distances)[:k]
+    return [(_vectorstore.index_to_docstore_id[positions[i]], float(distances[i])) for i in top]
+
+
+def _rerank(query, vector_ids, k):
+    """
+    Order candidate IDs by exact L2 distance and keep k (ID, distance)
+    pairs. With a quantized
+    index the float32 vectors come from the chunk embedding cache (found
+    by chunk text); chunks it does not hold use the index's own vectors.
+    """
+    positions = _vector_positions(vector_ids)
+    if VECTOR_STORAGE == "float32" or not FULL_PRECISION_RERANK:
+        return _nearest(query, positions, k)
+
+    vector_ids = [_vectorstore.index_to_docstore_id[pos] for pos in positions]
+    vectors = _vectors_at(positions)
+    chunks = document_store.get_chunks(vector_ids)
+    texts = [chunks[v].page_content if v in chunks else "" for v in vector_ids]
+    for i, full in enumerate(chunk_embeddings.lookup(texts)):
+        if full is not None:
+            vectors[i] = full
+
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    return [(vector_ids[i], float(distances[i])) for i in np.argsort(distances)[:k]]
+
+
+def _similarity_search(question: str, k=10):
+    """
+    Nearest (chunk ID, distance) pairs over the whole index: candidates
+    from the ANN index once promoted, else brute force; re-ranked exactly
+    unless they already are (flat float32).
+    """
+    query = embed_question(question)
+    ann = _ann
+    if ann is not None:
+        return _rerank(query, ann.search(query, k * ANN_RERANK_FACTOR), k)
+
+    exact = VECTOR_STORAGE == "float32"
+    distances, positions = _vectorstore.index.search(query.reshape(1, -1), k if exact else k * ANN_RERANK_FACTOR)
+    hits = [
+        (_vectorstore.index_to_docstore_id[int(pos)], float(dist))
+        for pos, dist in zip(positions[0], distances[0]) if pos != -1
+    ]
+    return hits if exact else _rerank(query, [vector_id for vector_id, _ in hits], k)
+
+
+def _document_similarity_search(question: str, document_id: str, k=10):
+    """
+    Semantic search restricted to one document; returns (chunk ID, distance) pairs.
+    Only that document's vectors are scored, so it returns min(k, chunks)
+    hits from the document and costs O(document size), not O(corpus).
+    """
+    positions = _vector_positions(_vector_ids_for_document(document_id))
+    if not positions:
+        return []
+
+    query = embed_question(question)
+    if VECTOR_STORAGE == "float32":
+        return _nearest(query, positions, k)
+    candidates = _nearest(query, positions, k * ANN_RERANK_FACTOR)
+    return _rerank(query, [vector_id for vector_id, _ in candidates], k)
+
+
+def _record_timings(timings: dict):
+    with _stage_timings_lock:
+        for stage, ms in timings.items():
+            total = _stage_timings.setdefault(stage, [0, 0.0])
+            total[0] += 1
+            total[1] += ms
+
+
+def query_vectorstore(
+    question: str,
+    document_id: str | None = None,
+    fusion: str | None = None,
+    weights: dict | None = None,
+    rrf_k: float | None = None,
+    top_k: int | None = None,
+    rerank: bool | None = None,
+):
     """
     Perform hybrid (semantic + keyword) search.
-    Returns top relevant chunks for analysis.
+    Both retrievers return FUSION_CANDIDATES scored hits, fused by chunk ID
+    with reciprocal-rank (`fusion="rrf"`) or weighted score fusion; unset
+    arguments fall back to the FUSION_* / RETRIEVAL_TOP_K settings.
+    With re-ranking (`rerank`, default: RERANKER is set) the best
+    RERANK_CANDIDATES fused chunks are re-scored against the question
+    within RERANK_BUDGET_MS; over budget the fusion order is kept.
+    Returns the top chunks, each with metadata["retrieval"] holding the
+    fused score, every source's rank and score, and the re-rank score.
     """
     try:
         _load_vectorstore()
@@ -161,33 +961,73 @@ def query_vectorstore(question: str, document_id: str | None = None):
             print("⚠️ No documents in vector store.")
             return []
 
-        all_docs = list(_vectorstore.docstore._dict.values())
+        top_k = top_k or RETRIEVAL_TOP_K
+        rerank = reranker.RERANKER != "none" if rerank is None else rerank
+        candidates = max(FUSION_CANDIDATES, reranker.RERANK_CANDIDATES) if rerank else FUSION_CANDIDATES
+        timings = {}
+        stage_start = time.perf_counter()
 
-        if document_id:
-            all_docs = [d for d in all_docs if d.metadata.get("document_id") == document_id]
+        def lap(stage):
+            nonlocal stage_start
+            now = time.perf_counter()
+            timings[stage] = (now - stage_start) * 1000
+            stage_start = now
 
-        # 1️⃣ Semantic
-        semantic_results = _vectorstore.similarity_search(question, k=10)
+        # 1️⃣ Semantic (scored as cosine similarity: vectors are unit length)
         if document_id:
-            semantic_results = [r for r in semantic_results if r.metadata.get("document_id") == document_id]
+            semantic = _document_similarity_search(question, document_id, k=candidates)
+        else:
+            semantic = _similarity_search(question, k=candidates)
+        lap("semantic")
 
-        # 2️⃣ Keyword
-        keyword_results = _keyword_search(question, all_docs, top_k=5)
+        # 2️⃣ Keyword (BM25)
+        keyword = _keyword_search(question, document_id, top_k=candidates)
+        lap("keyword")
 
-        # 3️⃣ Combine & deduplicate
-        seen = set()
-        combined = []
+        # 3️⃣ Fuse on chunk IDs, then fetch only the hits (one batched lookup)
+        hits = fuse(
+            {
+                "semantic": ([v for v, _ in semantic], [1.0 - d / 2 for _, d in semantic]),
+                "keyword": ([v for v, _ in keyword], [score for _, score in keyword]),
+            },
+            method=fusion or FUSION_METHOD,
+            weights={**FUSION_WEIGHTS, **(weights or {})},
+            rrf_k=FUSION_RRF_K if rrf_k is None else rrf_k,
+            top_k=None,
+        )
+        lap("fusion")
+        wanted = reranker.RERANK_CANDIDATES if rerank else top_k
+        # A few spare IDs in case chunks were deleted since the search
+        chunks = document_store.get_chunks([vector_id for vector_id, _, _ in hits[:wanted + top_k]])
 
-        for doc in keyword_results + semantic_results:
-            key = (doc.page_content, doc.metadata.get("document_id"))
-            if key not in seen:
-                combined.append(doc)
-                seen.add(key)
+        results = []
+        for vector_id, score, sources in hits:
+            doc = chunks.get(vector_id)
+            if doc is None:
+                continue
+            doc.metadata["retrieval"] = {"score": score, **sources}
+            results.append(doc)
+            if len(results) == wanted:
+                break
+        lap("fetch")
 
-        results = combined[:5]
+        # 4️⃣ Re-rank the wider candidate set and keep the best top_k
+        if rerank and len(results) > 1:
+            reranked = reranker.rerank(
+                question, results, [doc.metadata["retrieval"]["score"] for doc in results], top_k
+            )
+            if reranked is not None:
+                for doc, score in reranked:
+                    doc.metadata["retrieval"]["rerank"] = score
+                results = [doc for doc, _score in reranked]
+            lap("rerank")
+        results = results[:top_k]
+
+        _record_timings(timings)
+        print("⏱️ Retrieval: " + ", ".join(f"{stage} {ms:.1f}ms" for stage, ms in timings.items()))
 
         if results:
-            print(f"\n🔍 Top match: {results[0].metadata.get('filename')}")
+            print(f"\n🔍 Top match: {results[0].metadata.get('filename')} ({results[0].metadata['retrieval']})")
             print(f"   Preview: {results[0].page_content[:100]}...\n")
         else:
             print("⚠️ No matching chunks found.")
@@ -202,44 +1042,47 @@ def query_vectorstore(question: str, document_id: str | None = None):
 
 # 📋 List, Delete, Metadata
 def list_all_documents():
-    """List all indexed documents."""
-    _load_vectorstore()
+    """List all indexed documents (an indexed SQLite query; the index is not loaded)."""
+    documents = document_store.list_documents()
     print("\n📚 Documents in vectorstore:")
-    for doc_id, meta in _documents_metadata.items():
+    for doc_id, meta in documents.items():
         print(f"- {meta['filename']} ({doc_id[:8]}) — {meta['total_chunks']} chunks")
     print()
-    return _documents_metadata
+    return documents
+
+
+def _vector_ids_for_document(document_id: str):
+    """Return the docstore IDs of a document's chunks."""
+    return document_store.vector_ids_for_document(document_id)
 
 
 def delete_document_from_vectorstore(document_id: str):
-    """Delete a document and its vectors by document_id."""
-    global _vectorstore, _documents_metadata
+    """
+    Delete a document and its vectors by document_id.
+    Only the document's own vectors are removed — nothing is re-embedded.
+    """
     _load_vectorstore()
 
-    if _vectorstore is None:
-        print("⚠️ Vector store is empty.")
-        return False
-
     try:
-        remaining = [
-            d for d in _vectorstore.docstore._dict.values()
-            if d.metadata.get("document_id") != document_id
-        ]
+        with _write_lock:
+            meta = document_store.get_document(document_id)
+            if meta is None:
+                print(f"⚠️ No entries found for document ID {document_id}")
+                return False
 
-        if len(remaining) == len(_vectorstore.docstore._dict):
-            print(f"⚠️ No entries found for document ID {document_id}")
-            return False
-
-        new_store = FAISS.from_documents(remaining, embeddings)
-        new_store.save_local(VECTOR_STORE_PATH)
-        _vectorstore = new_store
+            vector_ids = _vector_ids_for_document(document_id)
+            chunks = document_store.get_chunks(vector_ids)
+            _log({
+                "op": "delete",
+                "document_id": document_id,
+                "ids": vector_ids,
+                "texts": [chunks[v].page_content if v in chunks else "" for v in vector_ids],
+                "created_at": meta["created_at"],
+            })
+            document_store.bump_index_version()
 
-        if document_id in _documents_metadata:
-            del _documents_metadata[document_id]
-            _save_metadata()
-
-        print(f"✅ Deleted document {document_id} from vectorstore.")
-        return True
+            print(f"✅ Deleted document {document_id} ({len(vector_ids)} vectors) from vectorstore.")
+            return True
 
     except Exception as e:
         print(f"❌ Failed to delete document: {e}")
@@ -249,10 +1092,45 @@ def delete_document_from_vectorstore(document_id: str):
 
 def get_document_metadata(document_id: str):
     """Get metadata for one document."""
-    return _documents_metadata.get(document_id)
+    return document_store.get_document(document_id)
+
+
+def get_index_version() -> int:
+    """Counter bumped by every completed upload and delete, in any process."""
+    return document_store.get_index_version()
+
+
+def get_index_stats():
+    """Which index serves searches, and its size (without loading the store)."""
+    stats = {
+        "type": _ann.kind if _ann is not None else "flat",
+        "storage": VECTOR_STORAGE,
+        "dimensions": _vectorstore.index.d if _vectorstore is not None else EMBEDDING_DIMENSIONS or None,
+        "vectors": _vectorstore.index.ntotal if _vectorstore is not None else 0,
+        "ann_building": _ann_pending is not None,
+    }
+    if _ann is not None:
+        stats["ann_deleted"] = _ann.deleted
+    return stats
+
+
+def get_retrieval_stats():
+    """Average time per retrieval stage and re-ranker counters."""
+    with _stage_timings_lock:
+        stages = {stage: round(total / count, 2) for stage, (count, total) in _stage_timings.items()}
+    return {"stage_ms": stages, "reranker": reranker.stats()}
+
+
+def get_query_cache_stats():
+    """Hit/miss counters of the query embedding cache."""
+    return embeddings.stats()
+
+
+def get_embedding_client_stats():
+    """Request/retry/token counters of the embedding API client."""
+    return embedding_client.stats()
 
 
 def get_all_documents_metadata():
-    """Return metadata for all documents."""
-    _load_vectorstore()
-    return _documents_metadata
+    """Return metadata for all documents (without loading the index)."""
+    return document_store.list_documents()
@@ -44,6 +44,18 @@ export default function PDFChatbot() {
 
   const toggleDarkMode = () => setDarkMode((s) => !s);
 
+  // Uploads are processed in the background; poll the job until it finishes
+  const waitForIngestionJob = async (jobId) => {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const res = await fetch(`http://localhost:5000/api/upload/jobs/${jobId}`, { mode: 'cors' });
+      const job = await res.json();
+      if (!res.ok) throw new Error(job?.error || `Job status failed: ${res.status}`);
+      if (job.status === 'done') return job.result;
+      if (job.status === 'failed') throw new Error(job.error || 'Processing failed');
+    }
+  };
+
   const handleFileUpload = async (files) => {
     if (!files || files.length === 0) return;
     const file = files[0];
@@ -94,6 +106,16 @@ export default function PDFChatbot() {
         return;
       }
 
+      if (data?.job_id) {
+        try {
+          data = await waitForIngestionJob(data.job_id);
+        } catch (err) {
+          console.error('Ingestion error:', err);
+          toast.error(err.message || 'Processing failed');
+          return;
+        }
+      }
+
       const backendId =
         data?.document_id || data?.documentId || data?.doc_id || null;
       if (!backendId) {
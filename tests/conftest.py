@@ -0,0 +1,17 @@
+import shutil
+
+import pytest
+
+from benchmarks.common import CountingEmbeddings, use_temp_vectorstore
+
+
+@pytest.fixture
+def vector_store():
+    """services.vector_store on a fresh temporary directory with a deterministic embedder."""
+    store, tmp_dir = use_temp_vectorstore(CountingEmbeddings(dim=32))
+    yield store
+    if store._wal is not None:
+        store._wal.close()
+    store._vectorstore = None
+    store._loaded = False
+    shutil.rmtree(tmp_dir, ignore_errors=True)
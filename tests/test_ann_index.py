@@ -0,0 +1,58 @@
+import faiss
+import numpy as np
+import pytest
+
+from services.ann_index import SnapshotIndex, from_mappable, new_flat_index, to_mappable
+
+
+def _mapped(tmp_path, flat):
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(to_mappable(flat), path)
+    base = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+    base.make_direct_map()
+    return SnapshotIndex(base)
+
+
+@pytest.mark.parametrize("storage", ["float32", "sq8"])
+def test_snapshot_index_matches_a_flat_index(tmp_path, storage):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, 16)).astype("float32")
+    flat = new_flat_index(16, storage)
+    flat.train(vectors)
+    flat.add(vectors[:200])
+    index = _mapped(tmp_path, flat)
+
+    # The same writes on both: the mapped snapshot itself is never modified
+    for target in (flat, index):
+        target.add(vectors[200:])
+        target.remove_ids(np.array([0, 5, 150, 210, 260]))
+        target.remove_ids(np.array([3, 196]))
+    assert index.base.ntotal == 200
+    assert index.ntotal == flat.ntotal == 293
+
+    queries = rng.standard_normal((4, 16)).astype("float32")
+    expected_distances, expected_positions = flat.search(queries, 10)
+    distances, positions = index.search(queries, 10)
+    np.testing.assert_array_equal(positions, expected_positions)
+    np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+
+    everything = np.arange(flat.ntotal)
+    np.testing.assert_array_equal(index.reconstruct_batch(everything), flat.reconstruct_n(0, flat.ntotal))
+    np.testing.assert_array_equal(index.codes().reshape(-1), faiss.vector_to_array(flat.codes))
+
+    # Compaction writes the live vectors back out in position order
+    compacted = from_mappable(to_mappable(index))
+    np.testing.assert_array_equal(compacted.reconstruct_n(0, compacted.ntotal), flat.reconstruct_n(0, flat.ntotal))
+
+
+def test_ivfpq_waits_for_enough_training_points(monkeypatch):
+    from services import ann_index
+
+    monkeypatch.setattr(ann_index, "IVF_NLIST", 0)
+    monkeypatch.setattr(ann_index, "IVF_TRAIN_SIZE", 100_000)
+    assert ann_index.can_train("hnsw", 10)
+    assert not ann_index.can_train("ivfpq", 255)  # one point per PQ centroid
+    assert ann_index.can_train("ivfpq", 256)
+
+    monkeypatch.setattr(ann_index, "IVF_TRAIN_SIZE", 255)
+    assert not ann_index.can_train("ivfpq", 10_000)  # capped by the training sample
@@ -0,0 +1,56 @@
+import numpy as np
+
+from services.answer_cache import AnswerCache
+
+SCOPE = ("all", "rrf")
+
+
+def unit(*values):
+    vector = np.array(values, dtype="float32")
+    return vector / np.linalg.norm(vector)
+
+
+def test_close_questions_hit_and_distant_ones_miss():
+    cache = AnswerCache(max_size=10, ttl=60, threshold=0.95)
+    cache.store(unit(1, 0, 0), SCOPE, 1, ["Hello", " world"], [{"filename": "a.pdf"}])
+
+    entry = cache.lookup(unit(1, 0.1, 0), SCOPE, 1)
+    assert entry["tokens"] == ["Hello", " world"]
+    assert entry["sources"] == [{"filename": "a.pdf"}]
+    assert entry["similarity"] > 0.95
+    assert cache.lookup(unit(0, 1, 0), SCOPE, 1) is None
+    assert cache.lookup(unit(1, 0, 0), ("doc-1", "rrf"), 1) is None
+
+
+def test_a_newer_index_version_invalidates_the_scope():
+    cache = AnswerCache(max_size=10, ttl=60)
+    cache.store(unit(1, 0), SCOPE, 1, ["old"], [])
+    cache.store(unit(0, 1), ("other", "rrf"), 1, ["kept"], [])
+
+    assert cache.lookup(unit(1, 0), SCOPE, 2) is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["size"] == 1
+    assert cache.lookup(unit(0, 1), ("other", "rrf"), 1)["tokens"] == ["kept"]
+
+    # An answer generated before the bump arrives late: it is not stored
+    cache.store(unit(1, 0), SCOPE, 2, ["new"], [])
+    cache.store(unit(1, 0), SCOPE, 1, ["stale"], [])
+    assert cache.lookup(unit(1, 0), SCOPE, 2)["tokens"] == ["new"]
+    assert cache.lookup(unit(1, 0), SCOPE, 1) is None
+
+
+def test_least_recently_used_and_expired_entries_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.answer_cache.time.time", lambda: now[0])
+    cache = AnswerCache(max_size=2, ttl=10)
+
+    cache.store(unit(1, 0, 0), SCOPE, 1, ["a"], [])
+    cache.store(unit(0, 1, 0), SCOPE, 1, ["b"], [])
+    assert cache.lookup(unit(1, 0, 0), SCOPE, 1) is not None
+    cache.store(unit(0, 0, 1), SCOPE, 1, ["c"], [])  # evicts "b"
+    assert cache.lookup(unit(0, 1, 0), SCOPE, 1) is None
+    assert cache.stats()["evictions"] == 1
+
+    now[0] += 11
+    assert cache.lookup(unit(0, 0, 1), SCOPE, 1) is None
+    assert cache.stats()["expirations"] == 1
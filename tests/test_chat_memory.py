@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from services.chat_memory import InMemoryChatMemory, SqliteChatMemory
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def memory(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryChatMemory(max_messages=3, max_sessions=2, ttl=60)
+    return SqliteChatMemory(str(tmp_path / "chat" / "memory.db"), max_messages=3, max_sessions=2, ttl=60,
+                            purge_every=1)
+
+
+def test_sqlite_memory_creates_its_database_on_first_use(tmp_path):
+    path = tmp_path / "chat" / "memory.db"
+    memory = SqliteChatMemory(str(path))
+    assert not os.path.exists(path)
+
+    assert memory.get("s1") == []
+    assert os.path.exists(path)
+
+
+def test_sessions_keep_their_last_messages_and_are_bounded(memory):
+    for i in range(5):
+        memory.append("s1", "user", f"m{i}")
+    assert [m["content"] for m in memory.get("s1")] == ["m2", "m3", "m4"]
+
+    memory.append("s2", "user", "hello")
+    memory.append("s3", "user", "hello")  # beyond max_sessions: s1 is least recently used
+    assert memory.get("s1") == []
+    assert memory.stats()["sessions"] == 2
+
+
+def test_fold_replaces_older_messages_unless_the_summary_moved_on(memory):
+    for i in range(3):
+        memory.append("s1", "user", f"m{i}")
+    messages = memory.get("s1")
+
+    assert memory.fold("s1", messages[1]["seq"], "summary of m0 m1", "")
+    assert memory.get_summary("s1") == "summary of m0 m1"
+    assert [m["content"] for m in memory.get("s1")] == ["m2"]
+
+    # A second fold based on the old summary (another worker got there first) is refused
+    assert not memory.fold("s1", messages[2]["seq"], "stale", "")
+    assert memory.get_summary("s1") == "summary of m0 m1"
+
+    memory.clear("s1")
+    assert memory.get("s1") == []
+    assert memory.get_summary("s1") == ""
@@ -0,0 +1,64 @@
+import pytest
+
+from services.chunk_store import ColumnarIdMap, IdColumns, write_id_columns
+
+
+@pytest.fixture
+def id_map(tmp_path):
+    write_id_columns(str(tmp_path), [f"chunk-{i}" for i in range(10)])
+    return ColumnarIdMap(IdColumns(str(tmp_path)), extra=["new-0", "new-1", "new-2"])
+
+
+def expected_positions(ids):
+    return {vector_id: position for position, vector_id in enumerate(ids)}
+
+
+def test_lookups_cover_snapshot_and_extra_rows(id_map):
+    assert len(id_map) == 13
+    assert id_map[0] == "chunk-0"
+    assert id_map[9] == "chunk-9"
+    assert id_map[10] == "new-0"
+    assert id_map.position("chunk-7") == 7
+    assert id_map.position("new-2") == 12
+    assert id_map.position("missing") is None
+    with pytest.raises(KeyError):
+        id_map[13]
+
+
+def test_remove_shifts_later_positions_like_faiss(id_map):
+    ids = list(id_map.ids())
+    for positions in ([0, 4], [3, 9], [7, 8]):
+        id_map.remove(positions)
+        ids = [v for i, v in enumerate(ids) if i not in positions]
+
+        assert list(id_map.ids()) == ids
+        assert [id_map[i] for i in range(len(id_map))] == ids
+        assert {v: id_map.position(v) for v in ids} == expected_positions(ids)
+
+    assert len(id_map) == 7
+    assert id_map.position("chunk-0") is None
+    assert id_map.position("new-0") is None
+
+
+def test_writes_only_touch_rows_after_the_snapshot(id_map):
+    id_map.remove([2])
+    id_map[len(id_map)] = "new-3"
+    assert id_map[12] == "new-3"
+    assert id_map.position("new-3") == 12
+
+    id_map[9] = "renamed"
+    assert id_map.position("renamed") == 9
+    with pytest.raises(KeyError):
+        id_map[0] = "chunk-x"
+    with pytest.raises(KeyError):
+        del id_map[0]
+
+
+def test_frozen_copy_ignores_later_removals(id_map):
+    id_map.remove([1])
+    frozen = id_map.frozen()
+    id_map.remove([0, 10])
+
+    assert frozen[0] == "chunk-0"
+    assert len(frozen) == 12
+    assert len(id_map) == 10
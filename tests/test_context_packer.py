@@ -0,0 +1,71 @@
+from langchain_core.documents import Document
+
+from services.context_packer import count_tokens, pack_chunks, pack_history
+
+
+def chunk(text, document_id="doc", index=None, filename="a.pdf"):
+    metadata = {"document_id": document_id, "filename": filename}
+    if index is not None:
+        metadata["chunk_index"] = index
+    return Document(page_content=text, metadata=metadata)
+
+
+def words(n, start=0):
+    return " ".join(f"word{i}" for i in range(start, start + n))
+
+
+def test_chunks_stay_within_the_budget_and_small_ones_fill_the_gaps():
+    chunks = [chunk(words(40)), chunk(words(400, 100)), chunk(words(20, 600)), chunk(words(40))]
+    budget = count_tokens(f"--- Section 1 (from a.pdf) ---\n{words(40)}") + 150
+
+    context, stats = pack_chunks(chunks, budget)
+    assert stats["tokens"] <= budget
+    assert count_tokens(context) <= budget
+    # The long chunk is skipped for the next smaller one; the duplicate is dropped
+    assert stats == {"chunks": 2, "candidates": 4, "tokens": stats["tokens"]}
+    assert "word100 " not in context
+    assert "word600" in context
+    assert "--- Section 2 (from a.pdf) ---" in context
+
+
+def test_only_the_best_chunk_is_truncated():
+    context, stats = pack_chunks([chunk(words(1000)), chunk(words(5, 2000))], 100)
+    assert stats["chunks"] == 1
+    assert stats["tokens"] <= 100
+    assert context.endswith("[Section truncated for length.]")
+
+
+def test_overlap_with_a_neighbouring_chunk_is_cut():
+    first = words(30)
+    second = words(30, 20)  # starts with the last ten words of the first
+    context, stats = pack_chunks([chunk(first, index=0), chunk(second, index=1)], 1000)
+    assert stats["chunks"] == 2
+    assert context.count("word25") == 1
+    assert context.endswith("word49")
+
+
+def test_history_keeps_the_newest_messages_within_the_budget():
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": words(30, 100 * i)} for i in range(10)]
+    history = pack_history(messages, max_tokens=300)
+
+    lines = history.split("\n")
+    assert count_tokens(history) <= 300
+    assert lines[-1] == f"ASSISTANT: {words(30, 900)}"
+    assert 0 < len(lines) < 10
+    assert history.index("word800") < history.index("word900")
+
+
+def test_history_summary_comes_first_and_shares_the_budget():
+    messages = [{"role": "user", "content": words(30, 100 * i)} for i in range(10)]
+    plain = pack_history(messages, max_tokens=200)
+    summarised = pack_history(messages, max_tokens=200, summary=words(20, 5000))
+
+    assert summarised.startswith("SUMMARY OF EARLIER CONVERSATION: word5000")
+    assert count_tokens(summarised) <= 200
+    assert summarised.count("USER:") < plain.count("USER:")
+
+
+def test_an_oversized_newest_message_is_truncated():
+    history = pack_history([{"role": "user", "content": words(500)}], max_tokens=50)
+    assert history.startswith("USER: word0")
+    assert count_tokens(history) <= 50
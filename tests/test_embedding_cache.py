@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.common import CountingEmbeddings
+from services.embedding_cache import ChunkEmbeddingCache, QueryEmbeddingCache
+
+
+@pytest.fixture
+def embedder():
+    return CountingEmbeddings(dim=8)
+
+
+@pytest.mark.parametrize("persistent", [False, True])
+def test_query_cache_evicts_the_least_recently_used_question(tmp_path, embedder, persistent):
+    path = str(tmp_path / "queries.npy") if persistent else None
+    cache = QueryEmbeddingCache(embedder, max_size=2, path=path)
+
+    cache.embed_query("first question")
+    cache.embed_query("second question")
+    cache.embed_query("First  question?")  # same key once normalised; now most recent
+    cache.embed_query("third question")  # evicts "second question"
+    assert (cache.hits, embedder.calls) == (1, 3)
+
+    cache.embed_query("first question")
+    assert embedder.calls == 3
+    cache.embed_query("second question")
+    assert embedder.calls == 4
+    assert cache.stats()["size"] == 2
+
+
+def test_query_cache_is_shared_through_its_file(tmp_path, embedder):
+    path = str(tmp_path / "queries.npy")
+    first = QueryEmbeddingCache(embedder, max_size=4, path=path)
+    vector = first.embed_query("what is the refund policy")
+
+    # A second process (or a restart) reuses rows written by the first
+    second = QueryEmbeddingCache(embedder, max_size=4, path=path)
+    assert second.embed_query("What is the refund policy?") == pytest.approx(vector)
+    assert embedder.calls == 1
+
+    second.embed_query("who signed the contract")
+    first.embed_query("who signed the contract")
+    assert embedder.calls == 2
+    assert first.hits == 1
+
+
+def test_query_cache_namespaces_do_not_mix(tmp_path, embedder):
+    path = str(tmp_path / "queries.npy")
+    QueryEmbeddingCache(embedder, max_size=4, path=path, namespace="model@8").embed_query("question")
+    QueryEmbeddingCache(embedder, max_size=4, path=path, namespace="model@4").embed_query("question")
+    assert embedder.calls == 2
+
+
+def test_chunk_cache_only_embeds_novel_text(tmp_path, embedder):
+    cache = ChunkEmbeddingCache(embedder, str(tmp_path), "model")
+    vectors, cached = cache.embed_documents_with_stats(["a", "b", "a"])
+    assert cached == 0
+    assert embedder.texts_embedded == 2
+    assert vectors[0] == vectors[2]
+
+    _, cached = cache.embed_documents_with_stats(["b", "c"])
+    assert cached == 1
+    assert embedder.texts_embedded == 3
+    assert len(cache) == 3
+
+
+def test_chunk_cache_is_shared_between_instances(tmp_path, embedder):
+    first = ChunkEmbeddingCache(embedder, str(tmp_path), "model")
+    second = ChunkEmbeddingCache(embedder, str(tmp_path), "model")
+    expected, _ = first.embed_documents_with_stats(["alpha", "beta"])
+
+    # Rows appended by another instance are picked up on a miss
+    vectors, cached = second.embed_documents_with_stats(["beta", "alpha"])
+    assert cached == 2
+    assert vectors == [expected[1], expected[0]]
+    assert embedder.texts_embedded == 2
+
+    second.embed_documents_with_stats(["gamma"])
+    reopened = ChunkEmbeddingCache(embedder, str(tmp_path), "model")
+    found = reopened.lookup(["gamma", "alpha", "missing"])
+    assert found[2] is None
+    np.testing.assert_allclose(found[1], expected[0])
+    assert len(reopened) == 3
+
+    other_model = ChunkEmbeddingCache(embedder, str(tmp_path), "other")
+    assert other_model.lookup(["alpha"]) == [None]
+
+
+def test_chunk_cache_drops_a_torn_tail_on_load(tmp_path, embedder):
+    cache = ChunkEmbeddingCache(embedder, str(tmp_path), "model")
+    cache.embed_documents_with_stats(["alpha", "beta"])
+    with open(cache.vectors_path, "ab") as f:
+        f.write(b"\x00" * 12)  # a crash after part of a vector row
+
+    reopened = ChunkEmbeddingCache(embedder, str(tmp_path), "model")
+    assert len(reopened) == 2
+    _, cached = reopened.embed_documents_with_stats(["alpha", "gamma"])
+    assert cached == 1
+    assert reopened.lookup(["gamma"])[0] is not None
+
+
+def test_query_cache_file_is_resized_when_max_size_changes(tmp_path, embedder):
+    path = str(tmp_path / "queries.npy")
+    small = QueryEmbeddingCache(embedder, max_size=2, path=path)
+    for question in ("one", "two", "three"):
+        small.embed_query(question)
+
+    larger = QueryEmbeddingCache(embedder, max_size=4, path=path)
+    larger.embed_query("four")
+    assert np.load(path, mmap_mode="r").shape == (4,)
+    assert larger.path == path
+    calls = embedder.calls
+
+    # The two most recent rows survive the resize; the evicted one does not
+    larger.embed_query("two")
+    larger.embed_query("three")
+    assert embedder.calls == calls
+    larger.embed_query("one")
+    assert embedder.calls == calls + 1
+
+    # An instance still configured for two rows rebuilds the file again, keeping the latest rows
+    small.embed_query("five")
+    assert np.load(path, mmap_mode="r").shape == (2,)
+    QueryEmbeddingCache(embedder, max_size=2, path=path).embed_query("one")
+    assert embedder.calls == calls + 2
+
+
+def test_query_cache_follows_a_file_rebuilt_by_another_process(tmp_path, embedder):
+    path = str(tmp_path / "queries.npy")
+    first = QueryEmbeddingCache(embedder, max_size=4, path=path)
+    first.embed_query("one")
+    second = QueryEmbeddingCache(embedder, max_size=4, path=path)
+
+    # A new file takes the old one's place, as after a rebuild; `second` must not keep using the old one
+    os.remove(path)
+    QueryEmbeddingCache(embedder, max_size=4, path=path).embed_query("two")
+    second.embed_query("two")
+    assert embedder.calls == 2
+    first.embed_query("one")
+    assert embedder.calls == 3
+
+
+def test_query_cache_file_is_rebuilt_when_the_dimension_changes(tmp_path):
+    path = str(tmp_path / "queries.npy")
+    QueryEmbeddingCache(CountingEmbeddings(dim=8), max_size=4, path=path).embed_query("question")
+
+    shortened = CountingEmbeddings(dim=4)
+    cache = QueryEmbeddingCache(shortened, max_size=4, path=path, namespace="model@4")
+    cache.embed_query("question")
+    assert np.load(path, mmap_mode="r")["vec"].shape == (4, 4)
+
+    QueryEmbeddingCache(shortened, max_size=4, path=path, namespace="model@4").embed_query("question")
+    assert shortened.calls == 1
@@ -0,0 +1,47 @@
+import pytest
+
+from services.fusion import fuse
+
+
+@pytest.fixture
+def ranked():
+    return {
+        "vector": (["a", "b", "c"], [0.9, 0.8, 0.1]),
+        "keyword": (["c", "a", "d"], [12.0, 3.0, 1.0]),
+    }
+
+
+def test_rrf_sums_reciprocal_ranks_per_id(ranked):
+    hits = fuse(ranked, method="rrf", rrf_k=60, top_k=None)
+    scores = {chunk_id: score for chunk_id, score, _ in hits}
+
+    assert [chunk_id for chunk_id, _, _ in hits] == ["a", "c", "b", "d"]
+    assert scores["a"] == pytest.approx(1 / 61 + 1 / 62)
+    assert scores["c"] == pytest.approx(1 / 63 + 1 / 61)
+    assert scores["b"] == pytest.approx(1 / 62)
+    assert hits[0][2] == {"vector": {"rank": 1, "score": 0.9}, "keyword": {"rank": 2, "score": 3.0}}
+    assert hits[2][2] == {"vector": {"rank": 2, "score": 0.8}}
+
+
+def test_weighted_normalises_each_source(ranked):
+    hits = fuse(ranked, method="weighted", weights={"vector": 0.7, "keyword": 0.3}, top_k=None)
+    scores = {chunk_id: score for chunk_id, score, _ in hits}
+
+    assert scores["a"] == pytest.approx(0.7 * 1.0 + 0.3 * (2 / 11))
+    assert scores["b"] == pytest.approx(0.7 * (0.7 / 0.8))
+    assert scores["c"] == pytest.approx(0.3 * 1.0)
+    assert scores["d"] == pytest.approx(0.0)
+    assert [chunk_id for chunk_id, _, _ in hits] == ["a", "b", "c", "d"]
+
+
+def test_duplicates_keep_the_best_entry_and_top_k_limits():
+    hits = fuse({"vector": (["a", "b", "a"], [0.9, 0.5, 0.1])}, top_k=1)
+    assert len(hits) == 1
+    assert hits[0][0] == "a"
+    assert hits[0][2] == {"vector": {"rank": 1, "score": 0.9}}
+
+
+def test_empty_sources_and_unknown_methods():
+    assert fuse({"vector": ([], []), "keyword": ([], [])}) == []
+    with pytest.raises(ValueError):
+        fuse({"vector": (["a"], [1.0])}, method="max")
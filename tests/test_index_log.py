@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from services.index_log import WalGapError, WriteAheadLog, wal_path, write_current
+
+
+def test_torn_tail_is_cut_off_and_later_appends_follow_the_intact_records(tmp_path):
+    directory = str(tmp_path)
+    wal = WriteAheadLog(directory, 1, fsync=False)
+    wal.append({"op": "add", "n": 1})
+    wal.append({"op": "add", "n": 2})
+    intact = wal.size()
+    wal.close()
+
+    # A crash mid-append: a full header, then only part of the payload
+    with open(wal_path(directory, 1), "ab") as f:
+        f.write(b"\x40\x00\x00\x00\x00\x00\x00\x00partial")
+
+    reader = WriteAheadLog(directory, 1, fsync=False)
+    assert reader.read_new() == [{"op": "add", "n": 1}, {"op": "add", "n": 2}]
+    assert os.path.getsize(wal_path(directory, 1)) > intact  # plain reads leave the file alone
+
+    restarted = WriteAheadLog(directory, 1, fsync=False)
+    assert [r["n"] for r in restarted.read_new(lock=True)] == [1, 2]
+    assert os.path.getsize(wal_path(directory, 1)) == intact
+
+    restarted.append({"op": "add", "n": 3})
+    assert reader.read_new() == [{"op": "add", "n": 3}]
+    for wal in (reader, restarted):
+        wal.close()
+
+
+def test_corrupted_record_stops_the_read(tmp_path):
+    directory = str(tmp_path)
+    wal = WriteAheadLog(directory, 1, fsync=False)
+    wal.append({"n": 1})
+    first = wal.size()
+    wal.append({"n": 2})
+    wal.close()
+
+    with open(wal_path(directory, 1), "r+b") as f:
+        f.seek(first + 10)
+        f.write(b"\xff")
+
+    assert WriteAheadLog(directory, 1, fsync=False).read_new(lock=True) == [{"n": 1}]
+    assert os.path.getsize(wal_path(directory, 1)) == first
+
+
+def test_readers_follow_rotations_and_appends_return_foreign_records(tmp_path):
+    directory = str(tmp_path)
+    writer = WriteAheadLog(directory, 1, fsync=False)
+    other = WriteAheadLog(directory, 1, fsync=False)
+    reader = WriteAheadLog(directory, 1, fsync=False)
+
+    writer.append({"n": 1})
+    foreign, generation = writer.rotate()
+    assert (foreign, generation) == ([], 2)
+    writer.append({"n": 2})
+
+    # The other writer catches up across the rotation before its own append lands
+    assert other.append({"n": 3}) == [{"n": 1}, {"n": 2}]
+    assert other.generation == 2
+    assert reader.read_new() == [{"n": 1}, {"n": 2}, {"n": 3}]
+    assert reader.generation == 2
+    assert not reader.pending()
+    for wal in (writer, other, reader):
+        wal.close()
+
+
+def test_reader_behind_a_compacted_generation_raises_a_gap(tmp_path):
+    directory = str(tmp_path)
+    writer = WriteAheadLog(directory, 1, fsync=False)
+    writer.append({"n": 1})
+    writer.rotate()
+    writer.rotate()
+    write_current(directory, 3)  # generations 1 and 2 folded into a snapshot...
+    os.remove(wal_path(directory, 1))
+    os.remove(wal_path(directory, 2))
+
+    reader = WriteAheadLog(directory, 1, fsync=False)
+    assert reader.pending()
+    with pytest.raises(WalGapError):
+        reader.read_new()
+    writer.close()
+    reader.close()
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from services.keyword_index import KeywordIndex, MappedKeywordIndex, write_keyword_columns, write_keyword_index
+
+WORDS = [f"w{i}" for i in range(50)]
+
+
+@pytest.fixture
+def chunks():
+    rng = random.Random(0)
+    return {f"doc:{i}": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 30))) for i in range(200)}
+
+
+def assert_same_hits(expected, actual, query, **kwargs):
+    want = expected.search(query, top_k=10, **kwargs)
+    got = actual.search(query, top_k=10, **kwargs)
+    assert [score for _, score in got] == pytest.approx([score for _, score in want])
+    assert dict(got).keys() <= {chunk_id for chunk_id, _ in expected.search(query, top_k=1000, **kwargs)}
+
+
+def test_mapped_index_scores_like_the_in_memory_index(tmp_path, chunks):
+    index = KeywordIndex()
+    for chunk_id, text in chunks.items():
+        index.add(chunk_id, text)
+    write_keyword_index(str(tmp_path / "keywords"), index)
+    mapped = MappedKeywordIndex(str(tmp_path / "keywords"))
+
+    assert len(mapped) == len(index)
+    for query in ["w1 w2", "w3", "w10 w11 w12 unknown"]:
+        assert_same_hits(index, mapped, query)
+
+    # Removals tombstone snapshot rows, additions go to the in-memory delta
+    for i in range(0, 200, 7):
+        index.remove(f"doc:{i}", chunks[f"doc:{i}"])
+        mapped.remove(f"doc:{i}", chunks[f"doc:{i}"])
+    for i in range(300, 320):
+        text = f"fresh w{i % 50} w{i % 7}"
+        index.add(f"doc:{i}", text)
+        mapped.add(f"doc:{i}", text)
+    assert len(mapped) == len(index)
+    assert mapped.total_length == index.total_length
+    allowed = {"doc:3", "doc:7", "doc:8", "doc:301"}
+    for query in ["w1 w2", "fresh", "w3 w4 w5"]:
+        assert_same_hits(index, mapped, query)
+        assert_same_hits(index, mapped, query, allowed_ids=allowed)
+    assert "doc:7" not in dict(mapped.search("w1 w2 w3 w4 w5", top_k=1000))
+
+    # Compaction: the frozen view is written out and reopened
+    frozen = mapped.frozen()
+    mapped.remove("doc:8", chunks["doc:8"])
+    write_keyword_index(str(tmp_path / "next"), frozen)
+    reopened = MappedKeywordIndex(str(tmp_path / "next"))
+    assert len(reopened) == len(index)
+    assert_same_hits(index, reopened, "w1 w2 fresh")
+
+
+def test_columns_written_from_texts(tmp_path, chunks):
+    index = KeywordIndex()
+    for chunk_id, text in chunks.items():
+        index.add(chunk_id, text)
+    write_keyword_columns(str(tmp_path / "keywords"), chunks.items())
+    mapped = MappedKeywordIndex(str(tmp_path / "keywords"))
+    assert_same_hits(index, mapped, "w1 w9 w40")
+
+
+def test_empty_snapshot(tmp_path):
+    write_keyword_index(str(tmp_path / "keywords"), KeywordIndex())
+    mapped = MappedKeywordIndex(str(tmp_path / "keywords"))
+    assert len(mapped) == 0 and mapped.search("hello") == []
+    mapped.add("doc:0", "hello world")
+    assert [chunk_id for chunk_id, _ in mapped.search("hello")] == ["doc:0"]
@@ -0,0 +1,52 @@
+import pytest
+
+from services import query_rewriter
+from services.query_rewriter import build_search_query, is_follow_up
+
+HISTORY = [
+    {"role": "user", "content": "What is the loan amount in the offer letter?", "seq": 1},
+    {"role": "assistant", "content": "The loan amount is RM 250,000.", "seq": 2},
+]
+
+
+@pytest.fixture(autouse=True)
+def heuristic_mode(monkeypatch):
+    monkeypatch.setattr(query_rewriter, "QUERY_REWRITE", "heuristic")
+
+
+@pytest.mark.parametrize("question", [
+    "Who is the borrower?",
+    "Is there a penalty clause?",
+    "What is this document about?",
+    "What are the terms of this loan?",
+    "Is there anything that I should know?",
+    "Siapa peminjam?",
+    "Apa itu faedah?",
+    "Tarikh?",
+])
+def test_standalone_questions_are_searched_as_asked(question):
+    assert not is_follow_up(question)
+    assert build_search_query(question, HISTORY) == question
+
+
+@pytest.mark.parametrize("question", [
+    "What about the interest rate?",
+    "And the tenure?",
+    "Is it fixed?",
+    "How do I pay it?",
+    "What does that mean?",
+    "Why?",
+    "Bagaimana dengan itu?",
+])
+def test_follow_ups_take_terms_from_the_previous_question(question):
+    assert is_follow_up(question)
+    query = build_search_query(question, HISTORY)
+    assert "loan" in query.split() and "amount" in query.split()
+
+
+def test_connective_is_dropped_from_the_search_query():
+    assert build_search_query("What about the interest rate?", HISTORY).startswith("the interest rate?")
+
+
+def test_without_history_questions_are_searched_as_asked():
+    assert build_search_query("Is it fixed?", []) == "Is it fixed?"
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from services.streaming import SeparatorRowFilter, coalesce
+
+
+def filtered(pieces):
+    row_filter = SeparatorRowFilter()
+    return "".join(row_filter.feed(piece) for piece in pieces) + row_filter.finish()
+
+
+TABLE = "| Name | Qty |\n|------|:---:|\n| Pen | 2 |\n"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, len(TABLE)])
+def test_separator_rows_are_dropped_however_the_tokens_split(size):
+    pieces = [TABLE[i:i + size] for i in range(0, len(TABLE), size)]
+    assert filtered(pieces) == "| Name | Qty |\n| Pen | 2 |\n"
+
+
+def test_rules_and_dashes_outside_tables_are_kept():
+    assert filtered(["Intro\n", "--", "-\n", "- item\n"]) == "Intro\n---\n- item\n"
+    assert filtered(["| a |\n", "--", "-"]) == "| a |\n"  # unterminated separator at the end
+    assert filtered(["| a |\n", "--", "-x"]) == "| a |\n---x"
+
+
+def test_text_is_not_held_back_once_a_line_cannot_be_a_separator():
+    row_filter = SeparatorRowFilter()
+    assert row_filter.feed("| ") == ""
+    assert row_filter.feed("Na") == "| Na"
+    assert row_filter.feed("me |") == "me |"
+
+
+def slow_source(stall):
+    yield "a"
+    yield "b"
+    yield "c"
+    time.sleep(stall)
+    yield "d"
+
+
+def test_coalesce_flushes_at_the_deadline_while_the_source_stalls():
+    start = time.perf_counter()
+    frames = []
+    for frame in coalesce(slow_source(stall=0.5), max_chars=100, max_delay_ms=40):
+        frames.append((frame, time.perf_counter() - start))
+
+    assert [frame for frame, _ in frames] == ["a", "bc", "d"]
+    assert frames[1][1] < 0.4  # sent during the stall, not with "d"
+    assert frames[2][1] >= 0.5
+
+
+def test_coalesce_cuts_frames_at_max_chars():
+    pieces = ["x"] + ["ab"] * 10
+    assert list(coalesce(iter(pieces), max_chars=6, max_delay_ms=1000)) == ["x", "ababab", "ababab", "ababab", "ab"]
+
+
+def test_coalesce_reraises_source_errors():
+    def failing():
+        yield "a"
+        raise RuntimeError("stream broke")
+
+    frames = coalesce(failing(), max_delay_ms=10)
+    assert next(frames) == "a"
+    with pytest.raises(RuntimeError, match="stream broke"):
+        list(frames)
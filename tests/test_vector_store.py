@@ -0,0 +1,119 @@
+from services import document_store
+from benchmarks.common import synthetic_document
+
+
+def test_delete_during_ingestion_leaves_no_orphans(vector_store, monkeypatch):
+    monkeypatch.setattr(vector_store, "INGEST_BATCH_SIZE", 4)
+    monkeypatch.setattr(vector_store, "INGEST_CONCURRENCY", 1)
+    document_id = "race-doc"
+    batches = []
+
+    def progress(done, total):
+        batches.append(done)
+        if len(batches) == 2:
+            # A delete request landing between two committed batches
+            assert vector_store.delete_document_from_vectorstore(document_id)
+
+    result = vector_store.add_document_to_vectorstore(
+        synthetic_document(1, pages=5), "race.pdf", document_id=document_id, progress=progress
+    )
+
+    assert result is None
+    assert batches == [4, 8]
+    assert document_store.get_document(document_id) is None
+    assert document_store.vector_ids_for_document(document_id) == []
+    assert vector_store._vectorstore.index.ntotal == 0
+    assert len(vector_store._keyword_index) == 0
+    assert vector_store._keyword_index.postings == {}
+
+
+def test_add_record_for_a_deleted_document_is_skipped(vector_store):
+    vector_store.add_document_to_vectorstore(synthetic_document(2, pages=2), "kept.pdf", document_id="kept")
+    indexed = vector_store._vectorstore.index.ntotal
+
+    # e.g. replaying a batch logged by another process before its document was deleted
+    vector_store._apply_record({
+        "op": "add",
+        "document_id": "gone",
+        "ids": ["gone:0"],
+        "texts": ["orphan text"],
+        "vectors": vector_store._vectors_at([0]),
+        "cached": 0,
+    })
+
+    assert vector_store._vectorstore.index.ntotal == indexed
+    assert vector_store._keyword_index.search("orphan") == []
+
+
+def test_writes_leave_the_mapped_snapshot_read_only(vector_store):
+    from services.ann_index import SnapshotIndex
+
+    first = vector_store.add_document_to_vectorstore(synthetic_document(3, pages=3), "a.pdf")
+    vector_store.add_document_to_vectorstore(synthetic_document(4, pages=3), "b.pdf")
+    vector_store.compact_vectorstore()
+    index = vector_store._vectorstore.index
+    assert isinstance(index, SnapshotIndex)
+    snapshot_rows = index.base.ntotal
+
+    added = vector_store.add_document_to_vectorstore(synthetic_document(5, pages=3), "c.pdf")
+    assert vector_store.delete_document_from_vectorstore(first)
+    assert vector_store._vectorstore.index is index  # not copied into the heap
+    assert index.base.ntotal == snapshot_rows
+    assert index.delta.ntotal == len(document_store.vector_ids_for_document(added))
+
+    def search():
+        return vector_store._similarity_search("term10 term20 term30", k=10)
+
+    results = search()
+    assert results and not any(vector_id.startswith(first) for vector_id, _ in results)
+
+    # Compaction folds the delta into the next snapshot and reopens it
+    vector_store.compact_vectorstore()
+    reopened = vector_store._vectorstore.index
+    assert reopened is not index and isinstance(reopened, SnapshotIndex)
+    assert reopened.delta.ntotal == 0
+    assert search() == results
+
+
+def _wait_for_ann_build(vector_store):
+    import time
+
+    deadline = time.time() + 30
+    while vector_store._ann_pending is not None and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_ivfpq_is_not_built_below_its_training_size(vector_store, monkeypatch):
+    monkeypatch.setattr(vector_store, "INDEX_TYPE", "ivfpq")
+    monkeypatch.setattr(vector_store, "ANN_MIN_VECTORS", 10)
+    vector_store.add_document_to_vectorstore(synthetic_document(6, pages=5), "small.pdf")
+
+    assert 10 <= vector_store._vectorstore.index.ntotal < 256
+    assert vector_store._ann_pending is None and vector_store._ann is None
+
+
+def test_failed_ann_build_backs_off(vector_store, monkeypatch):
+    builds = []
+
+    def failing_index(kind, dim, n_vectors, storage):
+        builds.append(n_vectors)
+        raise RuntimeError("training failed")
+
+    monkeypatch.setattr(vector_store, "INDEX_TYPE", "hnsw")
+    monkeypatch.setattr(vector_store, "ANN_MIN_VECTORS", 10)
+    monkeypatch.setattr(vector_store, "ANN_REBUILD_RATIO", 1.0)
+    monkeypatch.setattr(vector_store, "INGEST_BATCH_SIZE", 4)
+    monkeypatch.setattr(vector_store, "INGEST_CONCURRENCY", 1)
+    monkeypatch.setattr(vector_store, "new_index", failing_index)
+
+    def progress(done, total):
+        _wait_for_ann_build(vector_store)
+
+    vector_store.add_document_to_vectorstore(synthetic_document(7, pages=20), "a.pdf", progress=progress)
+    _wait_for_ann_build(vector_store)
+
+    # Retried only once the index doubled (ANN_REBUILD_RATIO), not on every batch
+    assert vector_store._vectorstore.index.ntotal > 50
+    assert builds[:2] == [12, 28]
+    assert all(later > 2 * earlier for earlier, later in zip(builds, builds[1:]))
+    assert vector_store._ann_retry_at == 2 * builds[-1] + 1